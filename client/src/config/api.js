@@ -64,10 +64,15 @@ export const productService = {
   },
 
   // Get price history (F-02)
-  getPriceHistory: async (productName, months = 12) => {
+  // maxPoints/resolution let the server downsample long histories for charts
+  getPriceHistory: async (productName, months = 12, { maxPoints, resolution } = {}) => {
     try {
       const response = await api.get(`/price-history/${encodeURIComponent(productName)}`, {
-        params: { months }
+        params: {
+          months,
+          ...(maxPoints && { max_points: maxPoints }),
+          ...(resolution && { resolution })
+        }
       })
       return response.data
     } catch (error) {
@@ -101,6 +106,24 @@ export const productService = {
     }
   },
 
+  // Get latest prices of several products in several markets in one request
+  // Returns { productos, plazas, precios: [[...]], fechas: [[...]] } (null = no price)
+  getLatestPricesBatch: async (productIds, marketIds) => {
+    try {
+      const response = await api.get('/prices/latest/batch/', {
+        params: {
+          product_ids: productIds,
+          market_ids: marketIds
+        },
+        // Repeat the key for each id (product_ids=1&product_ids=2), as FastAPI expects
+        paramsSerializer: { indexes: null }
+      })
+      return response.data
+    } catch (error) {
+      throw new Error(`Error getting latest prices: ${error.message}`)
+    }
+  },
+
   // Get all available options (products and markets)
   getOptions: async () => {
     try {
@@ -6,6 +6,9 @@ import PriceHistoryChart from '../components/PriceHistoryChart'
 import PriceStats from '../components/PriceStats'
 import TrendPeriods from '../components/TrendPeriods'
 
+// The chart cannot show more points than this; the API downsamples (LTTB)
+const CHART_MAX_POINTS = 500
+
 /**
  * ProductDetailPage Component
  * Displays detailed information about a product including:
@@ -35,7 +38,7 @@ const ProductDetailPage = () => {
       
       try {
         // Fetch price history (includes all statistics)
-        const history = await productService.getPriceHistory(productName, months)
+        const history = await productService.getPriceHistory(productName, months, { maxPoints: CHART_MAX_POINTS })
         setHistoryData(history)
 
         // Fetch available plazas
@@ -48,8 +51,14 @@ const ProductDetailPage = () => {
           ? allPlazas.filter(p => p.nombre === selectedPlaza)
           : allPlazas
 
-        // Fetch current prices for filtered plazas
-        const pricesPromises = plazasToFetch.map(async (plaza) => {
+        // Fetch current prices for filtered plazas: one batch request when
+        // the product is in the catalogue, one request per plaza otherwise
+        const product = (optionsData.productos || []).find(
+          p => p.nombre.toLowerCase() === productName.toLowerCase()
+        )
+
+        // A failed plaza is left out instead of failing the whole page
+        const fetchPerPlaza = () => Promise.all(plazasToFetch.map(async (plaza) => {
           try {
             const priceData = await productService.getLatestPrice(productName, plaza.nombre)
             return {
@@ -59,9 +68,32 @@ const ProductDetailPage = () => {
           } catch (err) {
             return null
           }
-        })
+        }))
+
+        let prices
+        if (product && plazasToFetch.length > 0) {
+          try {
+            const batch = await productService.getLatestPricesBatch(
+              [product.id],
+              plazasToFetch.map(p => p.id)
+            )
+            prices = plazasToFetch.map((plaza, column) => (
+              batch.precios[0][column] === null ? null : {
+                plaza: plaza.nombre,
+                producto: batch.productos[0].nombre,
+                precio_por_kg: batch.precios[0][column],
+                ultima_actualizacion: batch.fechas[0][column]
+              }
+            ))
+          } catch (err) {
+            // e.g. more plazas than BATCH_MAX_MARKETS, or a 503
+            console.error('Error fetching batch prices:', err)
+            prices = await fetchPerPlaza()
+          }
+        } else {
+          prices = await fetchPerPlaza()
+        }
 
-        const prices = await Promise.all(pricesPromises)
         setCurrentPrices(prices.filter(p => p !== null))
 
       } catch (err) {
@@ -0,0 +1,133 @@
+"""
+Benchmark of the `enlaces_correo` token lookup and expiry sweep.
+
+Fills two temporary tables with the same number of links and compares:
+
+    - plain: the previous layout, a UUID token stored as-is in a uniquely
+      indexed VARCHAR(500) (`enlace_url`),
+    - hash: the current layout, the SHA-256 of a 256-bit token in a
+      uniquely indexed BYTEA (`token_hash`),
+
+reporting the unique index size and the latency of looking a link up by
+its token. It then times the batched sweep (`DELETE_BATCH_QUERY`) of the
+expired half of the hashed table.
+
+Nothing outside the session's temporary tables is touched.
+
+    python benchmarks/email_links_bench.py --links 200000 --lookups 2000
+"""
+
+import argparse
+import os
+import random
+import secrets
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from database import engine  # noqa: E402
+from utils.link_maintenance import DELETE_BATCH_QUERY  # noqa: E402
+from utils.password_utils import hash_token  # noqa: E402
+
+
+def create_tables(conn, legacy_tokens, tokens) -> None:
+    now = datetime.utcnow()
+    conn.execute(text("""
+        CREATE TEMP TABLE enlaces_url (
+            enlace_id SERIAL PRIMARY KEY, enlace_url VARCHAR(500) UNIQUE NOT NULL, expira_en TIMESTAMP NOT NULL
+        )
+    """))
+    # Same name as the real table so DELETE_BATCH_QUERY runs against it
+    conn.execute(text("""
+        CREATE TEMP TABLE enlaces_correo (
+            enlace_id SERIAL PRIMARY KEY, token_hash BYTEA UNIQUE NOT NULL, expira_en TIMESTAMP NOT NULL
+        )
+    """))
+    conn.execute(text("CREATE INDEX ON enlaces_correo (expira_en)"))
+    # Half of the links expired two days ago
+    expiries = [now - timedelta(days=2) if i % 2 else now + timedelta(hours=1) for i in range(len(tokens))]
+    conn.execute(
+        text("INSERT INTO enlaces_url (enlace_url, expira_en) VALUES (:url, :expira_en)"),
+        [{"url": token, "expira_en": expira_en} for token, expira_en in zip(legacy_tokens, expiries)],
+    )
+    conn.execute(
+        text("INSERT INTO enlaces_correo (token_hash, expira_en) VALUES (:token_hash, :expira_en)"),
+        [{"token_hash": hash_token(token), "expira_en": expira_en} for token, expira_en in zip(tokens, expiries)],
+    )
+    conn.execute(text("ANALYZE enlaces_url"))
+    conn.execute(text("ANALYZE enlaces_correo"))
+
+
+def index_size(conn, table: str, column: str) -> int:
+    return conn.execute(text("""
+        SELECT pg_relation_size(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = CAST(:table AS regclass) AND a.attname = :column
+    """), {"table": f"pg_temp.{table}", "column": column}).scalar()
+
+
+def time_lookups(conn, query, params) -> list:
+    latencies = []
+    for param in params:
+        started = time.perf_counter()
+        conn.execute(query, param).first()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    legacy_tokens = [str(uuid.uuid4()) for _ in range(args.links)]
+    tokens = [secrets.token_urlsafe(32) for _ in range(args.links)]
+    sample = random.sample(range(args.links), min(args.lookups, args.links))
+    with engine.connect() as conn:
+        create_tables(conn, legacy_tokens, tokens)
+        conn.commit()
+
+        print(f"{'layout':<6} {'index MB':>9} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+        cases = (
+            ("plain", "enlaces_url", "enlace_url",
+             text("SELECT enlace_id FROM enlaces_url WHERE enlace_url = :url"),
+             [{"url": legacy_tokens[i]} for i in sample]),
+            ("hash", "enlaces_correo", "token_hash",
+             text("SELECT enlace_id FROM enlaces_correo WHERE token_hash = :token_hash"),
+             [{"token_hash": hash_token(tokens[i])} for i in sample]),
+        )
+        for name, table, column, query, params in cases:
+            latencies = sorted(time_lookups(conn, query, params))
+            p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+            print(
+                f"{name:<6} {index_size(conn, table, column) / 2**20:>9.2f} "
+                f"{statistics.fmean(latencies) * 1e6:>9.1f} {statistics.median(latencies) * 1e6:>9.1f} {p99 * 1e6:>9.1f}"
+            )
+
+        cutoff = datetime.utcnow() - timedelta(days=1)
+        swept, batches = 0, []
+        while True:
+            started = time.perf_counter()
+            removed = conn.execute(DELETE_BATCH_QUERY, {"cutoff": cutoff, "limit": args.batch_size}).rowcount
+            conn.commit()
+            batches.append(time.perf_counter() - started)
+            swept += removed
+            if removed < args.batch_size:
+                break
+        print(
+            f"sweep: {swept} expired links in {len(batches)} batches, "
+            f"{statistics.fmean(batches) * 1000:.1f} ms per batch of {args.batch_size}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark of transactional email rendering.
+
+Compares the original per-email work (format the HTML f-string, build a
+`MIMEText` and serialize it with `as_string()`) with the precompiled
+templates of `utils.email_templates` plus `build_message`, which also adds
+the plain-text alternative. Checks that the new message parses back to the
+same HTML body.
+
+    python benchmarks/email_render_bench.py --emails 10000
+"""
+
+import argparse
+import email
+import os
+import sys
+import time
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.email_templates import TEMPLATES_DIR, build_message, email_templates  # noqa: E402
+
+SENDER = "Plaze Soporte <soporte@example.com>"
+
+with open(os.path.join(TEMPLATES_DIR, "bloqueo_cuenta.html"), encoding="utf-8") as f:
+    LEGACY_SOURCE = f.read()
+
+
+def legacy(i: int) -> str:
+    nombre, enlace = f"Usuario {i}", f"https://plaze.example/reset-password?token={i:032x}"
+    body = LEGACY_SOURCE.replace("{{ nombre }}", nombre).replace("{{ enlace }}", enlace)
+    msg = MIMEText(body, "html")
+    msg["Subject"] = "❌ Cuenta bloqueada temporalmente"
+    msg["From"] = SENDER
+    msg["To"] = f"user{i}@example.com"
+    return msg.as_string()
+
+
+def templated(i: int) -> str:
+    rendered = email_templates.render(
+        "bloqueo_cuenta", nombre=f"Usuario {i}", enlace=f"https://plaze.example/reset-password?token={i:032x}",
+    )
+    return build_message(SENDER, f"user{i}@example.com", rendered.subject, rendered.html, rendered.text)
+
+
+def timed(fn, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=10_000)
+    args = parser.parse_args()
+
+    parsed = email.message_from_string(templated(7))
+    html_part = [p for p in parsed.walk() if p.get_content_type() == "text/html"][0]
+    legacy_html = email.message_from_string(legacy(7)).get_payload(decode=True)
+    same = html_part.get_payload(decode=True) == legacy_html
+
+    old = timed(legacy, args.emails)
+    new = timed(templated, args.emails)
+    print(f"{'path':<22} {'us/email':>9}")
+    print(f"{'f-string + MIMEText':<22} {old / args.emails * 1e6:>9.1f}")
+    print(f"{'templates (text+html)':<22} {new / args.emails * 1e6:>9.1f}")
+    print(f"speedup {old / new:.1f}x, same HTML body: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Throughput benchmark of the load balancer simulator.
+
+Compares the previous proxy (a new `httpx.AsyncClient`, and so a new TCP
+connection, per request; body decoded with `response.json()`) with the
+current streaming proxy in `routers_.load_balancer` (one pooled keep-alive
+client, raw pass-through), once per balancing strategy.
+
+All proxies front the same two stub backends, which return a fixed JSON
+payload; `--slow-ms` delays every answer of the second one, to see how each
+strategy keeps the tail latency down when one instance is slow. Every
+server runs in its own uvicorn process; the load is generated with
+`load_test.run_level`:
+
+    python benchmarks/load_balancer_bench.py --concurrency 10 50 --duration 10 --payload-kb 4
+    python benchmarks/load_balancer_bench.py --strategies random round_robin p2c ewma --slow-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import run_level  # noqa: E402
+
+BACKEND_PORTS = (8101, 8102)
+LEGACY_PORT = 8110
+STRATEGY_PORT = 8111
+
+
+# ---------- Stub backend ---------- #
+backend_app = FastAPI()
+_PAYLOAD = json.dumps(
+    [{"producto": "tomate", "mercado": "minorista", "precio": 1000 + i} for i in range(
+        int(os.getenv("BENCH_PAYLOAD_KB", "4")) * 1024 // 60
+    )]
+).encode()
+_DELAY = float(os.getenv("BENCH_DELAY_MS", "0")) / 1000
+
+
+@backend_app.get("/{path:path}")
+async def backend(path: str):
+    if _DELAY and path != "health":
+        await asyncio.sleep(_DELAY)
+    return Response(_PAYLOAD, media_type="application/json")
+
+
+# ---------- Previous proxy ---------- #
+legacy_app = FastAPI()
+LEGACY_BACKENDS = [b for b in os.getenv("LB_BACKENDS", "").split(",") if b]
+
+
+@legacy_app.get("/{path:path}")
+async def legacy_proxy(path: str):
+    """
+    Previous implementation: one client (and connection) per request.
+    """
+    backend = random.choice(LEGACY_BACKENDS)
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{backend}/{path}")
+            return response.json()
+    except Exception as e:
+        return {"error": f"Fallo en {backend}", "details": str(e)}
+
+
+# ---------- Runner ---------- #
+def _serve(app: str, port: int, env: dict, app_dir: str = BENCH_DIR) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--app-dir", app_dir, app,
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=SERVER_DIR, env=env,
+    )
+
+
+def _wait_ready(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/ping", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servidor en el puerto {port} no respondió")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--payload-kb", type=int, default=4, help="Size of the backend response")
+    parser.add_argument("--strategies", nargs="+", default=["p2c"], help="Strategies of the pooled proxy")
+    parser.add_argument("--slow-ms", type=float, default=0, help="Delay added by the second backend")
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        BENCH_PAYLOAD_KB=str(args.payload_kb),
+        LB_BACKENDS=",".join(f"http://127.0.0.1:{port}" for port in BACKEND_PORTS),
+    )
+    processes = [
+        _serve("load_balancer_bench:backend_app", port, dict(env, BENCH_DELAY_MS=str(args.slow_ms if i else 0)))
+        for i, port in enumerate(BACKEND_PORTS)
+    ]
+    proxies = [("legacy", LEGACY_PORT)]
+    processes.append(_serve("load_balancer_bench:legacy_app", LEGACY_PORT, env))
+    for i, strategy in enumerate(args.strategies):
+        proxies.append((strategy, STRATEGY_PORT + i))
+        processes.append(_serve("routers_.load_balancer:app", STRATEGY_PORT + i, dict(env, LB_STRATEGY=strategy), SERVER_DIR))
+    try:
+        for port in (*BACKEND_PORTS, *(port for _, port in proxies)):
+            _wait_ready(port)
+
+        print(f"{'proxy':<18} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for concurrency in args.concurrency:
+            for name, port in proxies:
+                result = await run_level(f"http://127.0.0.1:{port}/prices", concurrency, args.duration)
+                print(
+                    f"{name:<18} {concurrency:>7} {result['rps']:>9.1f} "
+                    f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['errors']:>6}"
+                )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(10)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
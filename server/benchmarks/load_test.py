@@ -0,0 +1,115 @@
+"""
+HTTP load test for the Plaze API.
+
+Measures throughput (req/s) and latency percentiles of one or more endpoints
+at several levels of concurrent clients. Each client keeps one connection
+open and sends requests back to back for the configured duration.
+
+To compare the blocking (threadpool) routes with the async ones, start the
+API twice, e.g. the previous release on port 8000 and the current code on
+port 8001, and pass both URLs:
+
+    uvicorn main:app --port 8000   # previous release
+    uvicorn main:app --port 8001   # current code
+
+    python benchmarks/load_test.py \\
+        --url http://127.0.0.1:8000 --url http://127.0.0.1:8001 \\
+        --path "/prices/latest/?product_name=tomate&market_name=minorista" \\
+        --path "/price-history/tomate?months=12" \\
+        --concurrency 50 200 1000 --duration 10
+
+Note:
+    The load generator is a single Python process; for 1000+ clients make
+    sure it is not the bottleneck (watch its CPU usage) or run several
+    copies in parallel and add up the results.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+# Backoff after a connection error, doubled on each consecutive one (seconds)
+ERROR_BACKOFF = 0.01
+ERROR_BACKOFF_MAX = 1.0
+
+
+async def _client(client: httpx.AsyncClient, url: str, deadline: float,
+                  latencies: List[float], errors: List[int]) -> None:
+    backoff = ERROR_BACKOFF
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+            # Do not spin on a server that refuses connections
+            await asyncio.sleep(min(backoff, max(0.0, deadline - time.perf_counter())))
+            backoff = min(backoff * 2, ERROR_BACKOFF_MAX)
+            continue
+        backoff = ERROR_BACKOFF
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(url: str, concurrency: int, duration: float) -> dict:
+    """
+    Run `concurrency` clients against `url` for `duration` seconds.
+
+    Returns:
+        dict: requests per second, latency percentiles (ms) and error count.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies: List[float] = []
+    errors: List[int] = []
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await client.get(url)  # warm up caches and the connection pool
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client(client, url, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(0.50),
+        "p99": percentile(0.99),
+        "mean": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "errors": len(errors),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", required=True, help="Base URL of a running API (repeatable)")
+    parser.add_argument("--path", action="append", required=True, help="Endpoint path with query (repeatable)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    args = parser.parse_args()
+
+    print(f"{'base url':<26} {'path':<48} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for path in args.path:
+        for concurrency in args.concurrency:
+            for base_url in args.url:
+                result = await run_level(base_url.rstrip("/") + path, concurrency, args.duration)
+                print(
+                    f"{base_url:<26} {path[:48]:<48} {concurrency:>7} {result['rps']:>9.1f} "
+                    f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['errors']:>6}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Concurrency check of the login lock state machine.
+
+Sends `--requests` wrong-password logins for one account at the same time
+to a running API, then checks with the database that the lock state is
+consistent:
+
+    - exactly `MAX_FAILED_ATTEMPTS - 1` answers "wrong password" (400),
+    - exactly one answer locked the account (and queued one lock email),
+    - every other attempt was refused as locked (403), busy (503) or
+      rate limited (429),
+    - `intentos_fallidos` equals `MAX_FAILED_ATTEMPTS` and the account is locked.
+
+The account's counters are reset before the run, and the lock is cleared
+afterwards so the account can be used again.
+
+    RATE_LIMIT_ENABLED=false uvicorn main:app --port 8000   # let all attempts reach login
+    python benchmarks/login_concurrency_check.py --email ana@example.com --requests 100
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from database import SessionLocal  # noqa: E402
+from routers_.auth import MAX_FAILED_ATTEMPTS  # noqa: E402
+
+LOCKED_NOW = "Cuenta bloqueada por múltiples intentos fallidos. Revisa tu correo electrónico."
+
+
+def _reset(email: str) -> None:
+    with SessionLocal() as db:
+        db.execute(
+            text("UPDATE usuarios SET intentos_fallidos = 0, cuenta_bloqueada_hasta = NULL WHERE correo = :correo"),
+            {"correo": email},
+        )
+        db.commit()
+
+
+def _state(email: str, since: datetime) -> tuple:
+    with SessionLocal() as db:
+        user = db.execute(
+            text("SELECT intentos_fallidos, cuenta_bloqueada_hasta FROM usuarios WHERE correo = :correo"),
+            {"correo": email},
+        ).one()
+        emails = db.execute(
+            text("SELECT COUNT(*) FROM correos_salientes WHERE destinatario = :correo AND fecha_creacion >= :since"),
+            {"correo": email, "since": since},
+        ).scalar()
+    return user, emails
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running API")
+    parser.add_argument("--email", required=True, help="Existing account used for the check")
+    parser.add_argument("--requests", type=int, default=100, help="Parallel wrong-password logins")
+    args = parser.parse_args()
+
+    _reset(args.email)
+    since = datetime.utcnow()
+    body = {"email": args.email, "password": "contraseña-incorrecta"}
+    limits = httpx.Limits(max_connections=args.requests)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        responses = await asyncio.gather(*(client.post("/auth/login", json=body) for _ in range(args.requests)))
+
+    outcomes = Counter(
+        "locked_now" if r.status_code == 403 and r.json().get("detail") == LOCKED_NOW else str(r.status_code)
+        for r in responses
+    )
+    user, emails = _state(args.email, since)
+    _reset(args.email)
+
+    print(f"responses: {dict(outcomes)}")
+    print(f"intentos_fallidos={user.intentos_fallidos} bloqueada_hasta={user.cuenta_bloqueada_hasta} lock_emails={emails}")
+    checks = {
+        f"{MAX_FAILED_ATTEMPTS - 1} wrong-password answers": outcomes["400"] == MAX_FAILED_ATTEMPTS - 1,
+        "one attempt locked the account": outcomes["locked_now"] == 1,
+        "only 400/403/429/503 answers": set(outcomes) <= {"400", "403", "429", "503", "locked_now"},
+        f"intentos_fallidos == {MAX_FAILED_ATTEMPTS}": user.intentos_fallidos == MAX_FAILED_ATTEMPTS,
+        "account locked": user.cuenta_bloqueada_hasta is not None,
+        "one lock email queued": emails == 1,
+    }
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark of the cost of `MetricsMiddleware` per request.
+
+Calls a small FastAPI app directly (no HTTP server), with one route taking
+a path parameter, and reports microseconds per request (best of `--rounds`
+alternated rounds):
+
+    - bare: the app alone,
+    - metrics: the app behind `MetricsMiddleware`,
+
+plus the cost of the middleware around an app that answers immediately,
+the time of `RequestMetrics.observe` alone and of rendering the
+`/metrics` page (with `--routes` route templates times 3 status codes of
+series, like a busy worker).
+
+    python benchmarks/metrics_bench.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+
+from utils import metrics  # noqa: E402
+from utils.metrics import MetricsMiddleware, RequestMetrics, render_metrics  # noqa: E402
+
+app = FastAPI()
+
+
+@app.get("/prices/{product_id}")
+async def get_price(product_id: int):
+    return {"product_id": product_id, "precio_por_kg": 4200}
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def send(message):
+    pass
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def run(asgi_app, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/prices/{i}", "raw_path": f"/prices/{i}".encode(),
+            "root_path": "", "query_string": b"", "headers": [], "client": ("10.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        await asgi_app(scope, receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    recorder = RequestMetrics()
+    wrapped = MetricsMiddleware(app, metrics=recorder)
+    await run(app, 1000)  # warm up
+    await run(wrapped, 1000)
+    # Alternate rounds and keep the best of each, to filter scheduler noise
+    bare, measured = float("inf"), float("inf")
+    for _ in range(args.rounds):
+        bare = min(bare, await run(app, args.requests // args.rounds))
+        measured = min(measured, await run(wrapped, args.requests // args.rounds))
+    print(f"{'case':<10} {'us/request':>10}")
+    print(f"{'bare':<10} {bare:>10.2f}")
+    print(f"{'metrics':<10} {measured:>10.2f}")
+    print(f"overhead: {measured - bare:.2f} us/request ({(measured - bare) / bare * 100:.1f}%)")
+
+    # The middleware alone, around an app that answers immediately
+    empty, empty_wrapped = float("inf"), float("inf")
+    wrapped_empty = MetricsMiddleware(empty_app, metrics=RequestMetrics())
+    for _ in range(args.rounds):
+        empty = min(empty, await run(empty_app, args.requests // args.rounds))
+        empty_wrapped = min(empty_wrapped, await run(wrapped_empty, args.requests // args.rounds))
+    print(f"middleware alone: {empty_wrapped - empty:.2f} us/request")
+
+    started = time.perf_counter()
+    for i in range(args.requests):
+        recorder.observe("GET", "/prices/{product_id}", 200, 0.0123, 512)
+    print(f"observe: {(time.perf_counter() - started) / args.requests * 1e6:.2f} us")
+
+    # Render time of a busy worker's page: the shared recorder filled with many series
+    for route in range(args.routes):
+        for status in (200, 404, 500):
+            metrics.request_metrics.observe("GET", f"/route/{route}", status, 0.01, 100)
+    started = time.perf_counter()
+    page = render_metrics()
+    print(
+        f"render: {(time.perf_counter() - started) * 1000:.2f} ms for {args.routes * 3} series "
+        f"({len(page.splitlines())} lines, {len(page) / 1024:.0f} KiB)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
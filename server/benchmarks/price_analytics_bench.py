@@ -0,0 +1,163 @@
+"""
+Benchmark of the price history analysis.
+
+Compares the original row-by-row implementation (list of dicts, Python
+loops) with the vectorized one in `utils.price_analytics` on synthetic
+daily series, and checks that both produce the same output.
+
+    python benchmarks/price_analytics_bench.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.price_analytics import analyze_series, history_records, load_series  # noqa: E402
+
+
+# --------------------------------------------------------------------- #
+#   Original implementation (copied from routers_/price_history.py)      #
+# --------------------------------------------------------------------- #
+def legacy_analyze_periods(history: List[Dict]) -> List[Dict]:
+    if len(history) < 2:
+        return []
+
+    periods = []
+    i = 0
+
+    while i < len(history) - 1:
+        start = history[i]
+        initial_price = start["precio_por_kg"]
+        trend = None
+        j = i + 1
+
+        while j < len(history):
+            current_price = history[j]["precio_por_kg"]
+            previous_price = history[j - 1]["precio_por_kg"]
+            variation = ((current_price - previous_price) / previous_price) * 100
+
+            if variation > 2:
+                new_trend = "Aumento"
+            elif variation < -2:
+                new_trend = "Disminución"
+            else:
+                new_trend = "Estabilidad"
+
+            if trend is None:
+                trend = new_trend
+            elif trend != new_trend:
+                break
+
+            j += 1
+
+        end = history[j - 1]
+        total_var = ((end["precio_por_kg"] - initial_price) / initial_price) * 100
+
+        periods.append({
+            "fecha_inicio": start["fecha"],
+            "fecha_fin": end["fecha"],
+            "precio_inicio": initial_price,
+            "precio_fin": end["precio_por_kg"],
+            "tendencia": trend,
+            "variacion_porcentual": round(total_var, 2)
+        })
+
+        i = j
+
+    return periods
+
+
+def legacy_analysis(rows) -> Dict:
+    history = [{
+        "fecha": (r[0].isoformat() if hasattr(r[0], "isoformat") else str(r[0])),
+        "precio_por_kg": float(r[1])
+    } for r in rows]
+
+    initial_price = history[0]["precio_por_kg"]
+    final_price = history[-1]["precio_por_kg"]
+    percent_change = ((final_price - initial_price) / initial_price) * 100
+
+    if percent_change > 5:
+        trend_general = "Aumento"
+    elif percent_change < -5:
+        trend_general = "Disminución"
+    else:
+        trend_general = "Estabilidad"
+
+    prices = [p["precio_por_kg"] for p in history]
+    avg_price = sum(prices) / len(prices)
+
+    return {
+        "tendencia_general": trend_general,
+        "estadisticas": {
+            "precio_inicial": initial_price,
+            "precio_final": final_price,
+            "precio_promedio": round(avg_price, 2),
+            "precio_maximo": max(prices),
+            "precio_minimo": min(prices),
+            "variacion_porcentual": round(percent_change, 2),
+            "total_registros": len(history)
+        },
+        "periodos": legacy_analyze_periods(history),
+        "historial": history,
+    }
+
+
+def vectorized_analysis(rows) -> Dict:
+    series = load_series(rows)
+    analysis = analyze_series(series)
+    analysis["historial"] = history_records(series)
+    return analysis
+
+
+# --------------------------------------------------------------------- #
+#   Benchmark                                                            #
+# --------------------------------------------------------------------- #
+def make_rows(size: int, seed: int = 42):
+    """
+    Return `size` (date, Decimal) rows of a daily random-walk price series,
+    like the rows returned by the historial_precios query.
+    """
+    rng = random.Random(seed)
+    start = date(1900, 1, 1)
+    price = 4000.0
+    rows = []
+    for day in range(size):
+        price = max(100.0, price * (1 + rng.gauss(0, 0.025)))
+        rows.append((start + timedelta(days=day), Decimal(f"{price:.2f}")))
+    return rows
+
+
+def best_of(fn, rows, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best time is reported)")
+    args = parser.parse_args()
+
+    print(f"{'points':>10} {'legacy ms':>11} {'vectorized ms':>14} {'speedup':>8}  same output")
+    for size in args.sizes:
+        rows = make_rows(size)
+        same = legacy_analysis(rows) == vectorized_analysis(rows)
+        legacy = best_of(legacy_analysis, rows, args.repeat)
+        vectorized = best_of(vectorized_analysis, rows, args.repeat)
+        print(f"{size:>10} {legacy * 1000:>11.1f} {vectorized * 1000:>14.1f} {legacy / vectorized:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
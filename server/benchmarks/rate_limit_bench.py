@@ -0,0 +1,75 @@
+"""
+Benchmark of the cost of `RateLimitMiddleware` per request.
+
+Calls the middleware directly (no HTTP server) in front of an empty ASGI
+app and reports microseconds per request for:
+
+    - a path without rules (pass-through),
+    - an allowed login (body read, parsed and replayed, limits consumed),
+    - a rejected login (429 without reaching the app).
+
+Uses the backend selected by the environment: in-process, or Redis when
+`REDIS_URL` is set (rejections then come from the local deny cache).
+
+    python benchmarks/rate_limit_bench.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limiting import RULES, RateLimiter, RateLimitMiddleware  # noqa: E402
+
+
+async def empty_app(scope, receive, send):
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def send(message):
+    pass
+
+
+def make_scope(path: str, client: str) -> dict:
+    return {"type": "http", "method": "POST", "path": path, "headers": [], "client": (client, 50000)}
+
+
+async def run(middleware, path: str, body: bytes, requests: int, distinct_clients: bool) -> float:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    started = time.perf_counter()
+    for i in range(requests):
+        client = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" if distinct_clients else "10.0.0.1"
+        await middleware(make_scope(path, client), receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    login = next(rule for rule in RULES if rule.name == "login")
+    # Only the per-IP limit, so distinct clients are always allowed
+    allow_rule = login._replace(limits={"ip": login.limits["ip"]})
+    body = json.dumps({"email": "ana@example.com", "password": "Secret123!"}).encode()
+
+    limiter = RateLimiter()
+    middleware = RateLimitMiddleware(empty_app, limiter=limiter, rules=(allow_rule,))
+    print(f"backend: {type(limiter.backend).__name__}")
+    print(f"{'case':<14} {'us/request':>10}")
+    print(f"{'no rule':<14} {await run(middleware, '/prices/', b'', args.requests, True):>10.2f}")
+    print(f"{'allowed':<14} {await run(middleware, '/auth/login', body, args.requests, True):>10.2f}")
+    print(f"{'rejected':<14} {await run(middleware, '/auth/login', body, args.requests, False):>10.2f}")
+    print(f"rejected: {limiter.rejected.get('login', 0)} of {args.requests}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
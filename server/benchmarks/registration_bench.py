@@ -0,0 +1,100 @@
+"""
+Benchmark of the database part of user registration.
+
+Compares, per registration of a new email:
+
+    - supabase: the previous path, two sequential HTTPS calls through the
+      Supabase client (`select` on the email, then `insert`),
+    - sql: the current path, one `INSERT ... ON CONFLICT DO NOTHING
+      RETURNING` on the pooled async engine (`REGISTER_USER_QUERY`).
+
+The Argon2 hash is the same on both paths and is left out (a fixed hash is
+stored). Users created by the benchmark use emails
+`bench-<n>-<random>@example.invalid` and are deleted at the end.
+
+The supabase path needs `SUPABASE_URL` and `SUPABASE_KEY` of a reachable
+project, and network access to it; without them it is reported as not
+measured and only the sql path runs.
+
+    python benchmarks/registration_bench.py --requests 200
+    python benchmarks/registration_bench.py --requests 200 --paths sql   # without Supabase access
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from database import AsyncSessionLocal, SessionLocal  # noqa: E402
+from routers_.user_registration import REGISTER_USER_QUERY  # noqa: E402
+
+FIXED_HASH = "$argon2id$v=19$m=65536,t=3,p=4$YmVuY2htYXJr$YmVuY2htYXJrYmVuY2htYXJrYmVuY2htYXJr"
+
+
+def register_supabase(client, email: str) -> None:
+    existing = client.table("usuarios").select("*").eq("correo", email).execute()
+    if not existing.data:
+        client.table("usuarios").insert({"nombre": "Bench", "correo": email, "contrasena_hash": FIXED_HASH}).execute()
+
+
+async def register_sql(email: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(REGISTER_USER_QUERY, {"nombre": "Bench", "correo": email, "contrasena_hash": FIXED_HASH})
+        await db.commit()
+
+
+def summarize(name: str, latencies) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    print(
+        f"{name:<10} {len(latencies):>8} {statistics.fmean(latencies) * 1000:>9.2f} "
+        f"{statistics.median(latencies) * 1000:>9.2f} {p99 * 1000:>9.2f}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Registrations per path")
+    parser.add_argument("--paths", nargs="+", choices=["supabase", "sql"], default=["supabase", "sql"])
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    print(f"{'path':<10} {'requests':>8} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    try:
+        if "supabase" in args.paths:
+            from supabase import create_client
+
+            try:
+                client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+                latencies = []
+                for i in range(args.requests):
+                    started = time.perf_counter()
+                    register_supabase(client, f"bench-s{i}-{run_id}@example.invalid")
+                    latencies.append(time.perf_counter() - started)
+                summarize("supabase", latencies)
+            except Exception as e:
+                print(f"{'supabase':<10} not measured: {type(e).__name__}: {e}")
+
+        if "sql" in args.paths:
+            await register_sql(f"bench-warmup-{run_id}@example.invalid")  # open the pool
+            latencies = []
+            for i in range(args.requests):
+                started = time.perf_counter()
+                await register_sql(f"bench-q{i}-{run_id}@example.invalid")
+                latencies.append(time.perf_counter() - started)
+            summarize("sql", latencies)
+    finally:
+        with SessionLocal() as db:
+            db.execute(text("DELETE FROM usuarios WHERE correo LIKE :pattern"), {"pattern": f"bench-%-{run_id}@example.invalid"})
+            db.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Benchmark of the token check done by every authenticated request.
+
+Compares `get_current_user_from_token` with a freshly decoded token on each
+call (the previous behaviour: `jwt.decode` per request) against the cached
+path in `jwt_manager.verified_token_cache`, over a pool of distinct tokens
+requested in random order.
+
+    python benchmarks/token_cache_bench.py --tokens 100 --requests 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+import jwt_manager  # noqa: E402
+from routers_ import auth  # noqa: E402
+
+
+def uncached_check(header: str) -> dict:
+    """
+    Previous request path: split the header, decode the token, check revocation.
+    """
+    token = auth.get_bearer_token(header)
+    payload = jwt_manager.verify_token(token)
+    auth.check_token_not_revoked(payload)
+    return payload
+
+
+def run(fn, headers, requests: int, seed: int = 7) -> float:
+    rng = random.Random(seed)
+    sequence = [rng.choice(headers) for _ in range(requests)]
+    started = time.perf_counter()
+    for header in sequence:
+        fn(header)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100, help="Distinct tokens in use")
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+
+    headers = [
+        "Bearer " + jwt_manager.create_access_token({"sub": f"user{i}@example.com", "rol": "usuario"})
+        for i in range(args.tokens)
+    ]
+
+    uncached = run(uncached_check, headers, args.requests)
+    cache = jwt_manager.verified_token_cache
+    cached = run(auth.get_current_user_from_token, headers, args.requests)
+
+    print(f"{'path':<10} {'total s':>9} {'us/request':>11}")
+    print(f"{'uncached':<10} {uncached:>9.3f} {uncached / args.requests * 1e6:>11.1f}")
+    print(f"{'cached':<10} {cached:>9.3f} {cached / args.requests * 1e6:>11.1f}")
+    print(f"speedup {uncached / cached:.1f}x, cache {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
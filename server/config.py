@@ -0,0 +1,50 @@
+"""
+Environment configuration module.
+
+Loads `/server/.env` into the process environment exactly once, the first
+time this module is imported. Modules that read settings with `os.getenv`
+at import time import it first instead of calling `load_dotenv` themselves,
+so the file is parsed a single time however many modules need it.
+
+Variables already present in the environment take precedence over the file.
+
+Usage:
+    import config  # noqa: F401  (loads .env)
+    import os
+
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    # On/off flags, parsed the same way everywhere
+    from config import env_bool
+
+    RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+# The .env file must live next to this module (inside /server)
+ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+
+load_dotenv(dotenv_path=ENV_PATH)
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """
+    Read an on/off flag from the environment.
+
+    "1", "true" and "yes" (any case, surrounding spaces ignored) are true;
+    any other value is false. Unset or empty variables give `default`.
+
+    Args:
+        name (str): Environment variable.
+        default (bool): Value when the variable is not set.
+
+    Returns:
+        bool: The flag.
+    """
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes")
@@ -1,32 +1,186 @@
 # database.py
 """
 This module sets up the SQLAlchemy database connection and session for the application.
-- Loads environment variables using python-dotenv.
+- Loads environment variables from /server/.env (see `config`).
 - Retrieves the database URL from environment variables.
 - Creates a SQLAlchemy engine using the database URL.
 - Configures a session factory (`SessionLocal`) for database interactions.
+- Creates an async engine (asyncpg) and session factory (`AsyncSessionLocal`)
+  for non-blocking `async def` routes.
+- Configures both connection pools from environment variables and records
+  pool metrics (see `get_pool_stats`).
 - Defines a base class (`Base`) for declarative ORM models.
 
+Pool Environment Variables:
+    DB_POOL_SIZE: Persistent connections per engine (default: 5).
+    DB_MAX_OVERFLOW: Extra connections allowed under load (default: 10).
+    DB_POOL_TIMEOUT: Seconds to wait for a free connection (default: 30).
+    DB_POOL_RECYCLE: Seconds before a connection is replaced (default: 1800).
+    DB_POOL_PRE_PING: Test connections before use, "true"/"false" (default: true).
+    DB_STATEMENT_TIMEOUT_MS: Server-side statement timeout, 0 disables (default: 0).
+    DB_PGBOUNCER: Set to "true" behind pgbouncer/Supavisor in transaction
+        mode to disable asyncpg's prepared statement caches (default: false).
+
+    Each worker opens up to 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+    (sync and async engines), so keep
+    workers * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the database limit.
+
 Usage:
-    Import `SessionLocal` to create database sessions.
+    Use `Depends(get_async_db)` in `async def` routes.
+    Use `Depends(get_db)` in sync routes, or `SessionLocal` in background jobs.
     Inherit from `Base` to define ORM models.
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+import threading
+import time
+from config import env_bool  # (also loads .env)
 
 # Database URL from .env
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_PGBOUNCER = env_bool("DB_PGBOUNCER", False)
+
+
+# ========================================
+# Pool instrumentation
+# ========================================
+class PoolMetrics:
+    """
+    Counters describing how a connection pool is being used.
+
+    Attributes:
+        checkouts (int): Connections handed out by the pool.
+        wait_seconds_total (float): Time spent waiting for a connection.
+        wait_seconds_max (float): Longest single wait.
+        overflow_events (int): Connections opened beyond `DB_POOL_SIZE`.
+        timeouts (int): Checkouts that failed after `DB_POOL_TIMEOUT`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record_checkout(self, waited: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self, waited: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class InstrumentedPoolMixin:
+    """
+    Records wait time, overflow connections and timeouts of every checkout.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        overflowed = self._overflow > overflow_before and self._overflow > 0
+        self.metrics.record_checkout(time.perf_counter() - start, overflowed)
+        return record
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
 # SQLAlchemy engine and session
-engine = create_engine(DATABASE_URL)
+_sync_connect_args = {}
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    _sync_connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    connect_args=_sync_connect_args,
+    **POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_url(url: str):
+    """
+    Convert the database URL to the asyncpg driver.
+
+    asyncpg does not understand libpq's `sslmode` query parameter, so it is
+    moved to the `ssl` connect argument.
+
+    Returns:
+        tuple: (sqlalchemy URL, connect_args dict)
+    """
+    async_url = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(async_url.query)
+    connect_args = {}
+    sslmode = query.pop("sslmode", None)
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    return async_url.set(query=query), connect_args
+
+
+# Async SQLAlchemy engine and session (asyncpg)
+_async_url, _async_connect_args = get_async_url(DATABASE_URL)
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    _async_connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+if DB_PGBOUNCER:
+    # Transaction pooling cannot keep prepared statements between transactions
+    _async_connect_args["statement_cache_size"] = 0
+    _async_connect_args["prepared_statement_cache_size"] = 0
+
+async_engine = create_async_engine(
+    _async_url,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args=_async_connect_args,
+    **POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base class for ORM models
 Base = declarative_base()
 
@@ -40,3 +194,45 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pool_stats(pool) -> dict:
+    metrics = pool.metrics
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": checked_out,
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+        "checkouts": metrics.checkouts,
+        "wait_seconds_total": round(metrics.wait_seconds_total, 6),
+        "wait_seconds_max": round(metrics.wait_seconds_max, 6),
+        "overflow_events": metrics.overflow_events,
+        "timeouts": metrics.timeouts,
+    }
+
+
+def get_pool_stats() -> dict:
+    """
+    Return current usage and cumulative metrics of both connection pools.
+
+    Returns:
+        dict: {"sync": {...}, "async": {...}} with checked-out, idle and
+            overflow connections, saturation (checked out / capacity),
+            checkout count, wait times, overflow events and timeouts.
+    """
+    return {
+        "sync": _pool_stats(engine.pool),
+        "async": _pool_stats(async_engine.sync_engine.pool),
+    }
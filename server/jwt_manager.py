@@ -5,24 +5,37 @@ This module provides functionality to create and verify JWT access tokens
 for user authentication. It uses the Jose library for token encoding/decoding
 and includes security features like expiration times and unique token identifiers.
 
+Verified tokens are kept in a bounded in-process LRU (`verified_token_cache`)
+so the signature of a given token is checked once per process instead of on
+every request. Cached entries are dropped once the token's `exp` passes;
+revocation is not cached and must still be checked by the caller on every
+request (see `routers_.auth.get_current_user_from_token`).
+
+Environment Variables:
+    TOKEN_CACHE_MAX_ENTRIES: Capacity of the verified-token LRU (default: 1024,
+        0 disables the cache).
+
 Security Note:
     Keep SECRET_KEY and other sensitive configuration out of source code.
     Always use environment variables in production environments.
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 import os
-from dotenv import load_dotenv
+import threading
+import time
+import config  # noqa: F401  (loads .env)
 from uuid import uuid4
 
-load_dotenv()
-
 # Get secret and algorithm from environment (fallback values for local dev)
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 # Default token lifetime in minutes
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# Capacity of the verified-token cache
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "1024"))
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -87,3 +100,78 @@ def verify_token(token: str) -> dict:
     except JWTError as e:
         # Let caller handle the exception (e.g., raise HTTPException)
         raise e
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of verified token -> decoded payload.
+
+    Only tokens that passed `verify_token` are stored, together with their
+    `exp`; a cached token is served until it expires, after which it is
+    evicted and verified again (which raises the usual expiration error).
+
+    Attributes:
+        max_entries (int): Maximum number of cached tokens (0 disables caching).
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to verify the signature.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # token -> (exp epoch seconds, payload)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def verify(self, token: str) -> dict:
+        """
+        Return the decoded payload of `token`, verifying it only on a miss.
+
+        Raises:
+            JWTError: If the token is invalid or expired (see `verify_token`).
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    # Copy so callers cannot alter the cached claims
+                    return dict(entry[1])
+                del self._entries[token]
+            self.misses += 1
+
+        payload = verify_token(token)
+        exp = payload.get("exp")
+        if self.max_entries > 0 and isinstance(exp, (int, float)):
+            with self._lock:
+                self._entries[token] = (exp, payload)
+                self._entries.move_to_end(token)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return dict(payload)
+
+    def invalidate(self, token: str) -> None:
+        """
+        Drop a token from the cache (e.g. after logout).
+        """
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def stats(self) -> dict:
+        """
+        Return the cache size and hit/miss counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache used by the auth dependencies
+verified_token_cache = VerifiedTokenCache()
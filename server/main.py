@@ -2,28 +2,140 @@
 Main application module for Market Prices Plaze API.
 
 This module initializes the FastAPI application, configures CORS middleware,
-creates database tables, and registers all API routers for different
-functional domains (authentication, prices, health checks, etc.).
+and registers all API routers for different functional domains
+(authentication, prices, health checks, etc.).
+
+Importing this module has no network side effects: database tables are
+managed by the explicit migration command (`python -m schema`), clients are
+created on first use, and background workers start in the lifespan handler.
+Import and initialization times are reported at startup and served at
+`GET /health/startup`.
+
+Environment Variables:
+    RUN_MIGRATIONS_ON_STARTUP: Run `schema.migrate` when the app starts,
+        for local development (default: false).
 """
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware  # CORS middleware for cross-origin requests
-from routers_.user_registration import router as user_registration_router
-from routers_ import auth, password_recovery
-from routers_.prices import router as prices_router
-from database import Base, engine
-from dotenv import load_dotenv
-from routers_.health_routes import router as health_router
-from routers_.maintenance_routes import router as maintenance_router
-from routers_.price_history import router as price_history_router
+from utils.startup_timing import startup_report
+
+import asyncio
+from contextlib import asynccontextmanager
+
+# Loads .env once for every module
+startup_report.import_module("config")
 
-# Load environment variables
-load_dotenv()
+from fastapi import FastAPI  # noqa: E402
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # CORS middleware for cross-origin requests  # noqa: E402
 
-# Create tables if they do not exist
-Base.metadata.create_all(bind=engine)
+# (module, tags) of every router, imported (and timed) in this order
+ROUTERS = [
+    ("routers_.user_registration", None),
+    ("routers_.auth", ["Auth"]),
+    ("routers_.password_recovery", ["Password Recovery"]),
+    ("routers_.prices", ["Prices"]),
+    ("routers_.health_routes", None),
+    ("routers_.maintenance_routes", None),
+    ("routers_.price_history", None),
+    ("routers_.admin_prices", None),
+]
+router_modules = [(startup_report.import_module(name), tags) for name, tags in ROUTERS]
 
-app = FastAPI(title="Market Prices Plaze API 🛒")
+from config import env_bool  # noqa: E402
+from database import AsyncSessionLocal, engine  # noqa: E402
+from schema import migrate  # noqa: E402
+from utils.product_search import product_search_index  # noqa: E402
+from utils.password_hashing import password_hasher  # noqa: E402
+from utils.email_outbox import EMAIL_OUTBOX_ENABLED, email_outbox_worker  # noqa: E402
+from utils.link_maintenance import LINK_SWEEP_ENABLED, email_link_sweeper  # noqa: E402
+from utils.maintenance_windows import MAINTENANCE_MIDDLEWARE, MaintenanceMiddleware, maintenance_index  # noqa: E402
+from utils.rate_limiting import RATE_LIMIT_ENABLED, RateLimitMiddleware  # noqa: E402
+from utils.metrics import METRICS_ENABLED, MetricsMiddleware  # noqa: E402
+
+RUN_MIGRATIONS_ON_STARTUP = env_bool("RUN_MIGRATIONS_ON_STARTUP", False)
+
+
+async def build_search_index():
+    """
+    Build the in-memory product search index in the background.
+
+    Failures are not fatal: the index is built lazily on the first search.
+    """
+    try:
+        with startup_report.measure("init", "product search index"):
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(product_search_index.rebuild)
+    except Exception:
+        product_search_index.invalidate()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start background workers without waiting on the network, and stop
+    them on shutdown.
+
+    - Schema migrations only run here when `RUN_MIGRATIONS_ON_STARTUP` is set.
+    - The product search index is built in a background task, so the
+      worker accepts requests even if the database is slow.
+    - The email outbox worker, the expired email link sweeper and the
+      maintenance window refresher run in their own threads.
+    """
+    if RUN_MIGRATIONS_ON_STARTUP:
+        with startup_report.measure("init", "schema migrations"):
+            await run_in_threadpool(migrate, engine)
+    if EMAIL_OUTBOX_ENABLED:
+        with startup_report.measure("init", "email outbox worker"):
+            email_outbox_worker.start()
+    if LINK_SWEEP_ENABLED:
+        with startup_report.measure("init", "email link sweeper"):
+            email_link_sweeper.start()
+    with startup_report.measure("init", "maintenance refresher"):
+        maintenance_index.start()
+    search_index_task = asyncio.create_task(build_search_index())
+
+    startup_report.finish()
+    print(startup_report.format())
+
+    try:
+        yield
+    finally:
+        search_index_task.cancel()
+        maintenance_index.stop()
+        email_link_sweeper.stop()
+        # Undelivered emails stay queued
+        email_outbox_worker.stop()
+        password_hasher.shutdown()
+
+
+app = FastAPI(title="Market Prices Plaze API 🛒", lifespan=lifespan)
+
+# ========================================
+# Maintenance Mode
+# ========================================
+# Optionally answer 503 during active maintenance windows, from memory.
+# Added before CORS so CORS stays the outermost layer and the frontend can
+# read the 503 response.
+if MAINTENANCE_MIDDLEWARE:
+    app.add_middleware(MaintenanceMiddleware)
+
+# ========================================
+# Rate Limiting
+# ========================================
+# Throttle login, password recovery and registration per client, per
+# account and per route before any route code (Argon2, SMTP, Supabase)
+# runs. Also inside CORS, so the frontend can read the 429 response.
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# ========================================
+# Metrics
+# ========================================
+# Record latency, status and response size per route, served with the
+# other subsystem counters at GET /metrics. Outside the rate limiter and
+# maintenance mode so their 429 and 503 answers are counted too.
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # ========================================
 # CORS Configuration
@@ -45,13 +157,9 @@ app.add_middleware(
 )
 
 # Include routers
-app.include_router(user_registration_router)
-app.include_router(auth.router, tags=["Auth"])
-app.include_router(password_recovery.router, tags=["Password Recovery"])
-app.include_router(prices_router, tags=["Prices"])
-app.include_router(health_router)
-app.include_router(maintenance_router)
-app.include_router(price_history_router)
+for module, tags in router_modules:
+    app.include_router(module.router, tags=tags)
+
 
 @app.get("/")
 def root():
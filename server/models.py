@@ -9,7 +9,7 @@ Note:
     Column names in Spanish are maintained to match the existing database schema.
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, DECIMAL, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Date, DECIMAL, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -57,12 +57,15 @@ class EmailLink(Base):
 
     This model stores temporary links sent to users for email verification
     or password recovery purposes. Links have expiration times and can only
-    be used once.
+    be used once. Only a SHA-256 hash of the token is stored; expired links
+    are removed by the link sweeper (`utils.link_maintenance`).
 
     Attributes:
         enlace_id (int): Primary key, unique link identifier.
         usuario_id (int): Foreign key referencing the user.
-        enlace_url (str): Unique URL string for the link (max 500 chars).
+        token_hash (bytes): SHA-256 of the link token (32 bytes, unique).
+        enlace_url (str): Legacy plain token column, no longer written
+            (max 500 chars).
         tipo (str): Link type, e.g., "password_recovery" or "email_verification"
             (max 30 chars).
         expira_en (datetime): Expiration timestamp for the link.
@@ -77,15 +80,52 @@ class EmailLink(Base):
 
     enlace_id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.usuario_id"), nullable=False)
-    enlace_url = Column(String(500), unique=True, nullable=False)
+    token_hash = Column(LargeBinary(32), unique=True, nullable=False)
+    enlace_url = Column(String(500), nullable=True)
     tipo = Column(String(30), nullable=False)
-    expira_en = Column(DateTime, nullable=False)
+    expira_en = Column(DateTime, nullable=False, index=True)
     usado = Column(Boolean, default=False)
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="enlaces")
 
 
+class OutboxEmail(Base):
+    """
+    ORM model for the outbound email queue.
+
+    Routes enqueue emails here and return immediately; the outbox worker
+    (`utils.email_outbox`) sends them over a reused SMTP connection and
+    retries failures with exponential backoff.
+
+    Attributes:
+        correo_id (int): Primary key, unique email identifier.
+        destinatario (str): Recipient address.
+        asunto (str): Subject line.
+        cuerpo_html (str): HTML body.
+        cuerpo_texto (str): Plain-text alternative body, if any.
+        estado (str): "pendiente", "enviado" or "fallido", defaults to "pendiente".
+        intentos (int): Delivery attempts made, defaults to 0.
+        proximo_intento (datetime): Earliest time of the next attempt (UTC).
+        ultimo_error (str): Error of the last failed attempt, if any.
+        fecha_creacion (datetime): Enqueue timestamp, defaults to UTC now.
+        fecha_envio (datetime): Delivery timestamp, None until sent.
+    """
+    __tablename__ = "correos_salientes"
+
+    correo_id = Column(Integer, primary_key=True, index=True)
+    destinatario = Column(String, nullable=False)
+    asunto = Column(String(200), nullable=False)
+    cuerpo_html = Column(Text, nullable=False)
+    cuerpo_texto = Column(Text, nullable=True)
+    estado = Column(String(20), nullable=False, default="pendiente")
+    intentos = Column(Integer, nullable=False, default=0)
+    proximo_intento = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_envio = Column(DateTime, nullable=True)
+
+
 # ==========================
 # 🏪 Market-related models
 # ==========================
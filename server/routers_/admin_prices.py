@@ -0,0 +1,106 @@
+"""
+Admin price routes module.
+
+This module provides the bulk price ingestion endpoint (F-09), restricted to
+administrators. Files are processed by `utils.price_ingestion` and progress
+is streamed back to the client as newline-delimited JSON.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from database import SessionLocal
+from routers_.auth import require_admin
+from utils.latest_prices import refresh_latest_prices
+from utils.price_ingestion import TARGETS, IngestionError, PriceIngestion, open_rows
+
+router = APIRouter(prefix="/admin/prices", tags=["Admin"])
+
+
+def _save_upload(upload: UploadFile) -> str:
+    """
+    Copy an uploaded file to a temporary file and return its path.
+
+    The upload is copied in blocks, so memory use does not depend on its size.
+    """
+    suffix = os.path.splitext(upload.filename or "")[1].lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as handle:
+        shutil.copyfileobj(upload.file, handle, length=1024 * 1024)
+        return handle.name
+
+
+def _ingestion_stream(ingestion: PriceIngestion, header, rows, path: str):
+    """
+    Run an ingestion and yield its progress events as NDJSON lines.
+
+    Runs in the threadpool (Starlette iterates sync generators there). The
+    temporary file is deleted at the end, and the latest price snapshot is
+    refreshed after loading `precios`.
+    """
+    try:
+        for event in ingestion.run(header, rows):
+            if event["etapa"] == "completado" and ingestion.target.table == "precios":
+                db = SessionLocal()
+                try:
+                    refresh_latest_prices(db)
+                finally:
+                    db.close()
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    except Exception as e:
+        yield json.dumps({"etapa": "error", "mensaje": str(e)}, ensure_ascii=False) + "\n"
+    finally:
+        os.unlink(path)
+
+
+@router.post("/upload")
+async def upload_prices(
+    file: UploadFile = File(..., description="Archivo .csv o .xlsx con encabezado"),
+    tabla: str = Query("precios", description=f"Tabla destino: {', '.join(TARGETS)}"),
+    admin: dict = Depends(require_admin)
+):
+    """
+    Load a CSV or XLSX price file into `precios` or `historial_precios`.
+
+    The file is validated in chunks, copied into a staging table with
+    Postgres COPY and merged with upsert semantics in a single transaction
+    (see `utils.price_ingestion` for the expected columns).
+
+    Returns:
+        StreamingResponse: `application/x-ndjson` stream of progress events:
+            - {"etapa": "validacion", "filas_leidas", "filas_validas", "filas_con_error"}
+            - {"etapa": "fusion", "tabla"}
+            - {"etapa": "completado", ..., "insertadas", "actualizadas",
+              "sin_cambios", "errores": [{"linea", "error"}], "segundos"}
+            - {"etapa": "error", "mensaje"} if the load failed; nothing is
+              written in that case.
+
+    Raises:
+        HTTPException: 400 if the table, file format or header is invalid.
+        HTTPException: 401/403 if the caller is not an administrator.
+    """
+    try:
+        ingestion = PriceIngestion(tabla)
+    except IngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    path = await run_in_threadpool(_save_upload, file)
+    try:
+        header, rows = await run_in_threadpool(open_rows, path, file.filename)
+        ingestion.check_header(header)
+    except Exception as e:
+        # The stream deletes the file once it starts; nothing else would
+        os.unlink(path)
+        if isinstance(e, IngestionError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+
+    return StreamingResponse(
+        _ingestion_stream(ingestion, header, rows, path),
+        media_type="application/x-ndjson"
+    )
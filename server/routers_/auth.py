@@ -3,27 +3,29 @@ Authentication routes module for user login, logout and token management.
 
 This module provides secure authentication endpoints with JWT token generation,
 account locking mechanism after failed attempts, and token invalidation through
-an in-memory blacklist system.
+a revocation store keyed by the token's `jti` (see `utils.token_revocation`).
 """
 
 from fastapi import APIRouter, Depends, HTTPException,Header,BackgroundTasks,Security
-from sqlalchemy.orm import Session
-from database import SessionLocal, get_db
-from models import User
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from pydantic import BaseModel, EmailStr
-from passlib.hash import argon2
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError
-from jwt_manager import create_access_token, verify_token
+from jwt_manager import create_access_token, verified_token_cache, verify_token
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from utils.email_utils import send_lock_email
+from utils.token_revocation import token_revocation_store
+from utils.password_hashing import PasswordHasherBusy, password_hasher
 
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-# In-memory blacklist for invalidated tokens (valid only while server runs)
-TOKEN_BLACKLIST: set[str] = set()
+MAX_FAILED_ATTEMPTS = 3
+LOCK_MINUTES = 15
 
 # ===============================
 # REQUEST MODELS
@@ -40,7 +42,7 @@ class UserLogin(BaseModel):
 # ===============================
 # HELPER FUNCTIONS
 # ===============================
-# Helper functions for token extraction, validation, and blacklist checking.
+# Helper functions for token extraction, validation, and revocation checking.
 def get_bearer_token(authorization_header: Optional[str]) -> Optional[str]:
     """
     Extract the Bearer token from Authorization header.
@@ -52,11 +54,11 @@ def get_bearer_token(authorization_header: Optional[str]) -> Optional[str]:
     return authorization_header.split(" ", 1)[1].strip()
 
 
-def check_token_not_blacklisted(token: str):
+def check_token_not_revoked(payload: dict):
     """
-    Verify that the token is not blacklisted.
+    Verify that the token has not been revoked by a logout.
     """
-    if token in TOKEN_BLACKLIST:
+    if token_revocation_store.is_revoked(payload["jti"]):
         raise HTTPException(status_code=401, detail="Token inválido (logout requerido)")
 
 
@@ -64,23 +66,93 @@ def get_current_user_from_token(authorization: Optional[str] = Header(None)) ->
     """
     Validate the Authorization header and return the decoded token payload.
     Raises HTTPException if invalid or expired.
+
+    The signature is verified once per token and process (see
+    `jwt_manager.verified_token_cache`); revocation is checked on every call.
     """
     token = get_bearer_token(authorization)
     if not token:
         raise HTTPException(status_code=401, detail="Token no proporcionado")
 
-    check_token_not_blacklisted(token)
-
     try:
-        payload = verify_token(token)
+        payload = verified_token_cache.verify(token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido o expirado")
 
-    if "sub" not in payload:
+    if "sub" not in payload or "jti" not in payload:
         raise HTTPException(status_code=401, detail="Token inválido: falta información")
+
+    check_token_not_revoked(payload)
+    return payload
+
+
+def require_admin(payload: dict = Depends(get_current_user_from_token)) -> dict:
+    """
+    Dependency that only lets tokens with the "admin" role through.
+    Raises HTTPException 403 for any other role.
+    """
+    if payload.get("rol") != "admin":
+        raise HTTPException(status_code=403, detail="Se requieren permisos de administrador")
     return payload
 
 
+# ===============================
+# LOGIN STATE QUERIES
+# ===============================
+# Each login state transition is a single atomic statement, so concurrent
+# attempts on the same account serialize on its row instead of racing on
+# values read into Python.
+
+# Load the user, clearing an expired lock in the same statement. The
+# data-modifying CTE only writes when the lock has expired; otherwise the
+# row is just read.
+LOGIN_LOAD_QUERY = text("""
+    WITH desbloqueado AS (
+        UPDATE usuarios
+        SET intentos_fallidos = 0, cuenta_bloqueada_hasta = NULL
+        WHERE correo = :correo AND cuenta_bloqueada_hasta <= :now
+        RETURNING usuario_id, nombre, correo, contrasena_hash, rol, intentos_fallidos, cuenta_bloqueada_hasta
+    )
+    SELECT * FROM desbloqueado
+    UNION ALL
+    SELECT usuario_id, nombre, correo, contrasena_hash, rol, intentos_fallidos, cuenta_bloqueada_hasta
+    FROM usuarios
+    WHERE correo = :correo AND NOT EXISTS (SELECT 1 FROM desbloqueado)
+""")
+
+# Count a failed attempt and lock the account when it reaches the limit.
+# Only columns of the row itself are used: PostgreSQL re-reads them (and
+# re-checks the WHERE clause) if a concurrent attempt updated the row while
+# this one waited for its lock, so no increment is lost. Returns no row if
+# the account is (already) locked. A lock that expired meanwhile starts
+# counting again from 1.
+LOGIN_FAILED_QUERY = text("""
+    UPDATE usuarios
+    SET intentos_fallidos =
+            CASE WHEN cuenta_bloqueada_hasta IS NOT NULL THEN 0 ELSE COALESCE(intentos_fallidos, 0) END + 1,
+        cuenta_bloqueada_hasta = CASE
+            WHEN CASE WHEN cuenta_bloqueada_hasta IS NOT NULL THEN 0 ELSE COALESCE(intentos_fallidos, 0) END + 1
+                 >= :max_attempts
+            THEN CAST(:lock_until AS TIMESTAMP)
+        END
+    WHERE usuario_id = :usuario_id
+      AND (cuenta_bloqueada_hasta IS NULL OR cuenta_bloqueada_hasta <= :now)
+    RETURNING intentos_fallidos, cuenta_bloqueada_hasta
+""")
+
+# Reset the counters after a successful login (and store the rehashed
+# password, if any). Returns no row if a concurrent attempt locked the account.
+LOGIN_SUCCEEDED_QUERY = text("""
+    UPDATE usuarios
+    SET intentos_fallidos = 0,
+        cuenta_bloqueada_hasta = NULL,
+        contrasena_hash = COALESCE(:contrasena_hash, contrasena_hash)
+    WHERE usuario_id = :usuario_id
+      AND (cuenta_bloqueada_hasta IS NULL OR cuenta_bloqueada_hasta <= :now)
+    RETURNING usuario_id
+""")
+
+
 # ===============================
 # LOGIN ENDPOINT
 # ===============================
@@ -89,63 +161,88 @@ def get_current_user_from_token(authorization: Optional[str] = Header(None)) ->
 # Resets failed attempts after successful login.
 # Sends an email notification when the account is locked
 @router.post("/login")
-def login(
+async def login(
     user: UserLogin,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return a valid JWT token.
     - Temporary lock after 3 failed login attempts (15 minutes).
     - Reset failed attempts after successful login.
     - Send email notification on account lock.
+    - Rehash the password when the Argon2 parameters changed.
+
+    The account state is read (unlocking an expired lock) with one
+    statement before the password check and updated with one statement
+    after it; no transaction is held open while the password is verified.
     """
+    locked_detail = "Cuenta bloqueada temporalmente. Revisa tu correo electrónico."
 
-    # Search user by email
-    usuario = db.query(User).filter(User.correo == user.email).first()
+    # Search user by email, unlocking automatically if the lock period has expired
+    usuario = (await db.execute(LOGIN_LOAD_QUERY, {"correo": user.email, "now": datetime.utcnow()})).first()
+    await db.commit()
     if not usuario:
         raise HTTPException(status_code=400, detail="Correo o contraseña incorrectos")
 
     # Check if account is temporarily locked
     if usuario.cuenta_bloqueada_hasta:
-        if usuario.cuenta_bloqueada_hasta > datetime.utcnow():
-            raise HTTPException(
-                status_code=403,
-                detail="Cuenta bloqueada temporalmente. Revisa tu correo electrónico."
-            )
-        else:
-            # Unlock automatically if the lock period has expired
-            usuario.cuenta_bloqueada_hasta = None
-            usuario.intentos_fallidos = 0
-            db.commit()
-
-    # Verify password
-    if not argon2.verify(user.password, usuario.contrasena_hash):
-        usuario.intentos_fallidos = (usuario.intentos_fallidos or 0) + 1
+        raise HTTPException(status_code=403, detail=locked_detail)
 
-        # Lock account after 3 failed attempts
-        if usuario.intentos_fallidos >= 3:
-            usuario.cuenta_bloqueada_hasta = datetime.utcnow() + timedelta(minutes=15)
-            db.commit()
-
-            # 🔔 Send account lock notification email in background
-            send_lock_email(usuario.correo, usuario.nombre)
+    # Verify password (CPU-bound, runs in the password hashing process pool)
+    try:
+        password_ok = await password_hasher.verify(user.password, usuario.contrasena_hash)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Servicio ocupado, inténtalo nuevamente en unos segundos")
+
+    now = datetime.utcnow()
+    if not password_ok:
+        attempt = (await db.execute(LOGIN_FAILED_QUERY, {
+            "usuario_id": usuario.usuario_id,
+            "max_attempts": MAX_FAILED_ATTEMPTS,
+            "lock_until": now + timedelta(minutes=LOCK_MINUTES),
+            "now": now,
+        })).first()
+        await db.commit()
+
+        # A concurrent attempt locked the account first
+        if attempt is None:
+            raise HTTPException(status_code=403, detail=locked_detail)
+
+        # Lock account after 3 failed attempts (only the attempt that locked it notifies)
+        if attempt.cuenta_bloqueada_hasta:
+            # 🔔 Queue account lock notification email (database write, run in the threadpool)
+            await run_in_threadpool(send_lock_email, usuario.correo, usuario.nombre)
 
             raise HTTPException(
                 status_code=403,
                 detail="Cuenta bloqueada por múltiples intentos fallidos. Revisa tu correo electrónico."
             )
 
-        db.commit()
         raise HTTPException(status_code=400, detail="Correo o contraseña incorrectos")
 
-    # Reset counters after successful login
-    usuario.intentos_fallidos = 0
-    usuario.cuenta_bloqueada_hasta = None
-    db.commit()
+    # Rehash with the current Argon2 parameters if they changed since the
+    # password was stored (best effort: the login succeeds either way)
+    new_hash = None
+    if password_hasher.needs_update(usuario.contrasena_hash):
+        try:
+            new_hash = await password_hasher.hash(user.password)
+        except PasswordHasherBusy:
+            pass
+
+    # Reset counters after successful login (nothing to write in the common case)
+    if usuario.intentos_fallidos or new_hash:
+        reset = (await db.execute(LOGIN_SUCCEEDED_QUERY, {
+            "usuario_id": usuario.usuario_id,
+            "contrasena_hash": new_hash,
+            "now": now,
+        })).first()
+        await db.commit()
+        if reset is None:
+            raise HTTPException(status_code=403, detail=locked_detail)
 
     # Create JWT token with user data
-    role = usuario.rol if hasattr(usuario, "rol") else "user"
+    role = usuario.rol
     token_data = {"sub": usuario.correo, "rol": role}
     token = create_access_token(data=token_data)
 
@@ -163,20 +260,37 @@ def login(
 # ===============================
 # LOGOUT ENDPOINT
 # ===============================
-# Invalidates the user's JWT by adding it to a temporary in-memory blacklist.
+# Invalidates the user's JWT by revoking its jti until the token expires.
 security = HTTPBearer()
 
 @router.post("/logout")
-def logout(credentials: HTTPAuthorizationCredentials = Security(security)):
+async def logout(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
     Invalidate the JWT received in the Authorization header.
     Must be sent in the format: Bearer <token>.
+
+    The revocation is shared by every worker when a shared backend is
+    configured, and is dropped once the token expires.
     """
     token = credentials.credentials  # Extract token automatically
 
-    if token in TOKEN_BLACKLIST:
-        raise HTTPException(status_code=400, detail="El token ya fue invalidado")
+    try:
+        payload = verify_token(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token inválido o expirado")
+
+    if "jti" not in payload or "exp" not in payload:
+        raise HTTPException(status_code=401, detail="Token inválido: falta información")
 
-    TOKEN_BLACKLIST.add(token)
+    # Shared backends do network IO; keep it off the event loop
+    if token_revocation_store.backend.blocking:
+        revoked = await run_in_threadpool(token_revocation_store.revoke, payload["jti"], payload["exp"])
+    else:
+        revoked = token_revocation_store.revoke(payload["jti"], payload["exp"])
+
+    verified_token_cache.invalidate(token)
+
+    if not revoked:
+        raise HTTPException(status_code=400, detail="El token ya fue invalidado")
 
     return {"message": "Sesión cerrada correctamente"}
@@ -2,10 +2,23 @@
 System health routes module.
 
 This module provides endpoints to verify service status
-and monitor its availability.
+and monitor its availability: a cheap liveness check (`/health`), a
+cached readiness check of the dependencies (`/health/ready`) and
+per-subsystem metrics, also served in Prometheus format (`/metrics`).
 """
 
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from database import get_pool_stats
+from jwt_manager import verified_token_cache
+from utils.token_revocation import token_revocation_store
+from utils.password_hashing import password_hasher
+from utils.email_outbox import email_outbox_worker
+from utils.link_maintenance import email_link_sweeper
+from utils.startup_timing import startup_report
+from utils.health_checks import DOWN, readiness_probe
+from utils.rate_limiting import rate_limiter
+from utils.metrics import CONTENT_TYPE, render_metrics
 
 router = APIRouter()
 
@@ -16,7 +29,9 @@ def health_check():
 
     This endpoint allows performing health checks to confirm that the
     service is online and responding correctly. It is useful for
-    monitoring systems, load balancers, and container orchestrators.
+    monitoring systems, load balancers, and container orchestrators as
+    a liveness probe: it never touches a dependency. Use `/health/ready`
+    to know whether the instance can actually serve requests.
 
     Returns:
         dict: A dictionary with two keys:
@@ -28,4 +43,179 @@ def health_check():
         >>> print(response)
         {'status': 'ok', 'message': 'Servicio en línea'}
     """
-    return {"status": "ok", "message": "Servicio en línea"}
\ No newline at end of file
+    return {"status": "ok", "message": "Servicio en línea"}
+
+@router.get("/health/ready")
+async def readiness_check():
+    """
+    Check the dependencies needed to serve requests (readiness probe).
+
+    Reports, for the database (including pool saturation), Supabase and
+    the email outbox, a status ("ok", "degraded" or "down") and the check
+    latency. Why a check failed is only written to the server log. Results
+    are cached for `HEALTH_CACHE_SECONDS`, so probes can poll often without
+    loading the dependencies.
+
+    Returns:
+        JSONResponse: 200 with {"status": "ok" | "degraded", "dependencies": {...}},
+            or 503 with status "down" when the database is unreachable, so
+            load balancers and orchestrators route traffic away.
+
+    Example:
+        >>> (await readiness_check()).body
+        b'{"status":"ok","checked_at":"...","dependencies":{"database":{"status":"ok","latency_ms":1.2},...}}'
+    """
+    report = await readiness_probe.check()
+    return JSONResponse(report, status_code=503 if report["status"] == DOWN else 200)
+
+@router.get("/health/pool")
+def pool_health():
+    """
+    Report database connection pool usage.
+
+    Shows, for the sync and async engines, how many connections are in use,
+    idle or in overflow, the pool saturation, and cumulative checkout wait
+    times, overflow events and timeouts. Useful to size `DB_POOL_SIZE` and
+    `DB_MAX_OVERFLOW` under load.
+
+    Returns:
+        dict: {"status": "ok", "pools": {"sync": {...}, "async": {...}}}
+
+    Example:
+        >>> pool_health()["pools"]["async"]["saturation"]
+        0.2
+    """
+    return {"status": "ok", "pools": get_pool_stats()}
+
+@router.get("/health/tokens")
+def tokens_health():
+    """
+    Report verified-token cache and revocation check counters.
+
+    A low cache hit ratio means most requests pay for a full signature
+    verification; consider raising `TOKEN_CACHE_MAX_ENTRIES`.
+
+    Returns:
+        dict: {"status": "ok", "cache": {...}, "revocation": {...}}
+
+    Example:
+        >>> tokens_health()["cache"]["hit_ratio"]
+        0.98
+    """
+    return {
+        "status": "ok",
+        "cache": verified_token_cache.stats(),
+        "revocation": {
+            "local_hits": token_revocation_store.local_hits,
+            "backend_checks": token_revocation_store.backend_checks,
+        },
+    }
+
+@router.get("/health/passwords")
+def passwords_health():
+    """
+    Report password hashing pool usage.
+
+    Shows the Argon2 parameters, the number of hashing calls queued or
+    running, the peak queue depth, rejected calls and average wait and
+    compute times. Useful to size `PASSWORD_HASH_WORKERS` for login bursts
+    independently of the read endpoints.
+
+    Returns:
+        dict: {"status": "ok", "hasher": {...}}
+
+    Example:
+        >>> passwords_health()["hasher"]["pending"]
+        0
+    """
+    return {"status": "ok", "hasher": password_hasher.stats()}
+
+@router.get("/health/email")
+def email_health():
+    """
+    Report the email outbox state.
+
+    Shows how many queued emails are pending, the estimated size of the
+    outbox, whether this process's worker is running, and its delivery,
+    retry and SMTP connection counters.
+
+    Returns:
+        dict: {"status": "ok", "outbox": {...}}
+
+    Example:
+        >>> email_health()["outbox"]["pending"]
+        1
+    """
+    return {"status": "ok", "outbox": email_outbox_worker.stats()}
+
+@router.get("/health/links")
+def links_health():
+    """
+    Report the email link sweeper state.
+
+    Shows the estimated size of `enlaces_correo`, the retention of expired
+    links, whether they are archived, and how many links this process's
+    sweeper removed.
+
+    Returns:
+        dict: {"status": "ok", "links": {...}}
+
+    Example:
+        >>> links_health()["links"]["retention_hours"]
+        24.0
+    """
+    return {"status": "ok", "links": email_link_sweeper.stats()}
+
+@router.get("/health/rate-limits")
+def rate_limits_health():
+    """
+    Report the auth endpoint rate limits.
+
+    Shows the configured limits per rule and scope, how many requests
+    were allowed and rejected by this worker, rejections answered from
+    the local deny cache and failed calls to the shared backend.
+
+    Returns:
+        dict: {"status": "ok", "rate_limits": {...}}
+
+    Example:
+        >>> rate_limits_health()["rate_limits"]["rules"]["login"]["rejected"]
+        0
+    """
+    return {"status": "ok", "rate_limits": rate_limiter.stats()}
+
+@router.get("/health/startup")
+def startup_health():
+    """
+    Report how long this worker took to import its modules and start.
+
+    Import times are inclusive (the first module that imports a dependency
+    pays for it); "init" steps are the lifespan startup tasks, including
+    background ones such as the product search index once they finish.
+
+    Returns:
+        dict: {"status": "ok", "startup": {"ready_after_ms": ..., "steps": [...]}}
+
+    Example:
+        >>> startup_health()["startup"]["steps"][0]
+        {'kind': 'import', 'name': 'config', 'ms': 1.2, 'ok': True}
+    """
+    return {"status": "ok", "startup": startup_report.as_dict()}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Serve this worker's metrics in Prometheus text format.
+
+    Includes request latency and response size histograms per route,
+    in-flight requests, database pool usage, cache hits, the Argon2 queue
+    and SMTP deliveries. Async so it renders on the event loop, where
+    requests are recorded.
+
+    Returns:
+        PlainTextResponse: Prometheus exposition text.
+
+    Example:
+        >>> # plaze_http_request_duration_seconds_count{method="GET",route="/health",status="200"} 3
+    """
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
@@ -2,49 +2,252 @@
 Load Balancer Simulator module.
 
 This module implements a simple load balancer that distributes incoming
-requests across multiple backend instances using a random selection algorithm.
+requests across multiple backend instances. Backends are picked by a
+configurable strategy and skipped while unhealthy (see
+`utils.load_balancing`).
+
+It works as a streaming reverse proxy:
+
+    - One shared `httpx.AsyncClient` per process, with a bounded connection
+      pool and HTTP keep-alive to the backends.
+    - Every HTTP method is forwarded, with the raw path and query string,
+      the body and the headers (minus hop-by-hop headers) passed through as
+      a stream.
+    - Responses are streamed back as raw bytes (no JSON decoding, no
+      re-compression), with their status code and headers.
+    - Idempotent requests (GET, HEAD, OPTIONS, PUT, DELETE) that fail with a
+      connection error, a timeout or a 502/503/504 are retried on another
+      backend; their body is buffered so it can be sent again. A 503 with
+      Retry-After (maintenance window) is passed through as is.
+
+`GET /_lb/status` shows the strategy and the state of each backend.
+
+Environment Variables:
+    LB_BACKENDS: Comma-separated backend URLs
+        (default: http://127.0.0.1:8000,http://127.0.0.1:8001).
+    LB_RETRIES: Extra attempts for idempotent requests (default: 1).
+    LB_CONNECT_TIMEOUT: Seconds to open a backend connection (default: 2).
+    LB_READ_TIMEOUT: Seconds to wait for backend data (default: 30).
+    LB_WRITE_TIMEOUT: Seconds to send request data (default: 30).
+    LB_POOL_TIMEOUT: Seconds to wait for a pooled connection (default: 5).
+    LB_MAX_CONNECTIONS: Connections to all backends (default: 200).
+    LB_MAX_KEEPALIVE: Idle keep-alive connections kept (default: 100).
+    LB_KEEPALIVE_EXPIRY: Seconds an idle connection is kept (default: 30).
+    Strategy and health checks: see `utils.load_balancing` (LB_STRATEGY, ...).
+
+Usage:
+    LB_STRATEGY=ewma uvicorn routers_.load_balancer:app --port 9000
 """
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+import os
+import time
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
-import random
 
-app = FastAPI(title="Load Balancer Simulator")
+from utils.load_balancing import Backend, BackendPool
 
 # List of backend instances (different ports)
-BACKENDS = [
-    "http://127.0.0.1:8000",
-    "http://127.0.0.1:8001",
+BACKENDS: List[str] = [
+    url.strip().rstrip("/")
+    for url in os.getenv("LB_BACKENDS", "http://127.0.0.1:8000,http://127.0.0.1:8001").split(",")
+    if url.strip()
 ]
+LB_RETRIES = int(os.getenv("LB_RETRIES", "1"))
+
+TIMEOUT = httpx.Timeout(
+    connect=float(os.getenv("LB_CONNECT_TIMEOUT", "2")),
+    read=float(os.getenv("LB_READ_TIMEOUT", "30")),
+    write=float(os.getenv("LB_WRITE_TIMEOUT", "30")),
+    pool=float(os.getenv("LB_POOL_TIMEOUT", "5")),
+)
+LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("LB_MAX_CONNECTIONS", "200")),
+    max_keepalive_connections=int(os.getenv("LB_MAX_KEEPALIVE", "100")),
+    keepalive_expiry=float(os.getenv("LB_KEEPALIVE_EXPIRY", "30")),
+)
+
+# Headers that describe a single connection and must not be forwarded (RFC 9110 7.6.1)
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+})
+
+METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Answers that mean "this backend could not handle it", worth another backend
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+pool = BackendPool(BACKENDS)
+
+# Shared client, created by the lifespan handler
+client: Optional[httpx.AsyncClient] = None
 
-@app.get("/{path:path}")
-async def proxy(path: str):
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the shared, pooled backend client and run the active health
+    checks; close both on shutdown.
+    """
+    global client
+    client = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS)
+    health_checks = asyncio.create_task(pool.run_health_checks(client))
+    try:
+        yield
+    finally:
+        health_checks.cancel()
+        await client.aclose()
+        client = None
+
+
+app = FastAPI(title="Load Balancer Simulator", lifespan=lifespan)
+
+
+def _forward_headers(request: Request) -> List[tuple]:
+    """
+    Request headers to send to the backend: hop-by-hop headers and Host are
+    dropped (httpx sets Host for the backend) and X-Forwarded-* are added.
     """
-    Forward the GET request to a randomly selected backend instance.
+    headers = [
+        (name, value) for name, value in request.headers.raw
+        if name.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS and name.lower() != b"host"
+    ]
+    client_host = request.client.host if request.client else ""
+    forwarded_for = request.headers.get("x-forwarded-for")
+    headers.append((b"x-forwarded-for", f"{forwarded_for}, {client_host}".encode() if forwarded_for else client_host.encode()))
+    headers.append((b"x-forwarded-proto", request.url.scheme.encode()))
+    if "host" in request.headers:
+        headers.append((b"x-forwarded-host", request.headers["host"].encode("latin-1")))
+    return headers
+
+
+def _target_url(backend: Backend, request: Request) -> httpx.URL:
+    """
+    Backend URL of the request, built from the raw path and query string so
+    escaped characters (`%2F`, `%3F`, ...) reach the backend unchanged.
+    """
+    raw_path = request.scope.get("raw_path") or request.url.path.encode()
+    query = request.scope.get("query_string", b"")
+    if query:
+        raw_path += b"?" + query
+    base = httpx.URL(backend.url)
+    return base.copy_with(raw_path=base.raw_path.rstrip(b"/") + raw_path)
+
+
+def _stream_response(upstream: httpx.Response, backend: Backend) -> StreamingResponse:
+    """
+    Stream the backend response back; the backend counts as busy until its
+    body has been sent (or the client went away).
+    """
+    finished = False
+
+    async def finish():
+        nonlocal finished
+        if not finished:
+            finished = True
+            await upstream.aclose()
+            pool.release(backend)
+
+    async def body():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await finish()
+
+    response = StreamingResponse(body(), status_code=upstream.status_code, background=BackgroundTask(finish))
+    # Replace the default headers with the backend's, untouched (including
+    # Content-Length and Content-Encoding, since the body is passed raw)
+    response.raw_headers = [
+        (name, value) for name, value in upstream.headers.raw
+        if name.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS
+    ]
+    return response
+
+
+@app.get("/_lb/status")
+async def lb_status():
+    """
+    Strategy and per-backend state (health, ejection, load, latency EWMA).
+    """
+    return pool.stats()
+
+
+@app.api_route("/{path:path}", methods=METHODS)
+async def proxy(path: str, request: Request):
+    """
+    Forward the request to a backend instance chosen by the pool strategy.
 
     This function acts as a reverse proxy, distributing incoming requests
-    across available backend servers using random selection. It helps
-    balance the load and provides basic fault tolerance.
+    across the available backend servers. The response body is streamed
+    through without being buffered or decoded, over pooled keep-alive
+    connections. Idempotent requests are retried on another backend when
+    the first one fails.
 
     Args:
-        path (str): The request path to forward to the backend instance.
-            Captures all path segments after the base URL.
+        path (str): The request path, all segments after the base URL.
+            The raw (still escaped) path is what gets forwarded.
+        request (Request): The incoming request (method, query string,
+            headers and body are forwarded).
 
     Returns:
-        dict: The JSON response from the backend instance if successful,
-            or an error dictionary containing:
+        StreamingResponse: The backend response (status, headers and body),
+            or a JSON error (502 if the backend is unreachable, 504 if it
+            timed out) containing:
             - error (str): Error message indicating which backend failed.
             - details (str): Detailed exception information.
 
     Example:
-        >>> # Request to /health will be forwarded to a random backend
+        >>> # Request to /health will be forwarded to one of the backends
         >>> # e.g., http://127.0.0.1:8000/health or http://127.0.0.1:8001/health
     """
-    backend = random.choice(BACKENDS)
-    url = f"{backend}/{path}"
-    async with httpx.AsyncClient() as client:
+    retryable = request.method in IDEMPOTENT_METHODS
+    # A streamed body can only be sent once: buffer it when it may be resent
+    content = await request.body() if retryable else request.stream()
+    attempts = min(1 + LB_RETRIES, len(pool.backends)) if retryable else 1
+    headers = _forward_headers(request)
+
+    tried: List[Backend] = []
+    error: Optional[httpx.HTTPError] = None
+    for attempt in range(attempts):
+        backend = pool.choose(exclude=tried)
+        tried.append(backend)
+        upstream_request = client.build_request(
+            request.method,
+            _target_url(backend, request),
+            headers=headers,
+            content=content,
+        )
+        pool.acquire(backend)
+        started = time.perf_counter()
         try:
-            response = await client.get(url)
-            return response.json()
-        except Exception as e:
-            return {"error": f"Fallo en {backend}", "details": str(e)}
\ No newline at end of file
+            upstream = await client.send(upstream_request, stream=True)
+        except httpx.HTTPError as e:
+            pool.release(backend)
+            pool.record(backend, ok=False)
+            error = e
+            continue
+
+        if upstream.status_code == 503 and "retry-after" in upstream.headers:
+            # Deliberate answer (maintenance window), the same on every
+            # backend: passed through, neither retried nor counted as a failure
+            return _stream_response(upstream, backend)
+        failed = upstream.status_code in RETRY_STATUSES
+        pool.record(backend, ok=not failed, latency_ms=(time.perf_counter() - started) * 1000)
+        if failed and attempt + 1 < attempts:
+            await upstream.aclose()
+            pool.release(backend)
+            continue
+        return _stream_response(upstream, backend)
+
+    status_code = 504 if isinstance(error, httpx.TimeoutException) else 502
+    return JSONResponse(
+        {"error": f"Fallo en {tried[-1].url}", "details": str(error) or "timeout"},
+        status_code=status_code,
+    )
@@ -2,34 +2,33 @@
 System maintenance routes module.
 
 This module provides endpoints to check for active maintenance windows
-and retrieve maintenance messages from the database.
+and retrieve maintenance messages. Windows are served from an in-memory
+index refreshed in the background (see `utils.maintenance_windows`).
+
+Admins can also drop the cached catalogue (products and market plazas)
+after editing those tables by hand or from a script.
 """
 
-from fastapi import APIRouter
-from supabase import create_client, Client
-import os
-from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime, timezone
-from dateutil import parser
-
-load_dotenv()
+from routers_.auth import require_admin
+from utils.maintenance_windows import maintenance_index
+from utils.product_search import product_search_index
+from utils.response_cache import response_cache, TAG_MARKETS, TAG_PRODUCTS
 
 router = APIRouter()
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_ANON_KEY")
-supabase: Client = create_client(url, key)
-
 
 @router.get("/maintenance")
-def get_maintenance():
+async def get_maintenance():
     """
     Check for active system maintenance windows.
 
-    This endpoint queries the system_maintenance table to determine if
-    there is currently an active maintenance window. It compares the
-    current UTC time against the start and end times of all maintenance
-    records.
+    This endpoint looks up the current UTC time in the in-memory index of
+    the `system_maintenance` table with a binary search; the table itself
+    is only read by the background refresher (and once on the first call
+    if the refresher has not loaded it yet).
 
     Returns:
         dict: A dictionary containing maintenance status:
@@ -52,22 +51,57 @@ def get_maintenance():
         - All times are compared in UTC timezone.
         - Maintenance records must have 'start_time' and 'end_time' fields
           in ISO 8601 format.
-        - Debug messages are printed to console for monitoring.
+        - Changes to the table are seen after the next refresh
+          (`MAINTENANCE_REFRESH_SECONDS`) or right after `POST /maintenance/refresh`.
+    """
+    if maintenance_index.loaded_at is None:
+        try:
+            await run_in_threadpool(maintenance_index.ensure_loaded)
+        except Exception:
+            raise HTTPException(status_code=503, detail="No se pudo consultar el estado de mantenimiento")
+
+    window = maintenance_index.active_at(datetime.now(timezone.utc))
+    if window:
+        return {"active": True, "message": window.message}
+    return {"active": False}
+
+
+@router.post("/maintenance/refresh")
+def refresh_maintenance(_: dict = Depends(require_admin)):
+    """
+    Reload the maintenance windows after editing `system_maintenance`.
+
+    With `REDIS_URL` configured every worker and instance reloads;
+    otherwise only the worker that receives the request does, and the
+    others pick the change up on their next scheduled refresh.
+
+    Returns:
+        dict: Number of windows loaded by this worker.
+    """
+    try:
+        count = maintenance_index.refresh()
+    except Exception:
+        raise HTTPException(status_code=503, detail="No se pudo consultar el estado de mantenimiento")
+    maintenance_index.publish_refresh()
+    return {"message": "Ventanas de mantenimiento actualizadas", "ventanas": count}
+
+
+@router.post("/maintenance/cache/invalidate")
+def invalidate_catalogue_cache(_: dict = Depends(require_admin)):
+    """
+    Drop the cached catalogue after editing `productos` or `plazas_mercado`.
+
+    Invalidates the cached product and market plaza responses, and marks
+    the product search index stale so it is rebuilt on the next search.
+
+    With `REDIS_URL` configured the cached responses are dropped for every
+    worker and instance; the search index is per worker, so only the one
+    that receives the request rebuilds right away and the others do after
+    `PRODUCT_SEARCH_MAX_AGE_SECONDS`.
+
+    Returns:
+        dict: Invalidated cache tags.
     """
-    now_utc = datetime.now(timezone.utc)
-    response = supabase.table("system_maintenance").select("*").execute()
-
-    active = []
-    for m in response.data or []:
-        from dateutil import parser
-        start = parser.isoparse(m["start_time"])
-        end = parser.isoparse(m["end_time"])
-        if start <= now_utc <= end:
-            active.append(m)
-
-    if active:
-        print("✅ Mantenimiento activo encontrado:", active[0])
-        return {"active": True, "message": active[0]["message"]}
-    else:
-        print("❌ No hay mantenimiento activo.")
-        return {"active": False}
\ No newline at end of file
+    response_cache.invalidate(TAG_PRODUCTS, TAG_MARKETS)
+    product_search_index.invalidate()
+    return {"message": "Caché del catálogo invalidada", "tags": [TAG_PRODUCTS, TAG_MARKETS]}
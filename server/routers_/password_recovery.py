@@ -3,24 +3,47 @@ Password recovery module for secure user password reset functionality.
 
 This module provides endpoints for initiating password recovery via email
 and resetting passwords using time-limited, single-use tokens. Includes
-email delivery through Gmail SMTP and password strength validation.
+email delivery through the email outbox (see `utils.email_outbox`) and
+password strength validation.
 """
 
-import os
-import smtplib
-from email.mime.text import MIMEText
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-from database import SessionLocal, get_db
-from models import User, EmailLink
-from utils.password_utils import create_password_recovery_link
-from passlib.hash import argon2
+from database import get_db
+from models import User
+from utils.password_utils import create_password_recovery_link, hash_token
+from utils.email_outbox import enqueue_email
+from utils.email_templates import email_templates
+from utils.password_hashing import PasswordHasherBusy, password_hasher
 import re
 from datetime import datetime
 
 router = APIRouter(prefix="/password")
 
+# State of a link, looked up by the hash of its token (unique index)
+LINK_STATE_QUERY = text("""
+    SELECT usado, expira_en FROM enlaces_correo WHERE token_hash = :token_hash
+""")
+
+# Consume the link and set the new password in one statement. Only an
+# unused, unexpired link matches, so of concurrent resets with the same
+# token exactly one succeeds.
+CONSUME_LINK_QUERY = text("""
+    WITH enlace AS (
+        UPDATE enlaces_correo
+        SET usado = TRUE
+        WHERE token_hash = :token_hash AND usado IS NOT TRUE AND expira_en >= :now
+        RETURNING usuario_id
+    )
+    UPDATE usuarios
+    SET contrasena_hash = :contrasena_hash
+    FROM enlace
+    WHERE usuarios.usuario_id = enlace.usuario_id
+    RETURNING usuarios.usuario_id
+""")
+
 # --------------------------- #
 #   Pydantic Input Model      #
 # --------------------------- #
@@ -39,6 +62,9 @@ def recover_password(email: EmailStr, db: Session = Depends(get_db)):
     """
     Starts the password recovery process.
 
+    The email is queued in the outbox and delivered by its worker, so the
+    response does not wait for the mail server.
+
     Args:
         email (EmailStr): The email address of the user requesting password recovery.
         db (Session): Database session.
@@ -56,74 +82,10 @@ def recover_password(email: EmailStr, db: Session = Depends(get_db)):
     # Generate token and link using the utility function
     token, reset_link = create_password_recovery_link(user, db)
 
-    # Create HTML email message (table-based for consistent layout)
-    msg = MIMEText(f"""
-<html>
-  <body style="margin: 0; padding: 0; background-color: #f4f6f8;">
-    <table role="presentation" cellspacing="0" cellpadding="0" border="0" width="100%">
-      <tr>
-        <td align="center" style="padding: 40px 0;">
-          <table role="presentation" cellspacing="0" cellpadding="0" border="0" width="480" style="background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 10px rgba(0,0,0,0.05);">
-            <tr>
-              <td style="padding: 30px 40px; font-family: Arial, sans-serif; color: #333;">
-                
-                <h2 style="color: #1a73e8; text-align: center; margin-top: 0;">
-                  🔐 Recuperación de contraseña
-                </h2>
-                
-                <p>Hola <b>{user.nombre}</b>,</p>
-
-                <p style="line-height: 1.6;">
-                  Hemos recibido una solicitud para restablecer tu contraseña.<br>
-                  Por favor, haz clic en el botón de abajo para continuar:
-                </p>
-
-                <table role="presentation" cellspacing="0" cellpadding="0" border="0" align="center" style="margin: 30px auto;">
-                  <tr>
-                    <td align="center" bgcolor="#1a73e8" style="border-radius: 8px;">
-                      <a href="{reset_link}" target="_blank" 
-                        style="display: inline-block; padding: 12px 24px; font-size: 16px; 
-                               font-weight: bold; color: #ffffff; text-decoration: none; 
-                               border-radius: 8px;">
-                        Restablecer contraseña
-                      </a>
-                    </td>
-                  </tr>
-                </table>
-
-                <p style="color: #555; font-size: 14px;">
-                  ⏰ Este enlace expirará en <b>1 hora</b>.<br>
-                  Si no solicitaste este cambio, puedes ignorar este mensaje.
-                </p>
-
-                <hr style="border: none; border-top: 1px solid #eee; margin: 25px 0;">
-
-                <p style="color: #777; font-size: 13px; text-align: center;">
-                  Saludos,<br>
-                  <b>El equipo de Soporte de Plaze</b>
-                </p>
-
-              </td>
-            </tr>
-          </table>
-        </td>
-      </tr>
-    </table>
-  </body>
-</html>
-""", "html")
-
-    msg["Subject"] = "🔐 Recuperación de contraseña"
-    msg["From"] = f"Plaze Soporte <{os.getenv('EMAIL_USER')}>"
-    msg["To"] = email
-
-    # Send email via Gmail SMTP
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(os.getenv("EMAIL_USER"), os.getenv("EMAIL_PASS"))
-            server.sendmail(os.getenv("EMAIL_USER"), email, msg.as_string())
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en el envío del email: {e}")
+    # Render the email from the precompiled template and queue it; the
+    # outbox worker sends it and retries on failure
+    rendered = email_templates.render("recuperacion_password", nombre=user.nombre, enlace=reset_link)
+    enqueue_email(db, email, rendered.subject, rendered.html, rendered.text)
 
     return {"message": "Correo de recuperación de contraseña enviado exitosamente"}
 
@@ -165,29 +127,35 @@ def reset_password(token: str, body: ResetPassword, db: Session = Depends(get_db
     """
     Resets a user's password using a valid token.
 
+    The link is looked up by the hash of the token. It is checked before
+    hashing the new password (so invalid links never cost an Argon2 hash)
+    and consumed, together with the password update, in a single
+    conditional statement.
+
     Args:
         token (str): Password recovery token.
         body (ResetPassword): Object containing the new password.
         db (Session): Database session.
 
     Raises:
-        HTTPException: If the link is invalid, expired, already used, or password invalid.
+        HTTPException: If the link is invalid, expired, already used, or password invalid;
+            503 if too many password hashes are already queued.
 
     Returns:
         dict: Success message.
     """
-    link = db.query(EmailLink).filter(EmailLink.enlace_url == token).first()
+    token_hash = hash_token(token)
 
-    if not link:
-        raise HTTPException(status_code=404, detail="Link inválido")
-    if link.usado:
-        raise HTTPException(status_code=400, detail="Link ya fue usado")
-    if link.expira_en < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="El link ha expirado")
+    def link_error(link) -> HTTPException:
+        if not link:
+            return HTTPException(status_code=404, detail="Link inválido")
+        if link.usado:
+            return HTTPException(status_code=400, detail="Link ya fue usado")
+        return HTTPException(status_code=400, detail="El link ha expirado")
 
-    user = db.query(User).filter(User.usuario_id == link.usuario_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    link = db.execute(LINK_STATE_QUERY, {"token_hash": token_hash}).first()
+    if not link or link.usado or link.expira_en < datetime.utcnow():
+        raise link_error(link)
 
     # Validate new password
     if not validate_password(body.new_password):
@@ -196,11 +164,21 @@ def reset_password(token: str, body: ResetPassword, db: Session = Depends(get_db
             detail="La contraseña debe tener al menos 8 caracteres, una mayúscula, un número y un carácter especial (!@#$%^&*)"
         )
 
-    #Update password and mark link as used
-    user.contrasena_hash = argon2.hash(body.new_password)
-    link.usado = True
+    try:
+        new_hash = password_hasher.hash_blocking(body.new_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Servicio ocupado, inténtalo nuevamente en unos segundos")
+
+    # Mark the link as used and update the password
+    updated = db.execute(CONSUME_LINK_QUERY, {
+        "token_hash": token_hash,
+        "contrasena_hash": new_hash,
+        "now": datetime.utcnow(),
+    }).first()
     db.commit()
-    db.refresh(user)
 
-    return {"message": "Contraseña restablecida exitosamente"}
+    # Used or expired while the password was being hashed
+    if not updated:
+        raise link_error(db.execute(LINK_STATE_QUERY, {"token_hash": token_hash}).first())
 
+    return {"message": "Contraseña restablecida exitosamente"}
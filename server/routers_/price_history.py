@@ -7,11 +7,47 @@ It uses the `historial_precios` table to include multiple time points
 and provides trend analysis, statistical summaries, and period detection.
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database import get_async_db
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
+from utils.price_analytics import (
+    analyze_buckets, analyze_series, bucket_records, detect_periods, history_records,
+    load_buckets, load_series, lttb_indices, series_from_history,
+)
+from utils.product_search import product_search_index
+
+# date_trunc units accepted by the `resolution` parameter
+RESOLUTION_UNITS = {"day": "day", "week": "week", "month": "month"}
+
+HISTORY_QUERY = text("""
+    SELECT 
+        hp.fecha_precio AS fecha,
+        CAST(hp.precio_historico AS DOUBLE PRECISION) AS precio_por_kg
+    FROM historial_precios AS hp
+    WHERE hp.producto_id = ANY(:producto_ids)
+      AND hp.fecha_precio >= CAST(:start_date AS TIMESTAMP)
+    ORDER BY hp.fecha_precio ASC
+""")
+
+# One OHLC row per day/week/month bucket, aggregated by Postgres
+BUCKETS_QUERY = text("""
+    SELECT
+        CAST(date_trunc(:unit, hp.fecha_precio) AS DATE) AS fecha,
+        (array_agg(hp.precio_historico ORDER BY hp.fecha_precio ASC))[1]::float8 AS apertura,
+        MAX(hp.precio_historico)::float8 AS maximo,
+        MIN(hp.precio_historico)::float8 AS minimo,
+        (array_agg(hp.precio_historico ORDER BY hp.fecha_precio DESC))[1]::float8 AS cierre,
+        COUNT(*) AS registros,
+        SUM(hp.precio_historico) AS suma
+    FROM historial_precios AS hp
+    WHERE hp.producto_id = ANY(:producto_ids)
+      AND hp.fecha_precio >= CAST(:start_date AS TIMESTAMP)
+    GROUP BY 1
+    ORDER BY 1 ASC
+""")
 
 # Initialize router for the Price History API
 router = APIRouter(
@@ -20,16 +56,18 @@ router = APIRouter(
 )
 
 
-def find_similar_products(db, product_name: str, limit: int = 5) -> List[str]:
+async def find_similar_products(db: AsyncSession, product_name: str, limit: int = 5) -> List[str]:
     """
-    Find products with similar names using partial matching.
+    Find products with similar names using the in-memory search index.
 
-    This function performs a case-insensitive search for products whose
-    names contain the search term. It's useful for suggesting alternatives
-    when an exact match is not found.
+    This function performs a case and accent-insensitive fuzzy search over
+    the product catalogue (see `utils.product_search`). It's useful for
+    suggesting alternatives when an exact match is not found. Results are
+    ranked: prefix matches first, then partial matches, then names with
+    similar trigrams.
 
     Args:
-        db: SQLAlchemy database session for executing queries.
+        db (AsyncSession): Database session, used only if the index must be rebuilt.
         product_name (str): The product name to search for (supports partial matches).
         limit (int, optional): Maximum number of similar products to return.
             Defaults to 5.
@@ -39,22 +77,13 @@ def find_similar_products(db, product_name: str, limit: int = 5) -> List[str]:
             Returns empty list if no matches found or if an error occurs.
 
     Example:
-        >>> similar = find_similar_products(db, "tomate", limit=3)
+        >>> similar = await find_similar_products(db, "tomate", limit=3)
         >>> print(similar)
         ['Tomate', 'Tomate cherry', 'Tomate de árbol']
     """
     try:
-        query = text("""
-            SELECT DISTINCT prod.nombre
-            FROM productos AS prod
-            WHERE LOWER(prod.nombre) LIKE LOWER(:search_pattern)
-            LIMIT :limit
-        """)
-        result = db.execute(query, {
-            "search_pattern": f"%{product_name}%",
-            "limit": limit
-        }).fetchall()
-        return [row[0] for row in result]
+        await product_search_index.ensure_fresh(db)
+        return product_search_index.suggest(product_name, limit)
     except Exception:
         return []
 
@@ -94,64 +123,39 @@ def analyze_periods(history: List[Dict]) -> List[Dict]:
     Note:
         A variation greater than 2% is considered an increase, less than -2%
         is a decrease, and between -2% and 2% is considered stability.
+        The computation is vectorized in `utils.price_analytics`.
     """
     if len(history) < 2:
         return []
-
-    periods = []
-    i = 0
-
-    while i < len(history) - 1:
-        start = history[i]
-        initial_price = start["precio_por_kg"]
-        trend = None
-        j = i + 1
-
-        while j < len(history):
-            current_price = history[j]["precio_por_kg"]
-            previous_price = history[j - 1]["precio_por_kg"]
-            variation = ((current_price - previous_price) / previous_price) * 100
-
-            if variation > 2:
-                new_trend = "Aumento"
-            elif variation < -2:
-                new_trend = "Disminución"
-            else:
-                new_trend = "Estabilidad"
-
-            if trend is None:
-                trend = new_trend
-            elif trend != new_trend:
-                break
-
-            j += 1
-
-        end = history[j - 1]
-        total_var = ((end["precio_por_kg"] - initial_price) / initial_price) * 100
-
-        periods.append({
-            "fecha_inicio": start["fecha"],
-            "fecha_fin": end["fecha"],
-            "precio_inicio": initial_price,
-            "precio_fin": end["precio_por_kg"],
-            "tendencia": trend,
-            "variacion_porcentual": round(total_var, 2)
-        })
-
-        i = j
-
-    return periods
+    return detect_periods(series_from_history(history))
 
 
 @router.get("/{product_name}")
-def get_price_history(
+async def get_price_history(
     product_name: str,
     months: int = Query(
         12,
         ge=1,
         le=120,
         description="Number of months to query (min: 1, max: 120, default: 12)"
-    )
+    ),
+    window: Optional[int] = Query(
+        None,
+        ge=2,
+        le=365,
+        description="Optional window (points) for moving average and volatility indicators"
+    ),
+    resolution: Literal["raw", "day", "week", "month"] = Query(
+        "raw",
+        description="Aggregate the history into daily, weekly or monthly OHLC buckets (default: raw)"
+    ),
+    max_points: Optional[int] = Query(
+        None,
+        ge=3,
+        le=5000,
+        description="Optional maximum number of history points, selected with LTTB"
+    ),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict:
     """
     Retrieve and analyze the historical price variation of a product.
@@ -165,6 +169,14 @@ def get_price_history(
             and underscores which are normalized to spaces.
         months (int, optional): Number of months to look back in history.
             Must be between 1 and 120. Defaults to 12 months.
+        window (int, optional): If given, the response also includes a
+            moving average and rolling volatility over this many points.
+        resolution (str, optional): "raw" (default) returns every record;
+            "day", "week" or "month" returns one OHLC entry per bucket,
+            aggregated in SQL with `date_trunc`.
+        max_points (int, optional): If the history has more points, keep
+            only this many, chosen with Largest-Triangle-Three-Buckets.
+        db (AsyncSession): Async database session.
 
     Returns:
         Dict: A comprehensive price history analysis containing:
@@ -177,6 +189,10 @@ def get_price_history(
               average, max, min prices and percentage change
             - periodos (List[Dict]): Detected trend periods with details
             - historial (List[Dict]): Complete chronological price records
+            - indicadores (dict): Only when `window` is given; moving average
+              and volatility points (see `utils.price_analytics.indicators`)
+            - muestreo (dict): Only when downsampling; resolution, max_points
+              and number of points before and after LTTB
 
     Raises:
         HTTPException: 400 if months parameter is invalid (not between 1 and 120).
@@ -184,7 +200,7 @@ def get_price_history(
             If similar products exist, they are suggested in the error message.
 
     Example:
-        >>> response = get_price_history("tomate", months=6)
+        >>> response = await get_price_history("tomate", months=6)
         >>> print(response["tendencia_general"])
         'Aumento'
         >>> print(response["estadisticas"]["precio_promedio"])
@@ -192,100 +208,93 @@ def get_price_history(
 
     Note:
         - Product names are normalized by removing spaces and hyphens
-          for flexible matching
+          for flexible matching, and resolved to a producto_id through the
+          in-memory product index (see `utils.product_search`)
         - Prices are retrieved from the historial_precios table
         - Trends are classified as "Aumento" (>5%), "Disminución" (<-5%),
           or "Estabilidad" (between -5% and 5%)
         - Valid months range: 1-120 (1 month to 10 years)
+        - Statistics always cover every raw record. With a bucket
+          resolution, periods and indicators use bucket closing prices and
+          each history entry adds apertura, maximo, minimo, cierre and
+          registros (precio_por_kg is the close). LTTB only thins out
+          `historial`; statistics and periods use the full series.
     """
-    db = SessionLocal()
-    try:
-        # Validate months parameter
-        if months < 1 or months > 120:
-            raise HTTPException(
-                status_code=400,
-                detail="El parámetro 'months' debe estar entre 1 y 120. "
-                       f"Valor recibido: {months}"
-            )
-
-        product_name_normalized = product_name.replace("-", " ").replace("_", " ").strip()
-        start_date = datetime.utcnow() - timedelta(days=30 * months)
-
-        # ✅ Query now uses historial_precios instead of precios
-        query = text("""
-            SELECT 
-                hp.fecha_precio AS fecha,
-                hp.precio_historico AS precio_por_kg
-            FROM historial_precios AS hp
-            JOIN productos AS prod ON hp.producto_id = prod.producto_id
-            WHERE LOWER(REPLACE(REPLACE(prod.nombre, ' ', ''), '-', '')) = 
-                  LOWER(REPLACE(REPLACE(:product_name, ' ', ''), '-', ''))
-              AND hp.fecha_precio >= :start_date
-            ORDER BY hp.fecha_precio ASC
-        """)
-
-        result = db.execute(query, {
-            "product_name": product_name_normalized,
-            "start_date": start_date
-        }).fetchall()
-
-        # Handle no data found
-        if not result:
-            similar = find_similar_products(db, product_name_normalized)
-            if similar:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No se encontraron datos para '{product_name}'. "
-                           f"¿Quisiste decir: {', '.join(similar)}?"
-                )
+    # Validate months parameter
+    if months < 1 or months > 120:
+        raise HTTPException(
+            status_code=400,
+            detail="El parámetro 'months' debe estar entre 1 y 120. "
+                   f"Valor recibido: {months}"
+        )
+
+    product_name_normalized = product_name.replace("-", " ").replace("_", " ").strip()
+    start_date = datetime.utcnow() - timedelta(days=30 * months)
+
+    # Resolve the product once (in-memory cache, indexed fallback), then
+    # range-scan historial_precios on (producto_id, fecha_precio)
+    producto_ids = list(await product_search_index.resolve(db, product_name_normalized))
+
+    params = {"producto_ids": producto_ids, "start_date": start_date}
+    if resolution == "raw":
+        query = HISTORY_QUERY
+    else:
+        query = BUCKETS_QUERY
+        params["unit"] = RESOLUTION_UNITS[resolution]
+
+    result = (await db.execute(query, params)).all() if producto_ids else []
+
+    # Handle no data found
+    if not result:
+        similar = await find_similar_products(db, product_name_normalized)
+        if similar:
             raise HTTPException(
                 status_code=404,
-                detail=f"No se encontraron datos históricos para '{product_name}' "
-                       f"en los últimos {months} meses."
+                detail=f"No se encontraron datos para '{product_name}'. "
+                       f"¿Quisiste decir: {', '.join(similar)}?"
             )
-
-        # Build structured history
-        history = [{
-            "fecha": (r[0].isoformat() if hasattr(r[0], "isoformat") else str(r[0])),
-            "precio_por_kg": float(r[1])
-        } for r in result]
-
-        # Basic statistics
-        initial_price = history[0]["precio_por_kg"]
-        final_price = history[-1]["precio_por_kg"]
-        percent_change = ((final_price - initial_price) / initial_price) * 100
-
-        if percent_change > 5:
-            trend_general = "Aumento"
-        elif percent_change < -5:
-            trend_general = "Disminución"
-        else:
-            trend_general = "Estabilidad"
-
-        prices = [p["precio_por_kg"] for p in history]
-        avg_price = sum(prices) / len(prices)
-
-        # Detect specific trend periods
-        periods = analyze_periods(history)
-
-        return {
-            "producto": product_name_normalized,
-            "periodo_meses": months,
-            "fecha_inicio": history[0]["fecha"],
-            "fecha_fin": history[-1]["fecha"],
-            "tendencia_general": trend_general,
-            "estadisticas": {
-                "precio_inicial": initial_price,
-                "precio_final": final_price,
-                "precio_promedio": round(avg_price, 2),
-                "precio_maximo": max(prices),
-                "precio_minimo": min(prices),
-                "variacion_porcentual": round(percent_change, 2),
-                "total_registros": len(history)
-            },
-            "periodos": periods,
-            "historial": history
+        raise HTTPException(
+            status_code=404,
+            detail=f"No se encontraron datos históricos para '{product_name}' "
+                   f"en los últimos {months} meses."
+        )
+
+    # Load the rows into arrays and analyze them (see utils.price_analytics)
+    if resolution == "raw":
+        buckets = None
+        series = load_series(result)
+        analysis = analyze_series(series, window)
+    else:
+        buckets = load_buckets(result)
+        series = buckets.series
+        analysis = analyze_buckets(buckets, window)
+
+    # Keep at most max_points entries in the serialized history
+    indices = None
+    if max_points is not None and len(series.precios) > max_points:
+        indices = lttb_indices(series.fechas, series.precios, max_points)
+    if buckets is None:
+        historial = history_records(series, indices)
+    else:
+        historial = bucket_records(buckets, indices)
+
+    response = {
+        "producto": product_name_normalized,
+        "periodo_meses": months,
+        "fecha_inicio": series.labels[0],
+        "fecha_fin": series.labels[-1],
+        "tendencia_general": analysis["tendencia_general"],
+        "estadisticas": analysis["estadisticas"],
+        "periodos": analysis["periodos"],
+        "historial": historial
+    }
+    if window is not None:
+        response["indicadores"] = analysis["indicadores"]
+    if resolution != "raw" or indices is not None:
+        response["muestreo"] = {
+            "resolucion": resolution,
+            "max_points": max_points,
+            "puntos_originales": len(series.precios),
+            "puntos": len(historial)
         }
-
-    finally:
-        db.close()
\ No newline at end of file
+    return response
@@ -5,49 +5,45 @@ This module provides endpoints to query updated prices, list available
 products and market plazas in Medellín.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import os
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from database import get_db
+from database import get_async_db
+from utils.latest_prices import latest_price_store
+from utils.product_search import product_search_index
+from utils.response_cache import response_cache, TAG_PRODUCTS, TAG_MARKETS
 
 router = APIRouter(prefix="/prices", tags=["Prices"])
 
+# Cache TTLs (seconds) for catalogue endpoints; products and plazas change rarely
+OPTIONS_CACHE_TTL = int(os.getenv("OPTIONS_CACHE_TTL", "3600"))
+PRODUCTS_CACHE_TTL = int(os.getenv("PRODUCTS_CACHE_TTL", "3600"))
+MARKETS_CACHE_TTL = int(os.getenv("MARKETS_CACHE_TTL", "3600"))
+
+# Size limits of /prices/latest/batch/ (rows x columns of the matrix)
+BATCH_MAX_PRODUCTS = int(os.getenv("BATCH_MAX_PRODUCTS", "100"))
+BATCH_MAX_MARKETS = int(os.getenv("BATCH_MAX_MARKETS", "50"))
+
 # --- Endpoint 1: Get the latest price ---
 @router.get("/latest/")
-def get_latest_price(product_name: str, market_name: str, db: Session = Depends(get_db)):
+async def get_latest_price(product_name: str, market_name: str, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve the latest price for a given product and market in Medellín.
     Handles misspellings or similar names by suggesting close matches.
+
+    Prices are served from the latest price snapshot (see
+    `utils.latest_prices`), so the `precios` table is not scanned per request.
     """
-    # First, try to find an exact or close match
-    query = text("""
-        SELECT p.precio_por_kg, p.fecha, pr.nombre AS producto, pl.nombre AS plaza
-        FROM precios p
-        JOIN productos pr ON pr.producto_id = p.producto_id
-        JOIN plazas_mercado pl ON pl.plaza_id = p.plaza_id
-        WHERE pr.nombre ILIKE :product_name
-          AND pl.nombre ILIKE :market_name
-          AND pl.ciudad = 'Medellín'
-        ORDER BY p.fecha DESC
-        LIMIT 1
-    """)
-
-    result = db.execute(query, {
-        "product_name": f"%{product_name}%",
-        "market_name": f"%{market_name}%"
-    }).fetchone()
-
-    # If not found, suggest possible similar product names
+    # Keyed lookup in the in-process latest price snapshot (reloaded when stale)
+    await latest_price_store.ensure_fresh(db)
+    result = latest_price_store.find(product_name, market_name, city="Medellín")
+
+    # If not found, suggest possible similar product names (ranked, accent-insensitive)
     if not result:
-        suggestion_query = text("""
-            SELECT nombre 
-            FROM productos
-            WHERE nombre ILIKE :similar
-            ORDER BY nombre ASC
-            LIMIT 5
-        """)
-        suggestions = db.execute(suggestion_query, {"similar": f"%{product_name[:3]}%"}).fetchall()
-        suggested_names = [s.nombre for s in suggestions]
+        await product_search_index.ensure_fresh(db)
+        suggested_names = product_search_index.suggest(product_name, limit=5)
 
         if suggested_names:
             raise HTTPException(
@@ -71,72 +67,146 @@ def get_latest_price(product_name: str, market_name: str, db: Session = Depends(
         "mensaje": "Consulta realizada exitosamente."
     }
 
-# --- Endpoint 2: Get all available options ---
-@router.get("/options/")
-def get_options(db: Session = Depends(get_db)):
+# --- Endpoint 1b: Get the latest prices of many products in many markets ---
+@router.get("/latest/batch/")
+async def get_latest_prices_batch(
+    product_ids: List[int] = Query(..., description="Product ids (repeat the parameter for each id)"),
+    market_ids: List[int] = Query(..., description="Market plaza ids (repeat the parameter for each id)"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Return available products and markets (only Medellín) for the frontend.
+    Retrieve the latest price of every product in every market plaza at once.
+
+    Replaces one `/prices/latest/` request per (product, plaza) pair, e.g.
+    `?product_ids=1&product_ids=2&market_ids=3&market_ids=4`. The answer is
+    a compact matrix read from the latest price snapshot: row `i` belongs
+    to `productos[i]`, column `j` to `plazas[j]`, and pairs without a price
+    are `null`. Duplicate ids are ignored.
+
+    Raises:
+        HTTPException: 400 if more than BATCH_MAX_PRODUCTS products or
+            BATCH_MAX_MARKETS plazas are requested.
     """
-    productos_query = text("""
-        SELECT producto_id, nombre
-        FROM productos
-        ORDER BY nombre ASC
-    """)
-    productos = db.execute(productos_query).fetchall()
-
-    plazas_query = text("""
-        SELECT plaza_id, nombre, ciudad
-        FROM plazas_mercado
-        WHERE ciudad ILIKE 'Medellín'
-        ORDER BY nombre ASC
-    """)
-    plazas = db.execute(plazas_query).fetchall()
+    product_ids = list(dict.fromkeys(product_ids))
+    market_ids = list(dict.fromkeys(market_ids))
+    if len(product_ids) > BATCH_MAX_PRODUCTS or len(market_ids) > BATCH_MAX_MARKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permiten como máximo {BATCH_MAX_PRODUCTS} productos y "
+                   f"{BATCH_MAX_MARKETS} plazas por consulta."
+        )
+
+    await latest_price_store.ensure_fresh(db)
+    matrix = latest_price_store.matrix(product_ids, market_ids)
 
     return {
         "productos": [
-            {"id": row.producto_id, "nombre": row.nombre}
-            for row in productos
+            {"id": pid, "nombre": nombre}
+            for pid, nombre in zip(product_ids, matrix.productos)
         ],
         "plazas": [
-            {"id": row.plaza_id, "nombre": row.nombre, "ciudad": row.ciudad}
-            for row in plazas
+            {"id": mid, "nombre": plaza[0] if plaza else None, "ciudad": plaza[1] if plaza else None}
+            for mid, plaza in zip(market_ids, matrix.plazas)
+        ],
+        "precios": [
+            [float(entry.precio_por_kg) if entry else None for entry in row]
+            for row in matrix.precios
         ],
-        "mensaje": "Opciones disponibles obtenidas correctamente."
+        "fechas": [
+            [entry.fecha if entry else None for entry in row]
+            for row in matrix.precios
+        ],
+        "mensaje": "Consulta realizada exitosamente."
     }
 
+# --- Endpoint 2: Get all available options ---
+@router.get("/options/")
+async def get_options(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Return available products and markets (only Medellín) for the frontend.
+
+    The response is cached (see `utils.response_cache`) and supports
+    ETag / If-None-Match revalidation.
+    """
+    async def build():
+        productos_query = text("""
+            SELECT producto_id, nombre
+            FROM productos
+            ORDER BY nombre ASC
+        """)
+        productos = (await db.execute(productos_query)).fetchall()
+
+        plazas_query = text("""
+            SELECT plaza_id, nombre, ciudad
+            FROM plazas_mercado
+            WHERE ciudad ILIKE 'Medellín'
+            ORDER BY nombre ASC
+        """)
+        plazas = (await db.execute(plazas_query)).fetchall()
+
+        return {
+            "productos": [
+                {"id": row.producto_id, "nombre": row.nombre}
+                for row in productos
+            ],
+            "plazas": [
+                {"id": row.plaza_id, "nombre": row.nombre, "ciudad": row.ciudad}
+                for row in plazas
+            ],
+            "mensaje": "Opciones disponibles obtenidas correctamente."
+        }
+
+    return await response_cache.respond(
+        request, "prices:options", OPTIONS_CACHE_TTL, (TAG_PRODUCTS, TAG_MARKETS), build
+    )
+
 # --- Endpoint 3: List all products ---
 @router.get("/products/")
-def list_products(db: Session = Depends(get_db)):
+async def list_products(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     List all available products.
+
+    The response is cached and supports ETag / If-None-Match revalidation.
     """
-    query = text("""
-        SELECT producto_id, nombre
-        FROM productos
-        ORDER BY nombre ASC
-    """)
-    result = db.execute(query).fetchall()
+    async def build():
+        query = text("""
+            SELECT producto_id, nombre
+            FROM productos
+            ORDER BY nombre ASC
+        """)
+        result = (await db.execute(query)).fetchall()
 
-    return {
-        "productos": [{"id": row.producto_id, "nombre": row.nombre} for row in result],
-        "mensaje": "Lista de productos obtenida exitosamente."
-    }
+        return {
+            "productos": [{"id": row.producto_id, "nombre": row.nombre} for row in result],
+            "mensaje": "Lista de productos obtenida exitosamente."
+        }
+
+    return await response_cache.respond(
+        request, "prices:products", PRODUCTS_CACHE_TTL, (TAG_PRODUCTS,), build
+    )
 
 # --- Endpoint 4: List all markets in Medellín ---
 @router.get("/markets/medellin/")
-def list_medellin_markets(db: Session = Depends(get_db)):
+async def list_medellin_markets(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     List all markets in Medellín.
+
+    The response is cached and supports ETag / If-None-Match revalidation.
     """
-    query = text("""
-        SELECT plaza_id, nombre, ciudad
-        FROM plazas_mercado
-        WHERE ciudad = 'Medellín'
-        ORDER BY nombre ASC
-    """)
-    result = db.execute(query).fetchall()
+    async def build():
+        query = text("""
+            SELECT plaza_id, nombre, ciudad
+            FROM plazas_mercado
+            WHERE ciudad = 'Medellín'
+            ORDER BY nombre ASC
+        """)
+        result = (await db.execute(query)).fetchall()
 
-    return {
-        "plazas": [{"id": row.plaza_id, "nombre": row.nombre, "ciudad": row.ciudad} for row in result],
-        "mensaje": "Lista de plazas de Medellín obtenida exitosamente."
-    }
+        return {
+            "plazas": [{"id": row.plaza_id, "nombre": row.nombre, "ciudad": row.ciudad} for row in result],
+            "mensaje": "Lista de plazas de Medellín obtenida exitosamente."
+        }
+
+    return await response_cache.respond(
+        request, "prices:markets:medellin", MARKETS_CACHE_TTL, (TAG_MARKETS,), build
+    )
@@ -3,28 +3,35 @@ User registration routes module.
 
 This module handles user registration functionality, including email validation,
 password complexity checks, and secure password hashing using Argon2.
+
+Users are created with a single `INSERT ... ON CONFLICT DO NOTHING` on the
+pooled database connection; the email uniqueness check is the unique index
+on `usuarios.correo` itself.
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr, constr
-from supabase import create_client, Client
-from passlib.hash import argon2
-from dotenv import load_dotenv
-import os
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from utils.password_hashing import PasswordHasherBusy, password_hasher
 import re
 
 # Router instance
 router = APIRouter(prefix="/registro", tags=["User Registration"])
 
-# Load environment variables from /server/.env
-env_path = os.path.join(os.path.dirname(__file__), "../.env")
-load_dotenv(dotenv_path=env_path)
+# Create the user unless the email is taken (no row returned then).
+# Defaults match `models.User`.
+REGISTER_USER_QUERY = text("""
+    INSERT INTO usuarios (nombre, correo, contrasena_hash, rol, intentos_fallidos)
+    VALUES (:nombre, :correo, :contrasena_hash, 'usuario', 0)
+    ON CONFLICT (correo) DO NOTHING
+    RETURNING usuario_id, nombre, correo, rol, intentos_fallidos, cuenta_bloqueada_hasta
+""")
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
 
 # Input model for user registration
 class UserRegister(BaseModel):
@@ -76,19 +83,21 @@ def validate_password(password: str) -> tuple[bool, str]:
 
 # Register user endpoint
 @router.post("/")
-def register_user(user: UserRegister):
+async def register_user(user: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user in the system.
 
     This endpoint handles the complete user registration process including:
-    - Email uniqueness validation
     - Password complexity verification
-    - Secure password hashing with Argon2
-    - User data persistence in the database
+    - Secure password hashing with Argon2 (in the password hashing pool,
+      off the event loop)
+    - User data persistence in the database, with the email uniqueness
+      validation in the same statement
 
     Args:
         user (UserRegister): User registration data containing name, email,
             and password.
+        db (AsyncSession): Pooled database session.
 
     Returns:
         dict: A dictionary containing:
@@ -99,7 +108,8 @@ def register_user(user: UserRegister):
         HTTPException: 400 BAD REQUEST if:
             - Email is already registered.
             - Password doesn't meet complexity requirements.
-        HTTPException: 503 SERVICE UNAVAILABLE if database connection fails.
+        HTTPException: 503 SERVICE UNAVAILABLE if database connection fails
+            or too many password hashes are already queued.
         HTTPException: 500 INTERNAL SERVER ERROR if user creation fails or
             unexpected errors occur.
 
@@ -109,46 +119,43 @@ def register_user(user: UserRegister):
         ...     email="john@example.com",
         ...     password="SecurePass123!"
         ... )
-        >>> response = register_user(user_data)
+        >>> response = await register_user(user_data, db)
         >>> print(response["message"])
         'Usuario creado correctamente.'
     """
     try:
-        existing = supabase.table("usuarios").select("*").eq("correo", user.email).execute()
-        if existing.data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Este correo ya ha sido registrado."
-            )
-
         is_valid, message = validate_password(user.password)
         if not is_valid:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
 
-        hashed_password = argon2.hash(user.password)
+        try:
+            hashed_password = await password_hasher.hash(user.password)
+        except PasswordHasherBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio ocupado, inténtalo nuevamente en unos segundos"
+            )
 
         try:
-            response = supabase.table("usuarios").insert({
+            created = (await db.execute(REGISTER_USER_QUERY, {
                 "nombre": user.name,
                 "correo": user.email,
                 "contrasena_hash": hashed_password,
-            }).execute()
-        except Exception:
+            })).mappings().first()
+            await db.commit()
+        except SQLAlchemyError:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Error al conectarse con la base de datos. Inténtalo nuevamente más tarde."
             )
 
-        if not response.data:
+        if created is None:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="El usuario no se pudo crear debido a un error interno."
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Este correo ya ha sido registrado."
             )
 
-        created_user = response.data[0]
-        created_user.pop("contrasena_hash", None)
-
-        return {"message": "Usuario creado correctamente.", "user": created_user}
+        return {"message": "Usuario creado correctamente.", "user": dict(created)}
 
     except HTTPException as e:
         raise e
@@ -156,4 +163,4 @@ def register_user(user: UserRegister):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error inesperado en el servidor: {str(e)}"
-        )
\ No newline at end of file
+        )
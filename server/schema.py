@@ -0,0 +1,210 @@
+"""
+Schema migration module.
+
+This module holds idempotent DDL for database objects that the ORM models
+cannot create through `Base.metadata.create_all`, such as expression indexes
+and indexes on tables that are only queried with raw SQL
+(e.g. `historial_precios`), and the explicit migration command that creates
+the ORM tables and applies these extensions.
+
+The API does not touch the schema when it is imported or started (unless
+`RUN_MIGRATIONS_ON_STARTUP=true`); run the migration once per deploy.
+
+Every statement uses `IF NOT EXISTS` (or checks the catalog first), so
+applying the extensions repeatedly is safe. Statements whose table does not
+exist yet are skipped.
+
+Usage:
+    python -m schema            # create missing tables and apply extensions
+    python -m schema --dry-run  # only list the tables that would be created
+
+    from database import engine
+    from schema import migrate
+
+    migrate(engine)
+"""
+
+import argparse
+from typing import List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# (table, DDL statement) pairs, applied in order
+SCHEMA_EXTENSIONS: List[Tuple[str, str]] = [
+    # Sargable lookups by normalized product name (no spaces, no hyphens, lowercase).
+    # Must match `utils.product_search.history_key`.
+    (
+        "productos",
+        "CREATE INDEX IF NOT EXISTS ix_productos_nombre_normalizado "
+        "ON productos ((LOWER(REPLACE(REPLACE(nombre, ' ', ''), '-', ''))))",
+    ),
+    # Latest price per (product, plaza) and upserts of bulk price ingestion
+    (
+        "precios",
+        "CREATE INDEX IF NOT EXISTS ix_precios_producto_plaza_fecha "
+        "ON precios (producto_id, plaza_id, fecha)",
+    ),
+    # Registration relies on a unique index on correo for INSERT ... ON CONFLICT (correo).
+    # create_all already builds one (`ix_usuarios_correo`, from `unique=True, index=True`)
+    # and older tables may have a `UNIQUE` constraint instead, so it is only created when
+    # no unique index on correo exists. A `usuarios_correo_key` index left by an earlier
+    # version of this migration next to a unique `ix_usuarios_correo` is dropped.
+    (
+        "usuarios",
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('usuarios_correo_key') IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'usuarios_correo_key')
+               AND EXISTS (
+                   SELECT 1 FROM pg_index
+                   WHERE indexrelid = to_regclass('ix_usuarios_correo') AND indisunique
+               ) THEN
+                DROP INDEX usuarios_correo_key;
+            END IF;
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+                WHERE i.indrelid = 'usuarios'::regclass AND i.indisunique AND i.indnatts = 1
+                  AND i.indpred IS NULL AND a.attname = 'correo'
+            ) THEN
+                CREATE UNIQUE INDEX usuarios_correo_key ON usuarios (correo);
+            END IF;
+        END $$
+        """,
+    ),
+    # Email links store a fixed-width hash of their token instead of the token itself.
+    # Existing links are hashed in place and their plain token cleared.
+    (
+        "enlaces_correo",
+        "ALTER TABLE enlaces_correo ADD COLUMN IF NOT EXISTS token_hash BYTEA",
+    ),
+    (
+        "enlaces_correo",
+        "ALTER TABLE enlaces_correo ALTER COLUMN enlace_url DROP NOT NULL",
+    ),
+    (
+        "enlaces_correo",
+        "UPDATE enlaces_correo SET token_hash = sha256(convert_to(enlace_url, 'UTF8')), enlace_url = NULL "
+        "WHERE token_hash IS NULL AND enlace_url IS NOT NULL",
+    ),
+    (
+        "enlaces_correo",
+        "ALTER TABLE enlaces_correo ALTER COLUMN token_hash SET NOT NULL",
+    ),
+    # Names match the ones `create_all` gives the model's unique column and index
+    (
+        "enlaces_correo",
+        "CREATE UNIQUE INDEX IF NOT EXISTS enlaces_correo_token_hash_key ON enlaces_correo (token_hash)",
+    ),
+    (
+        "enlaces_correo",
+        "ALTER TABLE enlaces_correo DROP CONSTRAINT IF EXISTS enlaces_correo_enlace_url_key",
+    ),
+    # Link sweeper: expired links, oldest first
+    (
+        "enlaces_correo",
+        "CREATE INDEX IF NOT EXISTS ix_enlaces_correo_expira_en ON enlaces_correo (expira_en)",
+    ),
+    # Archive of swept links (LINK_SWEEP_ARCHIVE=true); no indexes, write-only
+    (
+        "enlaces_correo",
+        "CREATE TABLE IF NOT EXISTS enlaces_correo_archivo "
+        "(LIKE enlaces_correo, archivado_en TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'))",
+    ),
+    # Plain-text alternative of outbox emails (tables created before it existed)
+    (
+        "correos_salientes",
+        "ALTER TABLE correos_salientes ADD COLUMN IF NOT EXISTS cuerpo_texto TEXT",
+    ),
+    # Outbox worker: due pending emails, oldest first
+    (
+        "correos_salientes",
+        "CREATE INDEX IF NOT EXISTS ix_correos_salientes_pendientes "
+        "ON correos_salientes (proximo_intento) WHERE estado = 'pendiente'",
+    ),
+    # Finished emails: bodies cleared (they may hold reset links), rows
+    # purged by age by the link sweeper
+    (
+        "correos_salientes",
+        "UPDATE correos_salientes SET cuerpo_html = '', cuerpo_texto = NULL "
+        "WHERE estado <> 'pendiente' AND (cuerpo_html <> '' OR cuerpo_texto IS NOT NULL)",
+    ),
+    (
+        "correos_salientes",
+        "CREATE INDEX IF NOT EXISTS ix_correos_salientes_terminados "
+        "ON correos_salientes (fecha_creacion) WHERE estado <> 'pendiente'",
+    ),
+    # Range scans of a product's history by date
+    (
+        "historial_precios",
+        "CREATE INDEX IF NOT EXISTS ix_historial_precios_producto_fecha "
+        "ON historial_precios (producto_id, fecha_precio)",
+    ),
+]
+
+
+def apply_schema_extensions(bind: Engine) -> List[str]:
+    """
+    Apply all schema extensions in a single transaction.
+
+    Args:
+        bind (Engine): SQLAlchemy engine connected to the target database.
+
+    Returns:
+        List[str]: The DDL statements that were executed.
+    """
+    applied = []
+    with bind.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for table, ddl in SCHEMA_EXTENSIONS:
+            if table not in existing:
+                continue
+            conn.execute(text(ddl))
+            applied.append(ddl)
+    return applied
+
+
+def migrate(bind: Engine) -> List[str]:
+    """
+    Create the ORM tables that do not exist yet and apply the extensions.
+
+    Args:
+        bind (Engine): SQLAlchemy engine connected to the target database.
+
+    Returns:
+        List[str]: Names of the tables created followed by the extension
+            DDL statements executed.
+    """
+    # Registers every model on Base.metadata
+    import models  # noqa: F401
+    from database import Base
+
+    existing = set(inspect(bind).get_table_names())
+    created = [t.name for t in Base.metadata.sorted_tables if t.name not in existing]
+    Base.metadata.create_all(bind=bind)
+    return created + apply_schema_extensions(bind)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create missing tables and apply schema extensions.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the tables that would be created")
+    args = parser.parse_args()
+
+    import models  # noqa: F401
+    from database import Base, engine
+
+    if args.dry_run:
+        existing = set(inspect(engine).get_table_names())
+        missing = [t.name for t in Base.metadata.sorted_tables if t.name not in existing]
+        print("Tablas por crear:", ", ".join(missing) or "ninguna")
+        return
+
+    for step in migrate(engine):
+        print(step)
+    print("Esquema actualizado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Outbound email queue (outbox) utilities.
+
+Routes never talk to SMTP. They insert the email into the
+`correos_salientes` table (`enqueue_email`) and return immediately; a
+background worker thread in each API process delivers the queue:
+
+    - Due emails are claimed in batches with `FOR UPDATE SKIP LOCKED`, so
+      several workers (or API instances) never send the same email.
+      A claim is a lease: if the process dies mid-batch, the emails become
+      due again after `EMAIL_OUTBOX_LEASE_SECONDS`.
+    - One authenticated SMTP connection is reused across emails and
+      batches, and closed after `SMTP_IDLE_SECONDS` without traffic.
+    - Failed deliveries are retried with exponential backoff
+      (`EMAIL_OUTBOX_BACKOFF_SECONDS` * 2^(attempt-1), capped at one hour)
+      and marked "fallido" after `EMAIL_OUTBOX_MAX_ATTEMPTS` attempts.
+    - The bodies of sent and failed emails are cleared, so reset links do
+      not outlive their delivery; the rows themselves are purged after
+      `EMAIL_OUTBOX_RETENTION_DAYS` by `utils.link_maintenance`.
+
+Environment Variables:
+    EMAIL_USER: Sender address (and SMTP login).
+    EMAIL_PASS: SMTP password; login is skipped when empty or when the
+        server does not offer AUTH (e.g. a local aiosmtpd stand-in).
+    SMTP_HOST: SMTP server (default: smtp.gmail.com).
+    SMTP_PORT: SMTP port (default: 465).
+    SMTP_USE_SSL: Implicit TLS (default: true); false for plain SMTP with
+        STARTTLS when offered.
+    SMTP_TIMEOUT: Socket timeout in seconds (default: 30).
+    SMTP_IDLE_SECONDS: Close the connection after this idle time (default: 60).
+    EMAIL_OUTBOX_ENABLED: Start the worker with the API (default: true).
+    EMAIL_OUTBOX_BATCH_SIZE: Emails claimed per batch (default: 50).
+    EMAIL_OUTBOX_POLL_SECONDS: Idle polling interval (default: 5).
+    EMAIL_OUTBOX_MAX_ATTEMPTS: Attempts before giving up (default: 5).
+    EMAIL_OUTBOX_BACKOFF_SECONDS: First retry delay (default: 30).
+    EMAIL_OUTBOX_LEASE_SECONDS: Claim lease (default: 300).
+
+Usage:
+    from utils.email_outbox import enqueue_email, email_outbox_worker
+
+    enqueue_email(db, "user@example.com", "Asunto", "<html>...</html>", "Texto")
+
+    # Deliver the due emails once, without the background thread
+    python -m utils.email_outbox
+"""
+
+import argparse
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from config import env_bool
+from database import engine
+from models import OutboxEmail
+from utils.email_templates import build_message
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = env_bool("SMTP_USE_SSL", True)
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+EMAIL_OUTBOX_ENABLED = env_bool("EMAIL_OUTBOX_ENABLED", True)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_BACKOFF_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", "30"))
+EMAIL_OUTBOX_LEASE_SECONDS = float(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", "300"))
+
+# Longest delay between two attempts
+MAX_BACKOFF_SECONDS = 3600
+
+# Claims due emails and pushes their next attempt past the lease, so a
+# crashed worker's batch is picked up again once the lease runs out
+CLAIM_QUERY = text("""
+    UPDATE correos_salientes
+    SET intentos = intentos + 1, proximo_intento = :lease_until
+    WHERE correo_id IN (
+        SELECT correo_id
+        FROM correos_salientes
+        WHERE estado = 'pendiente' AND proximo_intento <= :now AND intentos < :max_attempts
+        ORDER BY proximo_intento
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING correo_id, destinatario, asunto, cuerpo_html, cuerpo_texto, intentos
+""")
+
+# Gives up emails whose last attempt was claimed by a worker that died
+# before recording the outcome (lease run out, no attempts left)
+EXPIRE_QUERY = text("""
+    UPDATE correos_salientes
+    SET estado = 'fallido', cuerpo_html = '', cuerpo_texto = NULL,
+        ultimo_error = COALESCE(ultimo_error, 'Intentos agotados')
+    WHERE estado = 'pendiente' AND proximo_intento <= :now AND intentos >= :max_attempts
+""")
+
+# Bodies are cleared once an email is finished: they may hold a live reset
+# link, and only its token hash is meant to be stored
+MARK_SENT_QUERY = text("""
+    UPDATE correos_salientes
+    SET estado = 'enviado', fecha_envio = :now, ultimo_error = NULL, cuerpo_html = '', cuerpo_texto = NULL
+    WHERE correo_id = :correo_id
+""")
+
+MARK_FAILED_QUERY = text("""
+    UPDATE correos_salientes
+    SET estado = :estado, proximo_intento = :proximo_intento, ultimo_error = :error,
+        cuerpo_html = CASE WHEN :estado = 'fallido' THEN '' ELSE cuerpo_html END,
+        cuerpo_texto = CASE WHEN :estado = 'fallido' THEN NULL ELSE cuerpo_texto END
+    WHERE correo_id = :correo_id
+""")
+
+
+def enqueue_email(db: Session, to: str, subject: str, html: str, text_body: Optional[str] = None) -> OutboxEmail:
+    """
+    Add an email to the outbox and commit.
+
+    The worker is woken up right after the commit, so the email goes out
+    without waiting for the next poll.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        to (str): Recipient address.
+        subject (str): Subject line.
+        html (str): HTML body.
+        text_body (str | None): Plain-text alternative; the email is sent as
+            multipart/alternative when given.
+
+    Returns:
+        OutboxEmail: The pending outbox row.
+    """
+    email = OutboxEmail(
+        destinatario=to, asunto=subject, cuerpo_html=html, cuerpo_texto=text_body, estado="pendiente"
+    )
+    db.add(email)
+    db.commit()
+    email_outbox_worker.notify()
+    return email
+
+
+def backoff_seconds(attempt: int) -> float:
+    """
+    Delay before retrying after the given (1-based) failed attempt.
+    """
+    return min(MAX_BACKOFF_SECONDS, EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+# =============================== #
+#   SMTP connection               #
+# =============================== #
+class SMTPConnection:
+    """
+    A lazily opened, reused, authenticated SMTP connection.
+    """
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, use_ssl: bool = SMTP_USE_SSL,
+                 user: Optional[str] = None, password: Optional[str] = None,
+                 timeout: float = SMTP_TIMEOUT, idle_seconds: float = SMTP_IDLE_SECONDS):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.user = user if user is not None else os.getenv("EMAIL_USER")
+        self.password = password if password is not None else os.getenv("EMAIL_PASS")
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.connections_opened = 0
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _open(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+            server.ehlo()
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.ehlo()
+            if server.has_extn("starttls"):
+                server.starttls()
+                server.ehlo()
+        if self.user and self.password and server.has_extn("auth"):
+            server.login(self.user, self.password)
+        self.connections_opened += 1
+        return server
+
+    def send(self, to: str, message: str) -> None:
+        """
+        Send one message, reconnecting once if the server dropped the
+        connection since the last send.
+        """
+        for attempt in range(2):
+            if self._server is None:
+                self._server = self._open()
+            try:
+                self._server.sendmail(self.user or "", to, message)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._server = None
+                if attempt:
+                    raise
+
+    def close_if_idle(self) -> None:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+
+# =============================== #
+#   Worker                        #
+# =============================== #
+class EmailOutboxWorker:
+    """
+    Background thread delivering the outbox.
+
+    Attributes:
+        sent (int): Emails delivered by this process.
+        retried (int): Failed attempts scheduled for a retry.
+        failed (int): Emails given up after the last attempt.
+    """
+
+    def __init__(self, bind=engine, connection: Optional[SMTPConnection] = None,
+                 batch_size: int = EMAIL_OUTBOX_BATCH_SIZE, poll_seconds: float = EMAIL_OUTBOX_POLL_SECONDS,
+                 max_attempts: int = EMAIL_OUTBOX_MAX_ATTEMPTS):
+        self.bind = bind
+        self.connection = connection or SMTPConnection()
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _claim(self) -> List:
+        now = datetime.utcnow()
+        with self.bind.begin() as conn:
+            self.failed += conn.execute(EXPIRE_QUERY, {"now": now, "max_attempts": self.max_attempts}).rowcount
+            return conn.execute(CLAIM_QUERY, {
+                "now": now,
+                "lease_until": now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS),
+                "limit": self.batch_size,
+                "max_attempts": self.max_attempts,
+            }).fetchall()
+
+    def _message(self, row) -> str:
+        return build_message(
+            f"Plaze Soporte <{self.connection.user}>", row.destinatario,
+            row.asunto, row.cuerpo_html, row.cuerpo_texto,
+        )
+
+    def process_batch(self) -> int:
+        """
+        Claim and deliver one batch of due emails.
+
+        Every email's outcome is recorded, whatever the error: an exception
+        never aborts the batch (which would send its delivered emails again
+        once the lease runs out).
+
+        Returns:
+            int: Number of emails claimed.
+        """
+        rows = self._claim()
+        sent, failed = [], []
+        for row in rows:
+            try:
+                message = self._message(row)
+                self.connection.send(row.destinatario, message)
+                sent.append({"correo_id": row.correo_id, "now": datetime.utcnow()})
+            except Exception as e:
+                # A refused recipient, or an email that cannot be encoded
+                # (e.g. a non-ASCII address), will not succeed on retry; any
+                # other error may leave the connection unusable, so reopen it
+                permanent = isinstance(e, (smtplib.SMTPRecipientsRefused, UnicodeError))
+                if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                    self.connection.close()
+                final = permanent or row.intentos >= self.max_attempts
+                failed.append({
+                    "correo_id": row.correo_id,
+                    "estado": "fallido" if final else "pendiente",
+                    "proximo_intento": datetime.utcnow() + timedelta(seconds=backoff_seconds(row.intentos)),
+                    "error": str(e)[:1000],
+                })
+
+        if sent or failed:
+            with self.bind.begin() as conn:
+                if sent:
+                    conn.execute(MARK_SENT_QUERY, sent)
+                if failed:
+                    conn.execute(MARK_FAILED_QUERY, failed)
+        self.sent += len(sent)
+        self.failed += sum(1 for f in failed if f["estado"] == "fallido")
+        self.retried += sum(1 for f in failed if f["estado"] == "pendiente")
+        return len(rows)
+
+    def drain(self) -> int:
+        """
+        Deliver batches until no email is due. Returns the emails claimed.
+        """
+        total = 0
+        while True:
+            claimed = self.process_batch()
+            total += claimed
+            if claimed < self.batch_size:
+                return total
+
+    def notify(self) -> None:
+        """
+        Wake the worker up (called after enqueueing).
+        """
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"Error en la cola de correos: {e}")
+            self.connection.close_if_idle()
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+        self.connection.close()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        """
+        Return the pending queue size, the outbox size estimate and this
+        process's delivery counters.
+        """
+        with self.bind.connect() as conn:
+            # Through the partial index: only the pending rows are counted
+            pending = conn.execute(text(
+                "SELECT COUNT(*) FROM correos_salientes WHERE estado = 'pendiente'"
+            )).scalar()
+            # Planner estimate: an exact count of the whole outbox is too slow
+            estimate = conn.execute(text(
+                "SELECT reltuples::BIGINT FROM pg_class WHERE oid = 'correos_salientes'::regclass"
+            )).scalar()
+        return {
+            "running": self.is_running(),
+            "pending": pending,
+            "emails_estimate": max(estimate or 0, 0),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_connections_opened": self.connection.connections_opened,
+        }
+
+
+# Shared worker, started and stopped by main.py
+email_outbox_worker = EmailOutboxWorker()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deliver the due emails of the outbox once.")
+    parser.parse_args()
+    try:
+        print(f"Correos procesados: {email_outbox_worker.drain()}")
+    finally:
+        email_outbox_worker.connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Email template utilities.
+
+The HTML and plain-text bodies of the transactional emails live in
+`templates/email/<name>.html` and `<name>.txt`. They are read and compiled
+once, when this module is imported at startup: each template is split into
+its literal chunks and `{{ field }}` placeholders, so rendering is a single
+`str.join` over precomputed pieces instead of re-parsing or re-formatting
+a large f-string per email.
+
+`build_message` assembles the final `multipart/alternative` message
+(text + HTML, base64 bodies) directly as a string. It replaces `MIMEText`
+and `Message.as_string()`, whose generator is the costliest step when a
+lockout storm queues thousands of emails.
+
+Values rendered into HTML are escaped; values rendered into text are not.
+
+Usage:
+    from utils.email_templates import email_templates, build_message
+
+    email = email_templates.render("recuperacion_password", nombre="Ana", enlace=link)
+    email.subject, email.html, email.text
+
+    # In the outbox worker
+    message = build_message("Plaze Soporte <a@b.com>", "user@example.com",
+                            email.subject, email.html, email.text)
+"""
+
+import base64
+import html
+import os
+import re
+import uuid
+from email.header import Header
+from email.utils import formatdate
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email")
+
+# Subject line of each template
+SUBJECTS: Dict[str, str] = {
+    "bloqueo_cuenta": "❌ Cuenta bloqueada temporalmente",
+    "recuperacion_password": "🔐 Recuperación de contraseña",
+}
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class RenderedEmail(NamedTuple):
+    """
+    Subject and bodies of a rendered email.
+    """
+    subject: str
+    html: str
+    text: Optional[str]
+
+
+class CompiledTemplate:
+    """
+    A template split into literal chunks and placeholder names.
+
+    `parts` alternates literal text (even indexes) and field names (odd
+    indexes), as produced by `re.split` with one capturing group.
+    """
+
+    def __init__(self, source: str, escape: bool):
+        self.parts: List[str] = PLACEHOLDER.split(source)
+        self.fields: Tuple[str, ...] = tuple(self.parts[1::2])
+        self.escape = escape
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        Substitute the placeholders.
+
+        Raises:
+            KeyError: If a placeholder has no value.
+        """
+        parts = self.parts[:]
+        escape = html.escape if self.escape else str
+        for i in range(1, len(parts), 2):
+            parts[i] = escape(values[parts[i]])
+        return "".join(parts)
+
+
+class EmailTemplates:
+    """
+    Registry of compiled email templates, loaded from `TEMPLATES_DIR`.
+    """
+
+    def __init__(self, directory: str = TEMPLATES_DIR, subjects: Dict[str, str] = SUBJECTS):
+        self._templates: Dict[str, Tuple[str, CompiledTemplate, Optional[CompiledTemplate]]] = {}
+        for name, subject in subjects.items():
+            with open(os.path.join(directory, f"{name}.html"), encoding="utf-8") as f:
+                html_template = CompiledTemplate(f.read(), escape=True)
+            text_path = os.path.join(directory, f"{name}.txt")
+            text_template = None
+            if os.path.exists(text_path):
+                with open(text_path, encoding="utf-8") as f:
+                    text_template = CompiledTemplate(f.read(), escape=False)
+            self._templates[name] = (subject, html_template, text_template)
+
+    def render(self, name: str, **values: str) -> RenderedEmail:
+        """
+        Render the subject and bodies of template `name`.
+
+        Args:
+            name (str): Template name, e.g. "recuperacion_password".
+            **values: Placeholder values (e.g. nombre, enlace).
+
+        Returns:
+            RenderedEmail: Subject, HTML body and text body (None if the
+                template has no .txt version).
+        """
+        subject, html_template, text_template = self._templates[name]
+        return RenderedEmail(
+            subject,
+            html_template.render(values),
+            text_template.render(values) if text_template is not None else None,
+        )
+
+
+# =============================== #
+#   MIME assembly                 #
+# =============================== #
+@lru_cache(maxsize=64)
+def _encoded_header(value: str) -> str:
+    """
+    RFC 2047 encode a header value (cached: subjects and senders repeat).
+    """
+    if value.isascii():
+        return value
+    return Header(value, "utf-8").encode()
+
+
+def _base64_body(body: str) -> str:
+    return base64.encodebytes(body.encode("utf-8")).decode("ascii")
+
+
+def build_message(sender: str, to: str, subject: str, html_body: str, text_body: Optional[str] = None) -> str:
+    """
+    Return the full RFC 5322 message as a string, ready for `sendmail`.
+
+    With `text_body` the message is `multipart/alternative` (text first,
+    HTML preferred); without it, a single `text/html` part.
+    """
+    headers = (
+        f"From: {_encoded_header(sender)}\n"
+        f"To: {to}\n"
+        f"Subject: {_encoded_header(subject)}\n"
+        f"Date: {formatdate(localtime=False)}\n"
+        "MIME-Version: 1.0\n"
+    )
+    if text_body is None:
+        return (
+            headers
+            + 'Content-Type: text/html; charset="utf-8"\n'
+            "Content-Transfer-Encoding: base64\n\n"
+            + _base64_body(html_body)
+        )
+
+    boundary = "=_plaze_" + uuid.uuid4().hex
+    return "".join((
+        headers,
+        f'Content-Type: multipart/alternative; boundary="{boundary}"\n\n',
+        f"--{boundary}\n",
+        'Content-Type: text/plain; charset="utf-8"\n',
+        "Content-Transfer-Encoding: base64\n\n",
+        _base64_body(text_body),
+        f"--{boundary}\n",
+        'Content-Type: text/html; charset="utf-8"\n',
+        "Content-Transfer-Encoding: base64\n\n",
+        _base64_body(html_body),
+        f"--{boundary}--\n",
+    ))
+
+
+# Templates compiled once at import (application startup)
+email_templates = EmailTemplates()
@@ -0,0 +1,185 @@
+"""
+Readiness probe utilities.
+
+`GET /health` is a liveness check: it only proves the process answers.
+`GET /health/ready` uses this module to check the dependencies a request
+actually needs:
+
+    - database: `SELECT 1` through the async pool, plus pool saturation.
+    - supabase: HTTP reachability of the Supabase REST endpoint (used by
+      the maintenance windows).
+    - email_outbox: worker thread alive and age of the oldest due email.
+
+Each dependency reports a status ("ok", "degraded" or "down") and its
+latency, nothing else: the endpoint is unauthenticated, so the details of
+a failing check (error messages may name hosts and ports) are only
+printed to the server log. Results are cached for `HEALTH_CACHE_SECONDS` and concurrent
+probes share one in-flight check, so frequent probes from the load
+balancer and orchestrators never hammer the dependencies. Every check is
+bounded by `HEALTH_CHECK_TIMEOUT`.
+
+The overall status is "down" if the database is down (the instance cannot
+serve prices), "degraded" if any dependency is not "ok", else "ok".
+
+Environment Variables:
+    HEALTH_CACHE_SECONDS: Seconds a readiness result is reused (default: 5).
+    HEALTH_CHECK_TIMEOUT: Seconds before a check counts as down (default: 2).
+    HEALTH_POOL_SATURATION_LIMIT: Pool saturation reported as degraded
+        (default: 0.9).
+    HEALTH_EMAIL_BACKLOG_SECONDS: Age of the oldest due email reported as
+        degraded (default: 300).
+
+Usage:
+    from utils.health_checks import readiness_probe
+
+    report = await readiness_probe.check()
+    report["status"]  # "ok" | "degraded" | "down"
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from sqlalchemy import text
+
+from database import AsyncSessionLocal, get_pool_stats
+from utils.email_outbox import EMAIL_OUTBOX_ENABLED, email_outbox_worker
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+HEALTH_POOL_SATURATION_LIMIT = float(os.getenv("HEALTH_POOL_SATURATION_LIMIT", "0.9"))
+HEALTH_EMAIL_BACKLOG_SECONDS = float(os.getenv("HEALTH_EMAIL_BACKLOG_SECONDS", "300"))
+
+OK, DEGRADED, DOWN = "ok", "degraded", "down"
+
+# Dependencies without which the instance cannot serve its main traffic
+CRITICAL = ("database",)
+
+OUTBOX_BACKLOG_QUERY = text("""
+    SELECT COUNT(*) AS pendientes, MIN(proximo_intento) AS mas_antiguo
+    FROM correos_salientes
+    WHERE estado = 'pendiente' AND proximo_intento <= :now
+""")
+
+
+# =============================== #
+#   Dependency checks             #
+# =============================== #
+async def check_database() -> dict:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT 1"))
+    pools = get_pool_stats()
+    saturation = max(pool["saturation"] for pool in pools.values())
+    return {
+        "status": DEGRADED if saturation >= HEALTH_POOL_SATURATION_LIMIT else OK,
+        "pool_saturation": saturation,
+    }
+
+
+async def check_supabase() -> dict:
+    url = os.getenv("SUPABASE_URL")
+    if not url:
+        return {"status": DOWN, "detail": "SUPABASE_URL no configurado"}
+    key = os.getenv("SUPABASE_ANON_KEY") or os.getenv("SUPABASE_KEY") or ""
+    async with httpx.AsyncClient(timeout=HEALTH_CHECK_TIMEOUT) as client:
+        response = await client.get(f"{url.rstrip('/')}/rest/v1/", headers={"apikey": key})
+    # Any answer below 500 means the service is reachable
+    return {"status": OK if response.status_code < 500 else DEGRADED, "http_status": response.status_code}
+
+
+async def check_email_outbox() -> dict:
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(OUTBOX_BACKLOG_QUERY, {"now": now})).one()
+    backlog_seconds = (now - row.mas_antiguo).total_seconds() if row.mas_antiguo else 0.0
+    running = email_outbox_worker.is_running()
+    worker_ok = running or not EMAIL_OUTBOX_ENABLED
+    return {
+        "status": OK if worker_ok and backlog_seconds < HEALTH_EMAIL_BACKLOG_SECONDS else DEGRADED,
+        "worker_running": running,
+        "due": row.pendientes,
+        "oldest_due_seconds": round(backlog_seconds, 1),
+    }
+
+
+CHECKS: Dict[str, Callable[[], Awaitable[dict]]] = {
+    "database": check_database,
+    "supabase": check_supabase,
+    "email_outbox": check_email_outbox,
+}
+
+
+# =============================== #
+#   Probe                         #
+# =============================== #
+class ReadinessProbe:
+    """
+    Runs the dependency checks concurrently and caches the report.
+
+    Attributes:
+        cache_seconds (float): How long a report is reused.
+        timeout (float): Per-check timeout in seconds.
+        runs (int): Times the checks actually ran (cache misses).
+    """
+
+    def __init__(self, checks: Dict[str, Callable[[], Awaitable[dict]]] = CHECKS,
+                 cache_seconds: float = HEALTH_CACHE_SECONDS, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.checks = checks
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self.runs = 0
+        self._report: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _run_check(self, check: Callable[[], Awaitable[dict]]) -> dict:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check(), self.timeout)
+        except asyncio.TimeoutError:
+            result = {"status": DOWN, "detail": f"Sin respuesta en {self.timeout:g} s"}
+        except Exception as e:
+            result = {"status": DOWN, "detail": f"{type(e).__name__}: {e}"}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    async def _run(self) -> dict:
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(self.checks[name]) for name in names))
+        for name, result in zip(names, results):
+            if result["status"] != OK:
+                print(f"Dependencia {name} en estado {result['status']}: {result}")
+        # Only status and latency are published
+        results = [{"status": result["status"], "latency_ms": result["latency_ms"]} for result in results]
+        dependencies = dict(zip(names, results))
+
+        if any(dependencies[name]["status"] == DOWN for name in CRITICAL if name in dependencies):
+            status = DOWN
+        elif any(result["status"] != OK for result in results):
+            status = DEGRADED
+        else:
+            status = OK
+        self.runs += 1
+        return {"status": status, "checked_at": datetime.utcnow().isoformat() + "Z", "dependencies": dependencies}
+
+    async def check(self) -> dict:
+        """
+        Return the cached report, running the checks if it is too old.
+        """
+        if self._report is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._report
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have refreshed the report while we waited
+            if self._report is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._report = await self._run()
+                self._checked_at = time.monotonic()
+        return self._report
+
+
+# Shared probe used by GET /health/ready
+readiness_probe = ReadinessProbe()
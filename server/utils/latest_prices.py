@@ -0,0 +1,280 @@
+"""
+Latest price snapshot utilities.
+
+This module keeps an in-process snapshot with the most recent price of every
+(producto_id, plaza_id) pair. It allows `/prices/latest/` to answer with keyed
+lookups in memory instead of joining and sorting the whole `precios` table
+on every request.
+
+The snapshot is loaded with a single `DISTINCT ON` query. Code that writes
+prices must call `refresh_latest_prices` (or `LatestPriceStore.record`)
+afterwards so the snapshot stays consistent. A maximum age acts as a safety
+net for writes made by other processes or workers.
+
+Environment Variables:
+    LATEST_PRICES_MAX_AGE_SECONDS: Seconds before the snapshot is considered
+        stale and reloaded on the next lookup (default: 300).
+
+Usage:
+    from utils.latest_prices import latest_price_store
+
+    await latest_price_store.ensure_fresh(db)  # db: AsyncSession
+    entry = latest_price_store.find("tomate", "minorista", city="Medellín")
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+LATEST_PRICES_MAX_AGE_SECONDS = float(os.getenv("LATEST_PRICES_MAX_AGE_SECONDS", "300"))
+
+# One row per (producto_id, plaza_id) with its most recent price
+LATEST_PRICES_QUERY = text("""
+    SELECT DISTINCT ON (p.producto_id, p.plaza_id)
+        p.producto_id,
+        p.plaza_id,
+        p.precio_por_kg,
+        p.fecha,
+        pr.nombre AS producto,
+        pl.nombre AS plaza,
+        pl.ciudad
+    FROM precios p
+    JOIN productos pr ON pr.producto_id = p.producto_id
+    JOIN plazas_mercado pl ON pl.plaza_id = p.plaza_id
+    ORDER BY p.producto_id, p.plaza_id, p.fecha DESC
+""")
+
+
+class LatestPrice(NamedTuple):
+    """
+    Most recent price of a product in a market plaza.
+    """
+    producto_id: int
+    plaza_id: int
+    producto: str
+    plaza: str
+    ciudad: str
+    precio_por_kg: Decimal
+    fecha: date
+
+
+class LatestPriceMatrix(NamedTuple):
+    """
+    Latest prices of several products (rows) in several plazas (columns).
+
+    Names are None for ids that have no price in the snapshot; cells are
+    None for pairs without a price.
+    """
+    productos: List[Optional[str]]
+    plazas: List[Optional[Tuple[str, str]]]
+    precios: List[List[Optional[LatestPrice]]]
+
+
+class LatestPriceStore:
+    """
+    Thread-safe, in-process snapshot of the latest price per (product, plaza).
+
+    Lookups never touch the database. The snapshot is replaced atomically on
+    refresh, so readers always see a consistent version.
+
+    Attributes:
+        max_age (float): Seconds after which `ensure_fresh` reloads the snapshot.
+        loaded_at (float | None): Monotonic timestamp of the last refresh.
+    """
+
+    def __init__(self, max_age: float = LATEST_PRICES_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._entries: Dict[Tuple[int, int], LatestPrice] = {}
+        # producto_id -> (nombre, lowercase nombre)
+        self._products: Dict[int, Tuple[str, str]] = {}
+        # plaza_id -> (nombre, lowercase nombre, ciudad)
+        self._markets: Dict[int, Tuple[str, str, str]] = {}
+
+    # ----------------------------- #
+    #   Loading and invalidation    #
+    # ----------------------------- #
+    def is_stale(self) -> bool:
+        """
+        Return True if the snapshot was never loaded or is older than `max_age`.
+        """
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age
+
+    def refresh(self, db: Session) -> int:
+        """
+        Reload the whole snapshot from the database.
+
+        Args:
+            db (Session): SQLAlchemy session used to run the snapshot query.
+
+        Returns:
+            int: Number of (product, plaza) pairs in the new snapshot.
+        """
+        rows = db.execute(LATEST_PRICES_QUERY).fetchall()
+
+        entries: Dict[Tuple[int, int], LatestPrice] = {}
+        products: Dict[int, Tuple[str, str]] = {}
+        markets: Dict[int, Tuple[str, str, str]] = {}
+        for row in rows:
+            entry = LatestPrice(
+                producto_id=row.producto_id,
+                plaza_id=row.plaza_id,
+                producto=row.producto,
+                plaza=row.plaza,
+                ciudad=row.ciudad,
+                precio_por_kg=row.precio_por_kg,
+                fecha=row.fecha,
+            )
+            entries[(entry.producto_id, entry.plaza_id)] = entry
+            products[entry.producto_id] = (entry.producto, entry.producto.lower())
+            markets[entry.plaza_id] = (entry.plaza, entry.plaza.lower(), entry.ciudad)
+
+        with self._lock:
+            self._entries, self._products, self._markets = entries, products, markets
+            self.loaded_at = time.monotonic()
+        return len(entries)
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """
+        Refresh the snapshot only if it is stale.
+
+        Concurrent callers wait for a single refresh instead of each running
+        the snapshot query.
+
+        Args:
+            db (AsyncSession): Async session; the refresh runs through `run_sync`.
+        """
+        if not self.is_stale():
+            return
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if self.is_stale():
+                await db.run_sync(self.refresh)
+
+    def invalidate(self) -> None:
+        """
+        Mark the snapshot as stale so the next lookup reloads it.
+        """
+        self.loaded_at = None
+
+    def record(self, producto_id: int, plaza_id: int, precio_por_kg: Decimal, fecha: date) -> None:
+        """
+        Apply a single price write to the snapshot.
+
+        The entry is only replaced when the new price is at least as recent as
+        the stored one. Unknown products or plazas invalidate the snapshot,
+        since their names are not available in memory.
+        """
+        with self._lock:
+            current = self._entries.get((producto_id, plaza_id))
+            if current is not None:
+                if fecha >= current.fecha:
+                    self._entries[(producto_id, plaza_id)] = current._replace(
+                        precio_por_kg=precio_por_kg, fecha=fecha
+                    )
+                return
+            product = self._products.get(producto_id)
+            market = self._markets.get(plaza_id)
+            if product is None or market is None:
+                self.loaded_at = None
+                return
+            self._entries[(producto_id, plaza_id)] = LatestPrice(
+                producto_id=producto_id,
+                plaza_id=plaza_id,
+                producto=product[0],
+                plaza=market[0],
+                ciudad=market[2],
+                precio_por_kg=precio_por_kg,
+                fecha=fecha,
+            )
+
+    # ----------------------------- #
+    #   Lookups                     #
+    # ----------------------------- #
+    def get(self, producto_id: int, plaza_id: int) -> Optional[LatestPrice]:
+        """
+        Return the latest price for a (product, plaza) pair, or None.
+        """
+        return self._entries.get((producto_id, plaza_id))
+
+    def matrix(self, producto_ids: Sequence[int], plaza_ids: Sequence[int]) -> LatestPriceMatrix:
+        """
+        Return the latest price of every (product, plaza) combination.
+
+        Args:
+            producto_ids (Sequence[int]): Product ids, one row each.
+            plaza_ids (Sequence[int]): Plaza ids, one column each.
+
+        Returns:
+            LatestPriceMatrix: Product names, (plaza name, city) pairs and the
+                price matrix, in the order of the given ids.
+        """
+        entries, products, markets = self._entries, self._products, self._markets
+        product_names = [products[pid][0] if pid in products else None for pid in producto_ids]
+        market_names = [
+            (markets[mid][0], markets[mid][2]) if mid in markets else None for mid in plaza_ids
+        ]
+        prices = [[entries.get((pid, mid)) for mid in plaza_ids] for pid in producto_ids]
+        return LatestPriceMatrix(productos=product_names, plazas=market_names, precios=prices)
+
+    def find(self, product_name: str, market_name: str, city: Optional[str] = None) -> Optional[LatestPrice]:
+        """
+        Find the most recent price whose product and plaza names contain the
+        given terms (case-insensitive), mirroring the previous `ILIKE '%...%'`
+        query.
+
+        Args:
+            product_name (str): Partial product name.
+            market_name (str): Partial plaza name.
+            city (str, optional): Restrict plazas to this city.
+
+        Returns:
+            LatestPrice | None: The newest matching entry, if any.
+        """
+        entries, products, markets = self._entries, self._products, self._markets
+        product_term = product_name.lower()
+        market_term = market_name.lower()
+
+        product_ids = [pid for pid, (_, lowered) in products.items() if product_term in lowered]
+        if not product_ids:
+            return None
+        market_ids = [
+            mid for mid, (_, lowered, ciudad) in markets.items()
+            if market_term in lowered and (city is None or ciudad == city)
+        ]
+
+        best: Optional[LatestPrice] = None
+        for pid in product_ids:
+            for mid in market_ids:
+                entry = entries.get((pid, mid))
+                if entry is not None and (best is None or entry.fecha > best.fecha):
+                    best = entry
+        return best
+
+
+# Shared snapshot used by the price routes
+latest_price_store = LatestPriceStore()
+
+
+def refresh_latest_prices(db: Session) -> int:
+    """
+    Refresh hook to call after prices are written (e.g. after an ingestion).
+
+    Args:
+        db (Session): SQLAlchemy session used to reload the snapshot.
+
+    Returns:
+        int: Number of (product, plaza) pairs in the refreshed snapshot.
+    """
+    return latest_price_store.refresh(db)
@@ -0,0 +1,236 @@
+"""
+Email link maintenance utilities.
+
+Every password recovery and account lock email adds a row to
+`enlaces_correo`. Links are valid for an hour, but nothing removed them, so
+the table (and its indexes) grew forever. A background thread in each API
+process sweeps them:
+
+    - Links whose expiry is older than `LINK_RETENTION_HOURS` are deleted,
+      or moved to `enlaces_correo_archivo` with `LINK_SWEEP_ARCHIVE=true`.
+      Used links are swept the same way once expired; until then they keep
+      answering "Link ya fue usado" instead of "Link inválido".
+    - Rows are removed in batches of `LINK_SWEEP_BATCH_SIZE` (oldest expiry
+      first, through the `expira_en` index), each in its own short
+      transaction with a pause in between, so the sweep never holds many
+      locks or blocks resets for long.
+    - Batches are claimed with `FOR UPDATE SKIP LOCKED`, so several workers
+      (or API instances) sweeping at once never wait on each other.
+    - Sent and failed emails of the outbox (`correos_salientes`) older than
+      `EMAIL_OUTBOX_RETENTION_DAYS` are deleted the same way, so the outbox
+      stays bounded too.
+
+Environment Variables:
+    LINK_SWEEP_ENABLED: Start the sweeper with the API (default: true).
+    LINK_SWEEP_INTERVAL_SECONDS: Seconds between sweeps (default: 3600).
+    LINK_SWEEP_BATCH_SIZE: Links removed per transaction (default: 1000).
+    LINK_SWEEP_PAUSE_SECONDS: Pause between batches (default: 0.1).
+    LINK_RETENTION_HOURS: Hours an expired link is kept (default: 24).
+    LINK_SWEEP_ARCHIVE: Move swept links to `enlaces_correo_archivo`
+        instead of deleting them (default: false).
+    EMAIL_OUTBOX_RETENTION_DAYS: Days sent and failed outbox emails are
+        kept (default: 30).
+
+Usage:
+    from utils.link_maintenance import email_link_sweeper
+
+    email_link_sweeper.sweep()
+
+    # Sweep once, without the background thread
+    python -m utils.link_maintenance
+"""
+
+import argparse
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+
+from config import env_bool
+from database import engine
+
+LINK_SWEEP_ENABLED = env_bool("LINK_SWEEP_ENABLED", True)
+LINK_SWEEP_INTERVAL_SECONDS = float(os.getenv("LINK_SWEEP_INTERVAL_SECONDS", "3600"))
+LINK_SWEEP_BATCH_SIZE = int(os.getenv("LINK_SWEEP_BATCH_SIZE", "1000"))
+LINK_SWEEP_PAUSE_SECONDS = float(os.getenv("LINK_SWEEP_PAUSE_SECONDS", "0.1"))
+LINK_RETENTION_HOURS = float(os.getenv("LINK_RETENTION_HOURS", "24"))
+LINK_SWEEP_ARCHIVE = env_bool("LINK_SWEEP_ARCHIVE", False)
+EMAIL_OUTBOX_RETENTION_DAYS = float(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "30"))
+
+# One batch of sweepable links, oldest expiry first
+_BATCH = """
+    SELECT enlace_id FROM enlaces_correo
+    WHERE expira_en < :cutoff
+    ORDER BY expira_en
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+"""
+
+DELETE_BATCH_QUERY = text(f"""
+    DELETE FROM enlaces_correo
+    WHERE enlace_id IN ({_BATCH})
+""")
+
+ARCHIVE_BATCH_QUERY = text(f"""
+    WITH barridos AS (
+        DELETE FROM enlaces_correo
+        WHERE enlace_id IN ({_BATCH})
+        RETURNING enlace_id, usuario_id, token_hash, enlace_url, tipo, expira_en, usado, fecha_creacion
+    )
+    INSERT INTO enlaces_correo_archivo
+        (enlace_id, usuario_id, token_hash, enlace_url, tipo, expira_en, usado, fecha_creacion)
+    SELECT enlace_id, usuario_id, token_hash, enlace_url, tipo, expira_en, usado, fecha_creacion
+    FROM barridos
+""")
+
+# Finished outbox emails, through the partial index on fecha_creacion
+PURGE_OUTBOX_BATCH_QUERY = text("""
+    DELETE FROM correos_salientes
+    WHERE correo_id IN (
+        SELECT correo_id FROM correos_salientes
+        WHERE estado <> 'pendiente' AND fecha_creacion < :cutoff
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+
+class EmailLinkSweeper:
+    """
+    Background thread removing expired email links.
+
+    Attributes:
+        swept (int): Links removed (or archived) by this process.
+        outbox_purged (int): Finished outbox emails deleted by this process.
+        runs (int): Completed sweeps.
+        last_run_at (datetime | None): End of the last completed sweep.
+    """
+
+    def __init__(self, bind=engine, batch_size: int = LINK_SWEEP_BATCH_SIZE,
+                 interval: float = LINK_SWEEP_INTERVAL_SECONDS, pause: float = LINK_SWEEP_PAUSE_SECONDS,
+                 retention_hours: float = LINK_RETENTION_HOURS, archive: bool = LINK_SWEEP_ARCHIVE,
+                 outbox_retention_days: float = EMAIL_OUTBOX_RETENTION_DAYS):
+        self.bind = bind
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.retention = timedelta(hours=retention_hours)
+        self.archive = archive
+        self.outbox_retention = timedelta(days=outbox_retention_days)
+        self.swept = 0
+        self.outbox_purged = 0
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep_batch(self, cutoff: datetime) -> int:
+        """
+        Remove one batch of links that expired before `cutoff`.
+
+        Returns:
+            int: Number of links removed.
+        """
+        query = ARCHIVE_BATCH_QUERY if self.archive else DELETE_BATCH_QUERY
+        with self.bind.begin() as conn:
+            removed = conn.execute(query, {"cutoff": cutoff, "limit": self.batch_size}).rowcount
+        self.swept += removed
+        return removed
+
+    def purge_outbox_batch(self, cutoff: datetime) -> int:
+        """
+        Delete one batch of sent or failed outbox emails created before `cutoff`.
+
+        Returns:
+            int: Number of emails deleted.
+        """
+        with self.bind.begin() as conn:
+            removed = conn.execute(PURGE_OUTBOX_BATCH_QUERY, {"cutoff": cutoff, "limit": self.batch_size}).rowcount
+        self.outbox_purged += removed
+        return removed
+
+    def _drain(self, remove_batch, cutoff: datetime) -> int:
+        total = 0
+        while not self._stop.is_set():
+            removed = remove_batch(cutoff)
+            total += removed
+            if removed < self.batch_size:
+                break
+            self._stop.wait(self.pause)
+        return total
+
+    def sweep(self) -> int:
+        """
+        Remove batches until no sweepable link is left, then purge the old
+        finished outbox emails. Returns the links removed.
+        """
+        now = datetime.utcnow()
+        total = self._drain(self.sweep_batch, now - self.retention)
+        purged = self._drain(self.purge_outbox_batch, now - self.outbox_retention)
+        if purged:
+            print(f"Correos enviados o fallidos eliminados de la cola: {purged}")
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        return total
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"Enlaces de correo expirados eliminados: {removed}")
+            except Exception as e:
+                print(f"Error al limpiar los enlaces de correo: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-link-sweeper", daemon=True)
+            self._thread.start()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        """
+        Return the link table size estimate and this process's sweep counters.
+        """
+        with self.bind.connect() as conn:
+            # Planner estimate: exact counts are too slow on a large table
+            estimate = conn.execute(text(
+                "SELECT reltuples::BIGINT FROM pg_class WHERE oid = 'enlaces_correo'::regclass"
+            )).scalar()
+        return {
+            "running": self.is_running(),
+            "links_estimate": max(estimate or 0, 0),
+            "retention_hours": self.retention.total_seconds() / 3600,
+            "archive": self.archive,
+            "swept": self.swept,
+            "outbox_retention_days": self.outbox_retention.total_seconds() / 86400,
+            "outbox_purged": self.outbox_purged,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() + "Z" if self.last_run_at else None,
+        }
+
+
+# Shared sweeper, started and stopped by main.py
+email_link_sweeper = EmailLinkSweeper()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Remove the expired email links once.")
+    parser.parse_args()
+    print(f"Enlaces eliminados: {email_link_sweeper.sweep()}")
+
+
+if __name__ == "__main__":
+    main()
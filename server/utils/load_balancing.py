@@ -0,0 +1,291 @@
+"""
+Backend selection for the load balancer simulator.
+
+`BackendPool` keeps per-backend state (requests in flight, latency EWMA,
+health) and picks a backend with a pluggable strategy:
+
+    - random: uniform random choice (the original behaviour).
+    - round_robin: backends in turn.
+    - least_outstanding: fewest requests in flight.
+    - p2c: "power of two choices", the less busy of two random backends.
+    - ewma: lowest latency EWMA weighted by requests in flight.
+
+Unhealthy backends are skipped:
+
+    - Active checks: every `LB_HEALTH_INTERVAL` seconds each backend's
+      `LB_HEALTH_PATH` is requested; `LB_UNHEALTHY_AFTER` consecutive errors
+      or 5xx answers mark it down until the next successful check. Check
+      latency is reported apart and never enters the request latency EWMA.
+    - Passive ejection: after `LB_EJECT_AFTER_FAILURES` consecutive failures
+      (connection errors, timeouts, 502/503/504) a backend is left out for
+      `LB_EJECT_SECONDS`.
+
+If every backend is down the pool still returns one, so requests fail
+with the backend's own error instead of never being tried.
+
+The pool is used from a single event loop and needs no locking.
+
+Environment Variables:
+    LB_STRATEGY: random, round_robin, least_outstanding, p2c or ewma (default: p2c).
+    LB_HEALTH_PATH: Path of the active health check (default: /health).
+    LB_HEALTH_INTERVAL: Seconds between active checks (default: 5).
+    LB_HEALTH_TIMEOUT: Seconds before a check counts as failed (default: 1).
+    LB_UNHEALTHY_AFTER: Consecutive failed checks before a backend is
+        marked down (default: 2).
+    LB_EJECT_AFTER_FAILURES: Consecutive failures before ejection (default: 3).
+    LB_EJECT_SECONDS: Seconds an ejected backend is left out (default: 10).
+    LB_EWMA_ALPHA: Weight of the newest latency sample (default: 0.3).
+
+Usage:
+    from utils.load_balancing import BackendPool
+
+    pool = BackendPool(["http://127.0.0.1:8000", "http://127.0.0.1:8001"], "ewma")
+    backend = pool.choose()
+    pool.acquire(backend)
+    ...
+    pool.record(backend, ok=True, latency_ms=12.5)
+    pool.release(backend)
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Type
+
+import httpx
+
+LB_STRATEGY = os.getenv("LB_STRATEGY", "p2c")
+LB_HEALTH_PATH = os.getenv("LB_HEALTH_PATH", "/health")
+LB_HEALTH_INTERVAL = float(os.getenv("LB_HEALTH_INTERVAL", "5"))
+LB_HEALTH_TIMEOUT = float(os.getenv("LB_HEALTH_TIMEOUT", "1"))
+LB_UNHEALTHY_AFTER = int(os.getenv("LB_UNHEALTHY_AFTER", "2"))
+LB_EJECT_AFTER_FAILURES = int(os.getenv("LB_EJECT_AFTER_FAILURES", "3"))
+LB_EJECT_SECONDS = float(os.getenv("LB_EJECT_SECONDS", "10"))
+LB_EWMA_ALPHA = float(os.getenv("LB_EWMA_ALPHA", "0.3"))
+
+# Factor applied to the latency EWMA of a backend idle between two checks
+IDLE_EWMA_DECAY = 0.5
+
+
+class Backend:
+    """
+    A backend instance and its load and health state.
+
+    Attributes:
+        url (str): Base URL, without trailing slash.
+        outstanding (int): Requests in flight (until the response body ends).
+        ewma_ms (float): Exponentially weighted average latency to the
+            response headers of proxied requests, in milliseconds (0 until
+            the first sample).
+        probe_ms (float): Latency of the last successful health check.
+        healthy (bool): False after `LB_UNHEALTHY_AFTER` failed active
+            health checks in a row, until one succeeds.
+        ejected_until (float): `time.monotonic()` until which the backend is
+            left out after consecutive failures.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.ewma_ms = 0.0
+        self.samples = 0
+        self.probe_ms = 0.0
+        self.requests_at_last_check = 0
+        self.healthy = True
+        self.failed_checks = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def observe_latency(self, latency_ms: float, alpha: float) -> None:
+        self.ewma_ms = latency_ms if not self.samples else alpha * latency_ms + (1 - alpha) * self.ewma_ms
+        self.samples += 1
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available(now),
+            "healthy": self.healthy,
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - now), 1),
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma_ms, 2),
+            "probe_ms": round(self.probe_ms, 2),
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+        }
+
+
+# =============================== #
+#   Strategies                    #
+# =============================== #
+class Strategy:
+    """
+    Base of the strategies: `choose(candidates)` picks one backend among
+    the available candidates (never empty).
+    """
+    name = ""
+
+
+class RandomChoice(Strategy):
+    name = "random"
+
+    def choose(self, candidates: Sequence[Backend]) -> Backend:
+        return random.choice(candidates)
+
+
+class RoundRobin(Strategy):
+    name = "round_robin"
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, candidates: Sequence[Backend]) -> Backend:
+        return candidates[next(self._counter) % len(candidates)]
+
+
+class LeastOutstanding(Strategy):
+    name = "least_outstanding"
+
+    def choose(self, candidates: Sequence[Backend]) -> Backend:
+        # Random tie-break, so idle backends share the load
+        return min(candidates, key=lambda b: (b.outstanding, random.random()))
+
+
+class PowerOfTwoChoices(Strategy):
+    name = "p2c"
+
+    def choose(self, candidates: Sequence[Backend]) -> Backend:
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+
+class LatencyEWMA(Strategy):
+    name = "ewma"
+
+    def choose(self, candidates: Sequence[Backend]) -> Backend:
+        # Expected wait: average latency times the queue it would join.
+        # Backends without samples (0 ms) are tried first.
+        return min(candidates, key=lambda b: (b.ewma_ms * (b.outstanding + 1), random.random()))
+
+
+STRATEGIES: Dict[str, Type[Strategy]] = {
+    cls.name: cls for cls in (RandomChoice, RoundRobin, LeastOutstanding, PowerOfTwoChoices, LatencyEWMA)
+}
+
+
+# =============================== #
+#   Pool                          #
+# =============================== #
+class BackendPool:
+    """
+    Backends behind the load balancer, with health tracking.
+    """
+
+    def __init__(self, urls: Iterable[str], strategy: str = LB_STRATEGY,
+                 eject_after: int = LB_EJECT_AFTER_FAILURES, eject_seconds: float = LB_EJECT_SECONDS,
+                 alpha: float = LB_EWMA_ALPHA, unhealthy_after: int = LB_UNHEALTHY_AFTER):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia de balanceo desconocida: {strategy} (opciones: {', '.join(STRATEGIES)})")
+        self.backends: List[Backend] = [Backend(url) for url in urls]
+        if not self.backends:
+            raise ValueError("Se necesita al menos un backend")
+        self.strategy = STRATEGIES[strategy]()
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.alpha = alpha
+        self.unhealthy_after = unhealthy_after
+
+    def choose(self, exclude: Sequence[Backend] = ()) -> Backend:
+        """
+        Pick an available backend not in `exclude`.
+
+        Falls back to backends that are down (still excluding `exclude`
+        when possible) rather than failing without trying.
+        """
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and b.available(now)]
+        if not candidates:
+            candidates = [b for b in self.backends if b not in exclude] or self.backends
+        return self.strategy.choose(candidates)
+
+    def acquire(self, backend: Backend) -> None:
+        backend.outstanding += 1
+        backend.requests += 1
+
+    def release(self, backend: Backend) -> None:
+        backend.outstanding -= 1
+
+    def record(self, backend: Backend, ok: bool, latency_ms: Optional[float] = None) -> None:
+        """
+        Record the outcome of a request; ejects the backend after too many
+        consecutive failures.
+        """
+        if ok:
+            backend.consecutive_failures = 0
+            if latency_ms is not None:
+                backend.observe_latency(latency_ms, self.alpha)
+            return
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.eject_after:
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+            backend.consecutive_failures = 0
+            backend.ejections += 1
+            print(f"Backend {backend.url} expulsado por {self.eject_seconds:g} s tras fallos consecutivos")
+
+    # ----------------------------- #
+    #   Active health checks        #
+    # ----------------------------- #
+    async def check(self, client: httpx.AsyncClient, backend: Backend,
+                    path: str = LB_HEALTH_PATH, timeout: float = LB_HEALTH_TIMEOUT) -> bool:
+        """
+        Request the backend's health path and update its state.
+        """
+        started = time.perf_counter()
+        try:
+            response = await client.get(backend.url + path, timeout=timeout)
+            healthy = response.status_code < 500
+        except httpx.HTTPError:
+            healthy = False
+        if healthy:
+            # Not fed into the request EWMA: the health path is much faster
+            # than real requests, and would hide a slow backend
+            backend.probe_ms = (time.perf_counter() - started) * 1000
+            if backend.requests == backend.requests_at_last_check:
+                # No traffic since the last check: decay the EWMA so the
+                # ewma strategy eventually tries the backend again
+                backend.ewma_ms *= IDLE_EWMA_DECAY
+            backend.requests_at_last_check = backend.requests
+            backend.failed_checks = 0
+            backend.healthy = True
+            return True
+        backend.failed_checks += 1
+        if backend.healthy and backend.failed_checks >= self.unhealthy_after:
+            print(f"Backend {backend.url} no supera el health check")
+            backend.healthy = False
+        return False
+
+    async def run_health_checks(self, client: httpx.AsyncClient, interval: float = LB_HEALTH_INTERVAL) -> None:
+        """
+        Check every backend each `interval` seconds, until cancelled.
+        """
+        while True:
+            await asyncio.gather(*(self.check(client, backend) for backend in self.backends))
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy.name,
+            "backends": [backend.as_dict(now) for backend in self.backends],
+        }
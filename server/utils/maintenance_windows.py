@@ -0,0 +1,279 @@
+"""
+Maintenance window utilities.
+
+The frontend polls `/maintenance`, which used to read and parse the whole
+`system_maintenance` table from Supabase on every request. This module
+keeps an in-process index of the windows instead:
+
+    - Windows are parsed once per refresh and kept sorted by start time,
+      with a running maximum of end times, so "is a window active now?" is
+      a binary search over memory.
+    - The index is refreshed by a background thread every
+      `MAINTENANCE_REFRESH_SECONDS`, and immediately when a refresh is
+      requested (`POST /maintenance/refresh`). With `REDIS_URL` configured
+      the request is published on a Redis channel, so every worker and
+      instance reloads.
+    - `MaintenanceMiddleware` (enabled with `MAINTENANCE_MIDDLEWARE=true`)
+      answers 503 to API requests during an active window without any
+      database call.
+
+Environment Variables:
+    MAINTENANCE_REFRESH_SECONDS: Background refresh interval (default: 30).
+    MAINTENANCE_MIDDLEWARE: Block requests during active windows (default: false).
+    MAINTENANCE_EXEMPT_PATHS: Comma-separated path prefixes never blocked
+        (default: /maintenance,/health,/admin,/auth/login,/docs,/openapi.json).
+
+Usage:
+    from utils.maintenance_windows import maintenance_index
+
+    window = maintenance_index.active_at(datetime.now(timezone.utc))
+    if window:
+        print(window.message)
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from dateutil import parser
+
+from config import env_bool
+from utils.redis_client import KEY_PREFIX, get_redis
+
+MAINTENANCE_REFRESH_SECONDS = float(os.getenv("MAINTENANCE_REFRESH_SECONDS", "30"))
+MAINTENANCE_MIDDLEWARE = env_bool("MAINTENANCE_MIDDLEWARE", False)
+MAINTENANCE_EXEMPT_PATHS = tuple(
+    p.strip() for p in os.getenv(
+        "MAINTENANCE_EXEMPT_PATHS", "/maintenance,/health,/admin,/auth/login,/docs,/openapi.json"
+    ).split(",") if p.strip()
+)
+
+# Redis channel used to ask every worker to reload the windows
+REFRESH_CHANNEL = KEY_PREFIX + "maintenance:refresh"
+
+
+class MaintenanceWindow(NamedTuple):
+    """
+    A maintenance window (UTC-aware start and end, inclusive).
+    """
+    start: datetime
+    end: datetime
+    message: str
+
+
+@lru_cache(maxsize=1)
+def _supabase():
+    from supabase import create_client
+
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+
+
+def load_from_supabase() -> List[dict]:
+    """
+    Read all rows of the `system_maintenance` table (blocking HTTP call).
+    """
+    return _supabase().table("system_maintenance").select("start_time,end_time,message").execute().data or []
+
+
+def _parse(value) -> datetime:
+    moment = value if isinstance(value, datetime) else parser.isoparse(value)
+    # Naive timestamps are stored in UTC
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+# =============================== #
+#   Index                         #
+# =============================== #
+class MaintenanceWindowIndex:
+    """
+    Sorted, in-process index of maintenance windows.
+
+    The index is replaced atomically on refresh, so lookups never lock.
+
+    Attributes:
+        loaded_at (datetime | None): Time of the last successful refresh.
+        refreshes (int): Successful refreshes.
+        lookups (int): Lookups answered from memory.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[dict]] = load_from_supabase,
+                 interval: float = MAINTENANCE_REFRESH_SECONDS):
+        self.loader = loader
+        self.interval = interval
+        self.loaded_at: Optional[datetime] = None
+        self.refreshes = 0
+        self.lookups = 0
+        # (sorted start times, windows sorted by start, index of the window with
+        # the latest end among windows[0..i])
+        self._index: Tuple[List[datetime], List[MaintenanceWindow], List[int]] = ([], [], [])
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def load(self, rows: Iterable[dict]) -> int:
+        """
+        Replace the index with the given `system_maintenance` rows.
+
+        Returns:
+            int: Number of windows loaded.
+        """
+        windows = sorted(
+            (MaintenanceWindow(_parse(r["start_time"]), _parse(r["end_time"]), r.get("message") or "") for r in rows),
+            key=lambda w: w.start,
+        )
+        latest_end: List[int] = []
+        best = -1
+        for i, window in enumerate(windows):
+            if best < 0 or window.end > windows[best].end:
+                best = i
+            latest_end.append(best)
+        self._index = ([w.start for w in windows], windows, latest_end)
+        self.loaded_at = datetime.now(timezone.utc)
+        self.refreshes += 1
+        return len(windows)
+
+    def refresh(self) -> int:
+        """
+        Reload the windows with the loader (blocking).
+
+        Returns:
+            int: Number of windows loaded.
+        """
+        with self._refresh_lock:
+            return self.load(self.loader())
+
+    def ensure_loaded(self) -> None:
+        """
+        Load the windows if they were never loaded (blocking).
+        """
+        if self.loaded_at is None:
+            self.refresh()
+
+    def active_at(self, moment: datetime) -> Optional[MaintenanceWindow]:
+        """
+        Return a window active at `moment`, or None.
+
+        Among overlapping active windows, the one that ends last is returned.
+        """
+        self.lookups += 1
+        starts, windows, latest_end = self._index
+        # Windows started at or before `moment` are windows[:count]
+        count = bisect_right(starts, moment)
+        if not count:
+            return None
+        window = windows[latest_end[count - 1]]
+        return window if window.end >= moment else None
+
+    def windows(self) -> List[MaintenanceWindow]:
+        return list(self._index[1])
+
+    # ----------------------------- #
+    #   Background refresh          #
+    # ----------------------------- #
+    def publish_refresh(self) -> bool:
+        """
+        Ask the other workers and instances to reload (requires `REDIS_URL`).
+
+        Returns:
+            bool: False if no Redis is configured and nothing was published.
+        """
+        client = get_redis()
+        if client is None:
+            return False
+        client.publish(REFRESH_CHANNEL, json.dumps({"at": datetime.now(timezone.utc).isoformat()}))
+        return True
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous windows
+                print(f"Error al actualizar las ventanas de mantenimiento: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _listen_loop(self, client) -> None:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(REFRESH_CHANNEL)
+        try:
+            while not self._stop.is_set():
+                if pubsub.get_message(timeout=1.0):
+                    self._wake.set()
+        finally:
+            pubsub.close()
+
+    def start(self) -> None:
+        """
+        Start the refresher thread (and the Redis listener, if configured).
+        """
+        if any(t.is_alive() for t in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._refresh_loop, name="maintenance-refresh", daemon=True)]
+        client = get_redis()
+        if client is not None:
+            self._threads.append(
+                threading.Thread(target=self._listen_loop, args=(client,), name="maintenance-listen", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(5)
+        self._threads = []
+
+
+# =============================== #
+#   Middleware                    #
+# =============================== #
+class MaintenanceMiddleware:
+    """
+    ASGI middleware answering 503 during active maintenance windows.
+
+    Uses only the in-memory index. Paths starting with one of
+    `exempt_paths` (the maintenance and health endpoints, admin routes,
+    login) and CORS preflight requests are always let through.
+    """
+
+    def __init__(self, app, index: "MaintenanceWindowIndex" = None,
+                 exempt_paths: Tuple[str, ...] = MAINTENANCE_EXEMPT_PATHS):
+        self.app = app
+        self.index = index if index is not None else maintenance_index
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        now = datetime.now(timezone.utc)
+        window = self.index.active_at(now)
+        if window is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": window.message, "active": True}, ensure_ascii=False).encode("utf-8")
+        retry_after = max(1, int((window.end - now).total_seconds()) + 1)
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Shared index used by the maintenance route and middleware
+maintenance_index = MaintenanceWindowIndex()
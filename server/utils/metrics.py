@@ -0,0 +1,332 @@
+"""
+Prometheus metrics utilities.
+
+This module records request metrics in memory and renders them, together
+with the counters the other subsystems already keep, in the Prometheus
+text exposition format served at `GET /metrics`:
+
+    - `MetricsMiddleware`: per-route latency and response size histograms
+      (labelled by method, route template and status code) and the number
+      of requests in flight. Routes are labelled with their template
+      (`/prices/{product_id}`), never the raw path, so the number of
+      series stays bounded; unknown paths share the `unmatched` label.
+    - Collectors read at scrape time, with no cost on the request path:
+      database pools, response and token cache hits, the Argon2 queue,
+      SMTP deliveries of the email outbox and rate limiter decisions.
+
+Recording is a dictionary lookup, two `bisect` calls and a few integer
+additions per request. The middleware only runs on the event loop thread,
+so no lock is taken. Metrics are kept per process: with several workers,
+each one serves its own values, like the `/health/*` endpoints.
+
+Environment Variables:
+    METRICS_ENABLED: Record request metrics (default: true). Collectors
+        are still served at `/metrics` when disabled.
+    METRICS_LATENCY_BUCKETS: Comma-separated latency bucket bounds in
+        seconds (default: 0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10).
+
+Usage:
+    from utils.metrics import MetricsMiddleware, render_metrics
+
+    app.add_middleware(MetricsMiddleware)
+
+    @router.get("/metrics")
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+"""
+
+import math
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import env_bool
+from database import get_pool_stats
+from jwt_manager import verified_token_cache
+from utils.email_outbox import email_outbox_worker
+from utils.password_hashing import password_hasher
+from utils.rate_limiting import RULES, rate_limiter
+from utils.response_cache import response_cache
+
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+METRICS_LATENCY_BUCKETS = tuple(sorted(
+    float(bound) for bound in
+    os.getenv("METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(",")
+))
+# Response sizes in bytes
+SIZE_BUCKETS = (100.0, 1000.0, 10000.0, 100000.0, 1000000.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "plaze_"
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[Labels, float]
+
+
+# ========================================
+# Request Metrics
+# ========================================
+
+class _Series:
+    """
+    Latency and size histograms of one (method, route, status) combination.
+
+    Bucket counts are not cumulative; they are summed when rendered.
+    """
+
+    __slots__ = ("latency", "latency_sum", "size", "size_sum")
+
+    def __init__(self, latency_buckets: int, size_buckets: int):
+        self.latency = [0] * (latency_buckets + 1)  # last one is +Inf
+        self.latency_sum = 0.0
+        self.size = [0] * (size_buckets + 1)
+        self.size_sum = 0
+
+
+class RequestMetrics:
+    """
+    In-memory request histograms and the in-flight gauge.
+
+    Attributes:
+        in_flight (int): Requests being processed.
+    """
+
+    def __init__(self, latency_buckets: Iterable[float] = METRICS_LATENCY_BUCKETS,
+                 size_buckets: Iterable[float] = SIZE_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.in_flight = 0
+        self._series: Dict[Tuple[str, str, int], _Series] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int) -> None:
+        """
+        Record one finished request.
+        """
+        key = (method, route, status)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(len(self.latency_buckets), len(self.size_buckets))
+        series.latency[bisect_left(self.latency_buckets, seconds)] += 1
+        series.latency_sum += seconds
+        series.size[bisect_left(self.size_buckets, size)] += 1
+        series.size_sum += size
+
+    def collect(self) -> List[str]:
+        """
+        Return the request metrics in Prometheus text format, one line per item.
+        """
+        lines = _family(
+            "http_requests_in_flight", "gauge", "Requests being processed by this worker.",
+            [((), self.in_flight)],
+        )
+        # Called from the event loop like observe(), so the series cannot change meanwhile
+        series = sorted(self._series.items())
+        lines += _histogram(
+            "http_request_duration_seconds", "Request latency by route template and status code.",
+            self.latency_buckets,
+            [(key, s.latency, s.latency_sum) for key, s in series],
+        )
+        lines += _histogram(
+            "http_response_size_bytes", "Response body size by route template and status code.",
+            self.size_buckets,
+            [(key, s.size, s.size_sum) for key, s in series],
+        )
+        return lines
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and response size of
+    every HTTP request in `request_metrics`.
+    """
+
+    def __init__(self, app, metrics: Optional[RequestMetrics] = None):
+        self.app = app
+        self.metrics = metrics or request_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        # Unhandled errors are answered 500 by Starlette's outermost layer
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            elif message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            # Set by the router on the shared scope once the path is matched
+            route = scope.get("route")
+            metrics.observe(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status, elapsed, size)
+
+
+# Shared recorder, used by MetricsMiddleware and render_metrics
+request_metrics = RequestMetrics()
+
+
+# ========================================
+# Subsystem Collectors
+# ========================================
+
+def collect_db_pools() -> List[str]:
+    pools = get_pool_stats()
+    return (
+        _family(
+            "db_pool_connections", "gauge", "Connections of the database pools by state.",
+            [((("pool", name), ("state", state)), stats[state])
+             for name, stats in pools.items() for state in ("checked_out", "idle", "overflow")],
+        )
+        + _family(
+            "db_pool_checkouts_total", "counter", "Connections checked out of the pool.",
+            [((("pool", name),), stats["checkouts"]) for name, stats in pools.items()],
+        )
+        + _family(
+            "db_pool_wait_seconds_total", "counter", "Time spent waiting for a free connection.",
+            [((("pool", name),), stats["wait_seconds_total"]) for name, stats in pools.items()],
+        )
+        + _family(
+            "db_pool_timeouts_total", "counter", "Checkouts that gave up waiting for a connection.",
+            [((("pool", name),), stats["timeouts"]) for name, stats in pools.items()],
+        )
+    )
+
+
+def collect_caches() -> List[str]:
+    caches = (("responses", response_cache), ("tokens", verified_token_cache))
+    return (
+        _family(
+            "cache_hits_total", "counter", "Lookups answered from the cache.",
+            [((("cache", name),), cache.hits) for name, cache in caches],
+        )
+        + _family(
+            "cache_misses_total", "counter", "Lookups that missed the cache.",
+            [((("cache", name),), cache.misses) for name, cache in caches],
+        )
+    )
+
+
+def collect_password_hasher() -> List[str]:
+    stats = password_hasher.stats()
+    return (
+        _family(
+            "password_hash_pending", "gauge", "Argon2 calls queued or running.",
+            [((), stats["pending"])],
+        )
+        + _family(
+            "password_hash_completed_total", "counter", "Argon2 calls completed.",
+            [((), stats["completed"])],
+        )
+        + _family(
+            "password_hash_rejected_total", "counter", "Argon2 calls rejected with 503 (queue full).",
+            [((), stats["rejected"])],
+        )
+    )
+
+
+def collect_smtp() -> List[str]:
+    # Counters only: the outbox queue sizes need a database query (see /health/email)
+    worker = email_outbox_worker
+    return (
+        _family(
+            "smtp_emails_total", "counter", "Outbox delivery attempts by result.",
+            [((("result", "sent"),), worker.sent),
+             ((("result", "retried"),), worker.retried),
+             ((("result", "failed"),), worker.failed)],
+        )
+        + _family(
+            "smtp_connections_opened_total", "counter", "SMTP connections opened by the outbox worker.",
+            [((), worker.connection.connections_opened)],
+        )
+    )
+
+
+def collect_rate_limits() -> List[str]:
+    # 429 answers are sent before routing, so the request histograms label them "unmatched"
+    return _family(
+        "rate_limit_requests_total", "counter", "Requests checked by the rate limiter by rule and result.",
+        [((("rule", rule.name), ("result", result)), counts.get(rule.name, 0))
+         for rule in RULES for result, counts in (("allowed", rate_limiter.allowed), ("rejected", rate_limiter.rejected))],
+    )
+
+
+COLLECTORS = (collect_db_pools, collect_caches, collect_password_hasher, collect_smtp, collect_rate_limits)
+
+
+def render_metrics() -> str:
+    """
+    Render all metrics of this worker in Prometheus text format.
+
+    Must be called from the event loop (an `async def` route), where the
+    request metrics are recorded. A failing collector is skipped, so one broken subsystem does not hide
+    the others.
+
+    Returns:
+        str: Metrics page, ending with a newline.
+    """
+    lines = request_metrics.collect()
+    for collector in COLLECTORS:
+        try:
+            lines += collector()
+        except Exception as e:
+            print(f"Error al recolectar métricas ({collector.__name__}): {e}")
+    return "\n".join(lines) + "\n"
+
+
+# ========================================
+# Text Format
+# ========================================
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels) + "}"
+
+
+def _family(name: str, kind: str, help_text: str, samples: Iterable[Sample]) -> List[str]:
+    name = PREFIX + name
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples]
+    return lines
+
+
+def _histogram(name: str, help_text: str, bounds: Tuple[float, ...],
+               series: Iterable[Tuple[Tuple[str, str, int], List[int], float]]) -> List[str]:
+    name = PREFIX + name
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route, status), counts, total in series:
+        labels = (("method", method), ("route", route), ("status", status))
+        cumulative = 0
+        for bound, count in zip(bounds + (math.inf,), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return lines
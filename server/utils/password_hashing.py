@@ -0,0 +1,239 @@
+"""
+Password hashing utilities.
+
+Argon2 hashing and verification take tens of milliseconds of CPU each. Run
+inline (or in the request threadpool), a burst of logins holds the threads
+and the GIL that the price endpoints need. This module runs them in a
+dedicated, size-bounded process pool instead:
+
+    - At most `PASSWORD_HASH_WORKERS` hashes run at once (one per process).
+    - At most `PASSWORD_HASH_MAX_PENDING` calls may be queued or running;
+      further calls fail fast with `PasswordHasherBusy` (HTTP 503) instead
+      of piling up.
+    - Queue depth, wait and compute times are reported by `stats()`
+      (see `GET /health/passwords`).
+
+Argon2 cost parameters are configurable. Hashes created with other
+parameters still verify, and `needs_update` tells the login route to
+rehash the password with the current ones.
+
+Environment Variables:
+    ARGON2_TIME_COST: Argon2 iterations (default: 3).
+    ARGON2_MEMORY_COST: Argon2 memory in KiB (default: 65536).
+    ARGON2_PARALLELISM: Argon2 lanes (default: 4).
+    PASSWORD_HASH_WORKERS: Hashing processes per API worker (default: 2;
+        0 hashes in the request threadpool instead of a process pool).
+    PASSWORD_HASH_MAX_PENDING: Hashing calls queued or running before new
+        ones are rejected (default: 64).
+
+Usage:
+    from utils.password_hashing import password_hasher
+
+    # Async routes
+    if await password_hasher.verify(password, stored_hash):
+        ...
+    new_hash = await password_hasher.hash(password)
+
+    # Sync routes (already running in the threadpool)
+    new_hash = password_hasher.hash_blocking(password)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from passlib.hash import argon2
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class PasswordHasherBusy(RuntimeError):
+    """
+    Raised when too many hashing calls are already queued.
+    """
+
+
+# =============================== #
+#   Worker functions              #
+# =============================== #
+# Module-level so they can be pickled into the worker processes.
+def _hash(password: str, time_cost: int, memory_cost: int, parallelism: int) -> str:
+    return argon2.using(
+        rounds=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    ).hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    try:
+        return argon2.verify(password, password_hash)
+    except ValueError:
+        # Malformed or non-argon2 hash stored for the user
+        return False
+
+
+# =============================== #
+#   Hasher                        #
+# =============================== #
+class PasswordHasher:
+    """
+    Argon2 hasher backed by a bounded process pool.
+
+    The pool is created lazily on first use, so each API worker process
+    gets its own after forking.
+
+    Attributes:
+        time_cost, memory_cost, parallelism (int): Argon2 parameters used
+            for new hashes.
+        workers (int): Hashing processes (0 runs in a thread instead).
+        max_pending (int): Calls queued or running before rejecting new ones.
+    """
+
+    def __init__(
+        self,
+        time_cost: int = ARGON2_TIME_COST,
+        memory_cost: int = ARGON2_MEMORY_COST,
+        parallelism: int = ARGON2_PARALLELISM,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+    ):
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        self.parallelism = parallelism
+        self.workers = workers
+        self.max_pending = max_pending
+        self._context = argon2.using(rounds=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # Metrics
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.workers > 0:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="argon2")
+        return self._executor
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        """
+        Queue `fn(*args)` on the pool, enforcing the pending limit.
+
+        Raises:
+            PasswordHasherBusy: If `max_pending` calls are already queued.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy("Demasiadas solicitudes de autenticación en curso")
+            self.pending += 1
+            self.max_pending_seen = max(self.max_pending_seen, self.pending)
+
+        submitted = time.perf_counter()
+        try:
+            future = self._get_executor().submit(_timed, fn, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(lambda f: self._record(f, submitted))
+        return future
+
+    def _record(self, future: Future, submitted: float) -> None:
+        elapsed = time.perf_counter() - submitted
+        run = future.result()[1] if not future.cancelled() and future.exception() is None else 0.0
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self._run_seconds += run
+            self._wait_seconds += max(0.0, elapsed - run)
+
+    # ---- Public API ---------------------------------------------------- #
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password with the current Argon2 parameters.
+        """
+        future = self._submit(_hash, password, self.time_cost, self.memory_cost, self.parallelism)
+        return (await asyncio.wrap_future(future))[0]
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """
+        Return True if `password` matches `password_hash`.
+        """
+        future = self._submit(_verify, password, password_hash)
+        return (await asyncio.wrap_future(future))[0]
+
+    def hash_blocking(self, password: str) -> str:
+        """
+        Hash a password from sync code, waiting for the pool.
+        """
+        return self._submit(_hash, password, self.time_cost, self.memory_cost, self.parallelism).result()[0]
+
+    def needs_update(self, password_hash: str) -> bool:
+        """
+        Return True if the hash was created with other Argon2 parameters.
+
+        Only parses the hash, so it is cheap enough for the event loop.
+        """
+        try:
+            return self._context.needs_update(password_hash)
+        except ValueError:
+            return False
+
+    def stats(self) -> dict:
+        """
+        Return pool configuration, queue depth and timing counters.
+        """
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "max_pending_seen": self.max_pending_seen,
+                "completed": completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._wait_seconds / completed * 1000, 2) if completed else 0.0,
+                "avg_run_ms": round(self._run_seconds / completed * 1000, 2) if completed else 0.0,
+                "argon2": {
+                    "time_cost": self.time_cost,
+                    "memory_cost": self.memory_cost,
+                    "parallelism": self.parallelism,
+                },
+            }
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes (called on application shutdown).
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _timed(fn: Callable, *args):
+    """
+    Run `fn(*args)` in the worker and return (result, seconds spent).
+    """
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+# Shared hasher used by the auth, registration and recovery routes
+password_hasher = PasswordHasher()
@@ -6,9 +6,11 @@ recovery tokens. Tokens are stored in the database with expiration timestamps
 and can only be used once for security purposes.
 
 Security Features:
-    - Cryptographically random tokens (UUID4)
+    - Cryptographically random tokens (256 bits, URL-safe)
+    - Only a SHA-256 hash of the token is stored (a database leak does not
+      reveal usable links), in a fixed-width uniquely indexed column
     - Time-limited validity (default: 1 hour)
-    - Single-use enforcement via database flag
+    - Single-use enforcement via database flag, consumed atomically
     - Unique token per request
 
 Usage:
@@ -23,12 +25,21 @@ Usage:
     # Send reset_link via email to user
 """
 
-import uuid
+import hashlib
 import os
+import secrets
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from models import User, EmailLink
 
+
+def hash_token(token: str) -> bytes:
+    """
+    Return the SHA-256 digest stored in `enlaces_correo.token_hash` for a token.
+    """
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
 def create_password_recovery_link(user: User, db: Session, link_type: str = "recuperacion_password", expiration_hours: int = 1):
     """
     Create a password recovery token and persist it in the DB.
@@ -42,12 +53,12 @@ def create_password_recovery_link(user: User, db: Session, link_type: str = "rec
     Returns:
         (token: str, reset_link: str)
     """
-    token = str(uuid.uuid4())
+    token = secrets.token_urlsafe(32)
     expires_at = datetime.utcnow() + timedelta(hours=expiration_hours)
 
     email_link = EmailLink(
         usuario_id=user.usuario_id,
-        enlace_url=token,
+        token_hash=hash_token(token),
         tipo=link_type,
         expira_en=expires_at,
         usado=False
@@ -55,7 +66,6 @@ def create_password_recovery_link(user: User, db: Session, link_type: str = "rec
 
     db.add(email_link)
     db.commit()
-    db.refresh(email_link)
 
     # Get frontend URL from environment variable or use default
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -0,0 +1,483 @@
+"""
+Vectorized price history analytics.
+
+This module turns `historial_precios` rows into NumPy arrays (float64 prices,
+datetime64 dates) and computes the price history analysis used by
+`/price-history/` without looping over Python dicts:
+
+    - Overall trend and summary statistics (initial, final, mean, max, min,
+      percent change).
+    - Trend period segmentation with the ±2% step classification.
+    - Moving averages and rolling volatility.
+    - Downsampling for charts: OHLC buckets aggregated in SQL and
+      Largest-Triangle-Three-Buckets (LTTB) point selection.
+
+Results are identical to the original row-by-row implementation: the same
+float64 operations are applied element-wise, the mean is summed in the same
+order and rounding uses Python's `round`.
+
+Usage:
+    from utils.price_analytics import load_series, analyze_series
+
+    rows = (await db.execute(query, params)).all()  # (fecha, precio) rows
+    series = load_series(rows)
+    analysis = analyze_series(series)
+    analysis["estadisticas"]["precio_promedio"]
+    5351.37
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# Step variation (%) above/below which a period is an increase/decrease
+PERIOD_TREND_THRESHOLD = 2
+# Total variation (%) above/below which the overall trend is an increase/decrease
+GENERAL_TREND_THRESHOLD = 5
+
+TREND_INCREASE = 1
+TREND_DECREASE = -1
+TREND_STABLE = 0
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+TREND_NAMES = {
+    TREND_INCREASE: "Aumento",
+    TREND_DECREASE: "Disminución",
+    TREND_STABLE: "Estabilidad",
+}
+
+
+class PriceSeries(NamedTuple):
+    """
+    Chronological price series.
+
+    Attributes:
+        fechas (np.ndarray): datetime64 dates.
+        labels (List[str]): ISO formatted dates, as returned by the API.
+        precios (np.ndarray): float64 prices per kilogram.
+    """
+    fechas: np.ndarray
+    labels: List[str]
+    precios: np.ndarray
+
+
+# =============================== #
+#   Loading                       #
+# =============================== #
+def _date_labels(values: Sequence, fechas: np.ndarray) -> List[str]:
+    """
+    Format dates the way `value.isoformat()` does, vectorized when possible.
+    """
+    first = values[0]
+    if isinstance(first, datetime):
+        if first.tzinfo is None and not (fechas.astype("int64") % 1_000_000).any():
+            return np.datetime_as_string(fechas, unit="s").tolist()
+    elif isinstance(first, date):
+        return np.datetime_as_string(fechas, unit="D").tolist()
+    return [v.isoformat() if hasattr(v, "isoformat") else str(v) for v in values]
+
+
+def _to_datetime64(values: Sequence) -> np.ndarray:
+    """
+    Convert dates to a datetime64 array through their ordinals, which is
+    much faster than letting NumPy convert each object.
+    """
+    first = values[0]
+    count = len(values)
+    if isinstance(first, datetime):
+        micros = np.fromiter(
+            ((v.toordinal() - _EPOCH_ORDINAL) * 86_400_000_000
+             + ((v.hour * 60 + v.minute) * 60 + v.second) * 1_000_000 + v.microsecond
+             for v in values),
+            dtype=np.int64, count=count,
+        )
+        return micros.astype("datetime64[us]")
+    if isinstance(first, date):
+        days = np.fromiter((v.toordinal() for v in values), dtype=np.int64, count=count)
+        return (days - _EPOCH_ORDINAL).astype("datetime64[D]")
+    return np.array(values, dtype="datetime64[us]")
+
+
+def load_series(rows: Sequence) -> PriceSeries:
+    """
+    Load (fecha, precio) rows into a `PriceSeries`.
+
+    Args:
+        rows (Sequence): Query rows ordered by date; column 0 is the date
+            (`date`, `datetime` or ISO string) and column 1 the price
+            (`Decimal`, `float` or `int`).
+
+    Returns:
+        PriceSeries: Arrays of the series. `rows` must not be empty.
+    """
+    values = [row[0] for row in rows]
+    precios = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    fechas = _to_datetime64(values)
+    return PriceSeries(fechas=fechas, labels=_date_labels(values, fechas), precios=precios)
+
+
+def series_from_history(history: List[Dict]) -> PriceSeries:
+    """
+    Build a `PriceSeries` from `{"fecha", "precio_por_kg"}` dicts.
+    """
+    labels = [h["fecha"] for h in history]
+    precios = np.fromiter((h["precio_por_kg"] for h in history), dtype=np.float64, count=len(history))
+    return PriceSeries(fechas=np.array(labels, dtype="datetime64[us]"), labels=labels, precios=precios)
+
+
+def history_records(series: PriceSeries, indices: Optional[np.ndarray] = None) -> List[Dict]:
+    """
+    Return the series as the `historial` list of the API response.
+
+    Args:
+        series (PriceSeries): Series to serialize.
+        indices (np.ndarray, optional): Positions to keep (see `lttb_indices`).
+    """
+    if indices is None:
+        return [
+            {"fecha": fecha, "precio_por_kg": precio}
+            for fecha, precio in zip(series.labels, series.precios.tolist())
+        ]
+    labels = series.labels
+    return [
+        {"fecha": labels[k], "precio_por_kg": precio}
+        for k, precio in zip(indices.tolist(), series.precios[indices].tolist())
+    ]
+
+
+# =============================== #
+#   Analysis                      #
+# =============================== #
+def step_variations(precios: np.ndarray) -> np.ndarray:
+    """
+    Return the percentage variation between consecutive prices.
+
+    Raises:
+        ZeroDivisionError: If a price other than the last one is zero,
+            like the original row-by-row computation.
+    """
+    previous = precios[:-1]
+    if (previous == 0).any():
+        raise ZeroDivisionError("float division by zero")
+    return ((precios[1:] - previous) / previous) * 100
+
+
+def classify_steps(variations: np.ndarray) -> np.ndarray:
+    """
+    Classify step variations as TREND_INCREASE, TREND_DECREASE or TREND_STABLE.
+    """
+    codes = np.zeros(len(variations), dtype=np.int8)
+    codes[variations > PERIOD_TREND_THRESHOLD] = TREND_INCREASE
+    codes[variations < -PERIOD_TREND_THRESHOLD] = TREND_DECREASE
+    return codes
+
+
+def segment_periods(codes: np.ndarray):
+    """
+    Split classified steps into trend periods.
+
+    A period is a run of steps with the same trend. The step that breaks a
+    run belongs to no period: the next period starts right after it, so a
+    breaking step that forms a run of length one on its own is consumed
+    without producing a period.
+
+    Args:
+        codes (np.ndarray): Trend code of each step (see `classify_steps`);
+            step `k` goes from price `k` to price `k + 1`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Start price index, end
+            price index and trend code of every period.
+    """
+    empty = np.empty(0, dtype=np.intp)
+    if len(codes) == 0:
+        return empty, empty, codes[:0]
+
+    # Runs of equal codes (inclusive step indices)
+    change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    run_start = np.concatenate(([0], change))
+    run_end = np.concatenate((change - 1, [len(codes) - 1]))
+    single = run_start == run_end
+
+    # Runs of length one come in blocks; inside a block, runs alternately
+    # produce a period and are consumed as breaking steps. The first run of
+    # a block after a longer run is always consumed; a block at the very
+    # start begins with a period.
+    index = np.arange(len(run_start))
+    block_first = single & np.concatenate(([True], ~single[:-1]))
+    block_start = np.maximum.accumulate(np.where(block_first, index, 0))
+    offset = index - block_start
+    has_period = ~single | np.where(block_start == 0, offset % 2 == 0, offset % 2 == 1)
+
+    # The run right after a period starts one step late
+    skipped_first = np.concatenate(([False], has_period[:-1]))
+    starts = run_start + skipped_first
+    return starts[has_period], run_end[has_period] + 1, codes[run_start[has_period]]
+
+
+def detect_periods(series: PriceSeries) -> List[Dict]:
+    """
+    Detect trend periods of a series.
+
+    Returns:
+        List[Dict]: Periods with fecha_inicio, fecha_fin, precio_inicio,
+            precio_fin, tendencia and variacion_porcentual.
+    """
+    if len(series.precios) < 2:
+        return []
+
+    precios = series.precios
+    starts, ends, trends = segment_periods(classify_steps(step_variations(precios)))
+    start_prices = precios[starts]
+    end_prices = precios[ends]
+    variations = ((end_prices - start_prices) / start_prices) * 100
+
+    labels = series.labels
+    return [
+        {
+            "fecha_inicio": labels[start],
+            "fecha_fin": labels[end],
+            "precio_inicio": start_price,
+            "precio_fin": end_price,
+            "tendencia": TREND_NAMES[trend],
+            "variacion_porcentual": round(variation, 2),
+        }
+        for start, end, trend, start_price, end_price, variation in zip(
+            starts.tolist(), ends.tolist(), trends.tolist(),
+            start_prices.tolist(), end_prices.tolist(), variations.tolist(),
+        )
+    ]
+
+
+def moving_average(precios: np.ndarray, window: int) -> np.ndarray:
+    """
+    Return the simple moving average of the last `window` prices.
+
+    The result has `len(precios) - window + 1` values; value `k` averages
+    prices `k` to `k + window - 1`.
+    """
+    if window < 1 or len(precios) < window:
+        return np.empty(0, dtype=np.float64)
+    return np.lib.stride_tricks.sliding_window_view(precios, window).mean(axis=1)
+
+
+def rolling_volatility(precios: np.ndarray, window: int) -> np.ndarray:
+    """
+    Return the rolling volatility: sample standard deviation of the step
+    variations (%) over the last `window` steps.
+
+    The result has `len(precios) - window` values; value `k` covers the steps
+    ending at price `k + window`.
+    """
+    if window < 2 or len(precios) <= window:
+        return np.empty(0, dtype=np.float64)
+    variations = step_variations(precios)
+    return np.lib.stride_tricks.sliding_window_view(variations, window).std(axis=1, ddof=1)
+
+
+def indicators(series: PriceSeries, window: int) -> Dict:
+    """
+    Return moving average and volatility points for the API response.
+
+    Each point is `{"fecha", "valor"}` dated at the last price of its window.
+    """
+    labels = series.labels
+    average = moving_average(series.precios, window)
+    volatility = rolling_volatility(series.precios, window)
+    return {
+        "ventana": window,
+        "media_movil": [
+            {"fecha": labels[k + window - 1], "valor": round(value, 2)}
+            for k, value in enumerate(average.tolist())
+        ],
+        "volatilidad": [
+            {"fecha": labels[k + window], "valor": round(value, 2)}
+            for k, value in enumerate(volatility.tolist())
+        ],
+    }
+
+
+def _analysis(initial_price: float, final_price: float, avg_price: float, max_price: float,
+              min_price: float, count: int, series: PriceSeries, window: Optional[int]) -> Dict:
+    percent_change = ((final_price - initial_price) / initial_price) * 100
+
+    if percent_change > GENERAL_TREND_THRESHOLD:
+        trend_general = TREND_NAMES[TREND_INCREASE]
+    elif percent_change < -GENERAL_TREND_THRESHOLD:
+        trend_general = TREND_NAMES[TREND_DECREASE]
+    else:
+        trend_general = TREND_NAMES[TREND_STABLE]
+
+    analysis = {
+        "tendencia_general": trend_general,
+        "estadisticas": {
+            "precio_inicial": initial_price,
+            "precio_final": final_price,
+            "precio_promedio": round(avg_price, 2),
+            "precio_maximo": max_price,
+            "precio_minimo": min_price,
+            "variacion_porcentual": round(percent_change, 2),
+            "total_registros": count,
+        },
+        "periodos": detect_periods(series),
+    }
+    if window is not None:
+        analysis["indicadores"] = indicators(series, window)
+    return analysis
+
+
+def analyze_series(series: PriceSeries, window: Optional[int] = None) -> Dict:
+    """
+    Analyze a non-empty price series.
+
+    Args:
+        series (PriceSeries): Chronological prices.
+        window (int, optional): If given, also compute moving average and
+            volatility over this many points (`indicadores` key).
+
+    Returns:
+        Dict: tendencia_general, estadisticas and periodos (and indicadores).
+    """
+    precios = series.precios
+    # Python's sum keeps the exact rounding of the previous implementation
+    # (NumPy sums pairwise)
+    avg_price = sum(precios.tolist()) / len(precios)
+    return _analysis(
+        float(precios[0]), float(precios[-1]), avg_price,
+        float(precios.max()), float(precios.min()), len(precios), series, window,
+    )
+
+
+# =============================== #
+#   Downsampling                  #
+# =============================== #
+class PriceBuckets(NamedTuple):
+    """
+    OHLC price buckets (one per day, week or month).
+
+    Attributes:
+        series (PriceSeries): Bucket start dates and closing prices.
+        apertura (np.ndarray): First price of each bucket.
+        maximo (np.ndarray): Highest price of each bucket.
+        minimo (np.ndarray): Lowest price of each bucket.
+        registros (np.ndarray): Number of raw records in each bucket.
+        total (float): Sum of every raw price, for the overall mean.
+    """
+    series: PriceSeries
+    apertura: np.ndarray
+    maximo: np.ndarray
+    minimo: np.ndarray
+    registros: np.ndarray
+    total: float
+
+
+def load_buckets(rows: Sequence) -> PriceBuckets:
+    """
+    Load OHLC bucket rows into `PriceBuckets`.
+
+    Args:
+        rows (Sequence): Non-empty rows ordered by bucket with columns
+            (fecha, apertura, maximo, minimo, cierre, registros, suma).
+    """
+    def column(index: int, dtype=np.float64) -> np.ndarray:
+        return np.fromiter((row[index] for row in rows), dtype=dtype, count=len(rows))
+
+    values = [row[0] for row in rows]
+    fechas = _to_datetime64(values)
+    series = PriceSeries(fechas=fechas, labels=_date_labels(values, fechas), precios=column(4))
+    return PriceBuckets(
+        series=series,
+        apertura=column(1),
+        maximo=column(2),
+        minimo=column(3),
+        registros=column(5, np.int64),
+        total=float(sum(row[6] for row in rows)),
+    )
+
+
+def analyze_buckets(buckets: PriceBuckets, window: Optional[int] = None) -> Dict:
+    """
+    Analyze OHLC buckets.
+
+    Statistics cover every raw record (first open, last close, highest high,
+    lowest low, mean of all records); periods and indicators are computed on
+    the closing prices of the buckets.
+    """
+    count = int(buckets.registros.sum())
+    return _analysis(
+        float(buckets.apertura[0]), float(buckets.series.precios[-1]), buckets.total / count,
+        float(buckets.maximo.max()), float(buckets.minimo.min()), count, buckets.series, window,
+    )
+
+
+def bucket_records(buckets: PriceBuckets, indices: Optional[np.ndarray] = None) -> List[Dict]:
+    """
+    Return buckets as `historial` entries; `precio_por_kg` is the close.
+
+    Args:
+        buckets (PriceBuckets): Buckets to serialize.
+        indices (np.ndarray, optional): Positions to keep (see `lttb_indices`).
+    """
+    labels = buckets.series.labels
+    positions = range(len(labels)) if indices is None else indices.tolist()
+    closes = buckets.series.precios.tolist()
+    opens, highs, lows = buckets.apertura.tolist(), buckets.maximo.tolist(), buckets.minimo.tolist()
+    counts = buckets.registros.tolist()
+    return [
+        {
+            "fecha": labels[k],
+            "precio_por_kg": closes[k],
+            "apertura": opens[k],
+            "maximo": highs[k],
+            "minimo": lows[k],
+            "cierre": closes[k],
+            "registros": counts[k],
+        }
+        for k in positions
+    ]
+
+
+def lttb_indices(fechas: np.ndarray, precios: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select at most `max_points` points with Largest-Triangle-Three-Buckets.
+
+    LTTB keeps the first and last points and, from each of `max_points - 2`
+    equal buckets in between, the point forming the largest triangle with
+    the previously selected point and the mean of the next bucket. Peaks
+    and drops stay visible in charts, unlike plain decimation.
+
+    Args:
+        fechas (np.ndarray): datetime64 x values, ascending.
+        precios (np.ndarray): y values.
+        max_points (int): Number of points to keep (at least 3).
+
+    Returns:
+        np.ndarray: Ascending positions of the selected points.
+    """
+    n = len(precios)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = fechas.astype("int64").astype(np.float64)
+    y = precios
+    # Bucket k (0-based) spans [edges[k], edges[k + 1]); the first and last
+    # points are buckets of their own
+    edges = (np.arange(max_points - 1) * ((n - 2) / (max_points - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Mean of every bucket, plus the last point as the bucket after the last one
+    sizes = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / sizes, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / sizes, y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(max_points - 2):
+        start, end = edges[k], edges[k + 1]
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - mean_x[k + 1]) * (y[start:end] - ay) - (ax - x[start:end]) * (mean_y[k + 1] - ay))
+        a = start + int(areas.argmax())
+        selected[k + 1] = a
+    return selected
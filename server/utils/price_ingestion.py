@@ -0,0 +1,480 @@
+"""
+Bulk price ingestion utilities (F-09).
+
+This module loads price files (CSV or XLSX) into `precios` or
+`historial_precios` with flat memory use, whatever the file size:
+
+    1. Rows are read lazily with generators (csv reader / openpyxl
+       read-only mode).
+    2. Rows are validated in chunks; invalid rows are skipped and reported
+       with their line number.
+    3. Each chunk of valid rows is streamed into a temporary staging table
+       with Postgres `COPY`.
+    4. The staging table is merged into the target table in the same
+       transaction with upsert semantics: existing (key) rows get the new
+       price, new rows are inserted. The last row of the file wins when a
+       key appears more than once.
+
+Progress is reported as a stream of events (dicts), consumed by the admin
+upload endpoint (NDJSON) and by the command line interface.
+
+File Columns (header row required, any order, extra columns ignored):
+    precios: producto_id, plaza_id, precio_por_kg, fecha
+    historial_precios: producto_id, precio_historico, fecha_precio
+
+    Dates use ISO format (YYYY-MM-DD); prices use a dot as decimal separator.
+    CSV files may be separated by commas or semicolons.
+
+Environment Variables:
+    INGESTION_CHUNK_SIZE: Rows validated and copied per chunk (default: 10000).
+    INGESTION_MAX_REPORTED_ERRORS: Row errors included in the report (default: 100).
+
+Usage:
+    # Command line, from the server folder
+    python -m utils.price_ingestion precios.csv --tabla precios
+
+    # Python
+    from utils.price_ingestion import open_rows, PriceIngestion
+
+    header, rows = open_rows("precios.xlsx")
+    for event in PriceIngestion("precios").run(header, rows):
+        print(event)
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import time
+import zipfile
+from datetime import date, datetime, time as time_of_day
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+INGESTION_CHUNK_SIZE = int(os.getenv("INGESTION_CHUNK_SIZE", "10000"))
+INGESTION_MAX_REPORTED_ERRORS = int(os.getenv("INGESTION_MAX_REPORTED_ERRORS", "100"))
+
+# Largest value accepted by the DECIMAL(10, 2) price columns
+MAX_PRICE = 99999999.99
+
+
+class IngestionError(ValueError):
+    """
+    Raised when a file cannot be ingested at all (format, missing columns).
+    """
+
+
+class IngestionTarget(NamedTuple):
+    """
+    Table that can be loaded and how its rows are matched.
+
+    Attributes:
+        table (str): Target table.
+        columns (Tuple[str, ...]): Columns read from the file, in staging order.
+        key (Tuple[str, ...]): Columns identifying a row for the upsert.
+        value (str): Price column updated on existing rows.
+    """
+    table: str
+    columns: Tuple[str, ...]
+    key: Tuple[str, ...]
+    value: str
+
+
+TARGETS: Dict[str, IngestionTarget] = {
+    "precios": IngestionTarget(
+        table="precios",
+        columns=("producto_id", "plaza_id", "precio_por_kg", "fecha"),
+        key=("producto_id", "plaza_id", "fecha"),
+        value="precio_por_kg",
+    ),
+    "historial_precios": IngestionTarget(
+        table="historial_precios",
+        columns=("producto_id", "precio_historico", "fecha_precio"),
+        key=("producto_id", "fecha_precio"),
+        value="precio_historico",
+    ),
+}
+
+# Staging column types
+_COLUMN_TYPES = {
+    "producto_id": "INTEGER",
+    "plaza_id": "INTEGER",
+    "precio_por_kg": "NUMERIC(10, 2)",
+    "precio_historico": "NUMERIC(10, 2)",
+    "fecha": "DATE",
+    "fecha_precio": "DATE",
+}
+
+
+# =============================== #
+#   Readers                       #
+# =============================== #
+def _iter_csv(path: str) -> Iterator[Sequence]:
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        try:
+            first_line = handle.readline()
+            delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+            handle.seek(0)
+            yield from csv.reader(handle, delimiter=delimiter)
+        except UnicodeDecodeError as e:
+            raise IngestionError("El archivo CSV no está codificado en UTF-8") from e
+        except csv.Error as e:
+            raise IngestionError(f"El archivo CSV no es válido: {e}") from e
+
+
+def _cell_text(value) -> str:
+    """
+    Convert an XLSX cell value to the text a CSV file would contain.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time_of_day.min else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _iter_xlsx(path: str) -> Iterator[Sequence]:
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError as e:
+        raise IngestionError("Para cargar archivos XLSX se requiere el paquete 'openpyxl'") from e
+
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    # KeyError: a zip file without the parts of a workbook
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise IngestionError("El archivo XLSX no es válido o está dañado") from e
+    try:
+        for values in workbook.active.iter_rows(values_only=True):
+            yield [_cell_text(value) for value in values]
+    finally:
+        workbook.close()
+
+
+def open_rows(path: str, filename: Optional[str] = None) -> Tuple[List[str], Iterator[Tuple[int, Sequence]]]:
+    """
+    Open a CSV or XLSX file and read its header.
+
+    Args:
+        path (str): Path of the file on disk.
+        filename (str, optional): Original name, used to detect the format
+            (defaults to `path`).
+
+    Returns:
+        Tuple[List[str], Iterator[Tuple[int, Sequence]]]: Normalized header
+            and a lazy iterator of (line number, values) for the data rows.
+            Values are always strings, whatever the format.
+
+    Raises:
+        IngestionError: If the format is not supported, the file is empty or
+            it cannot be parsed (damaged XLSX, CSV not in UTF-8). Rows after
+            the header are read lazily, so the same error can also be raised
+            while iterating them.
+    """
+    extension = os.path.splitext(filename or path)[1].lower()
+    if extension == ".csv":
+        raw_rows = _iter_csv(path)
+    elif extension == ".xlsx":
+        raw_rows = _iter_xlsx(path)
+    else:
+        raise IngestionError("Formato no soportado: use un archivo .csv o .xlsx")
+
+    header = next(raw_rows, None)
+    if header is None:
+        raise IngestionError("El archivo está vacío")
+    header = [str(name).strip().lower() if name is not None else "" for name in header]
+
+    def numbered() -> Iterator[Tuple[int, Sequence]]:
+        # Line 1 is the header
+        for line, values in enumerate(raw_rows, start=2):
+            yield line, values
+
+    return header, numbered()
+
+
+# =============================== #
+#   Validation                    #
+# =============================== #
+# Plain decimal number with a dot as separator and at most 8 integer digits
+_PRICE_PATTERN = re.compile(r" *\d{1,8}(?:\.\d*)? *")
+
+
+def _parse_id(value: str, known: Set[int], label: str) -> str:
+    try:
+        parsed = int(value)
+    except ValueError:
+        raise ValueError(f"{label} inválido: {value!r}")
+    if parsed not in known:
+        raise ValueError(f"{label} no existe: {parsed}")
+    return str(parsed)
+
+
+def _parse_price(value: str) -> str:
+    if _PRICE_PATTERN.fullmatch(value) is None:
+        raise ValueError(f"precio inválido: {value!r}")
+    if not 0 < float(value) <= MAX_PRICE:
+        raise ValueError(f"precio fuera de rango: {value!r}")
+    return value.strip()
+
+
+def _parse_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"fecha inválida (use AAAA-MM-DD): {value!r}")
+
+
+class RowValidator:
+    """
+    Validates file rows for a target and turns them into COPY lines.
+
+    Args:
+        target (IngestionTarget): Table being loaded.
+        header (List[str]): Normalized header of the file.
+        products (Set[int]): Existing producto_ids.
+        markets (Set[int]): Existing plaza_ids.
+
+    Note:
+        The header must contain every column of the target
+        (see `PriceIngestion.check_header`).
+    """
+
+    def __init__(self, target: IngestionTarget, header: List[str], products: Set[int], markets: Set[int]):
+        parsers = {
+            "producto_id": lambda v: _parse_id(v, products, "producto_id"),
+            "plaza_id": lambda v: _parse_id(v, markets, "plaza_id"),
+            "precio_por_kg": _parse_price,
+            "precio_historico": _parse_price,
+            "fecha": _parse_date,
+            "fecha_precio": _parse_date,
+        }
+        self._fields = [(header.index(column), parsers[column]) for column in target.columns]
+        self._width = max(position for position, _ in self._fields) + 1
+
+    def copy_line(self, line: int, values: Sequence[str]) -> str:
+        """
+        Return the tab-separated COPY line for a row.
+
+        Every field is re-emitted from its parsed value (or checked against a
+        strict pattern), so tabs or newlines inside a field cannot break COPY.
+
+        Raises:
+            ValueError: With a readable message if the row is invalid.
+        """
+        if len(values) < self._width:
+            raise ValueError("faltan valores en la fila")
+        fields = [str(line)]
+        for position, parse in self._fields:
+            fields.append(parse(values[position]))
+        return "\t".join(fields) + "\n"
+
+
+# =============================== #
+#   Pipeline                      #
+# =============================== #
+class IngestionReport:
+    """
+    Counters and (capped) row errors of an ingestion run.
+    """
+
+    def __init__(self, max_reported_errors: int = INGESTION_MAX_REPORTED_ERRORS):
+        self.max_reported_errors = max_reported_errors
+        self.rows_read = 0
+        self.rows_valid = 0
+        self.rows_invalid = 0
+        self.errors: List[Dict] = []
+
+    def add_error(self, line: int, message: str) -> None:
+        self.rows_invalid += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append({"linea": line, "error": message})
+
+    def progress(self) -> Dict:
+        return {
+            "filas_leidas": self.rows_read,
+            "filas_validas": self.rows_valid,
+            "filas_con_error": self.rows_invalid,
+        }
+
+
+class PriceIngestion:
+    """
+    Loads validated rows into a table through a COPY-fed staging table.
+
+    Args:
+        target (str): "precios" or "historial_precios".
+        chunk_size (int, optional): Rows validated and copied per chunk.
+        bind (Engine, optional): Engine to use; defaults to `database.engine`.
+
+    Raises:
+        IngestionError: If the target is unknown.
+    """
+
+    def __init__(self, target: str = "precios", chunk_size: int = INGESTION_CHUNK_SIZE, bind=None):
+        if target not in TARGETS:
+            raise IngestionError(f"Tabla no soportada: {target}. Use: {', '.join(TARGETS)}")
+        self.target = TARGETS[target]
+        self.chunk_size = chunk_size
+        if bind is None:
+            from database import engine as bind
+        self.bind = bind
+
+    def check_header(self, header: List[str]) -> None:
+        """
+        Raise IngestionError if the header lacks a column of the target.
+        """
+        missing = [column for column in self.target.columns if column not in header]
+        if missing:
+            raise IngestionError(f"Faltan columnas en el archivo: {', '.join(missing)}")
+
+    def _merge_statements(self) -> List[str]:
+        target = self.target
+        key = ", ".join(target.key)
+        columns = ", ".join(target.columns)
+        matches = " AND ".join(f"t.{column} = s.{column}" for column in target.key)
+        return [
+            # Keep the last occurrence of every key in the file
+            f"CREATE TEMP TABLE ingesta_origen ON COMMIT DROP AS "
+            f"SELECT DISTINCT ON ({key}) {columns} FROM ingesta_staging ORDER BY {key}, linea DESC",
+            "ANALYZE ingesta_origen",
+            # Writers of the same table wait; readers are not blocked
+            f"LOCK TABLE {target.table} IN SHARE ROW EXCLUSIVE MODE",
+            f"UPDATE {target.table} AS t SET {target.value} = s.{target.value} "
+            f"FROM ingesta_origen AS s WHERE {matches} "
+            f"AND t.{target.value} IS DISTINCT FROM s.{target.value}",
+            f"INSERT INTO {target.table} ({columns}) "
+            f"SELECT {columns} FROM ingesta_origen AS s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {target.table} AS t WHERE {matches})",
+        ]
+
+    def run(self, header: List[str], rows: Iterator[Tuple[int, Sequence]],
+            report: Optional[IngestionReport] = None) -> Iterator[Dict]:
+        """
+        Ingest rows, yielding progress events.
+
+        Everything is written in a single transaction: if the merge fails,
+        nothing is loaded.
+
+        Args:
+            header (List[str]): Normalized header (see `open_rows`).
+            rows (Iterator[Tuple[int, Sequence]]): (line number, values) pairs.
+            report (IngestionReport, optional): Report to fill.
+
+        Yields:
+            Dict: `{"etapa": "validacion", ...counters}` after each chunk,
+                `{"etapa": "fusion", ...}` before merging and a final
+                `{"etapa": "completado", ...}` summary with inserted, updated
+                and unchanged rows and the reported row errors.
+
+        Raises:
+            IngestionError: If the header lacks required columns.
+        """
+        self.check_header(header)
+        report = report or IngestionReport()
+        target = self.target
+        started = time.perf_counter()
+
+        connection = self.bind.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT producto_id FROM productos")
+            products = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT plaza_id FROM plazas_mercado")
+            markets = {row[0] for row in cursor.fetchall()}
+            validator = RowValidator(target, header, products, markets)
+
+            staging_columns = ", ".join(
+                ["linea BIGINT"] + [f"{column} {_COLUMN_TYPES[column]}" for column in target.columns]
+            )
+            cursor.execute(f"CREATE TEMP TABLE ingesta_staging ({staging_columns}) ON COMMIT DROP")
+            copy_sql = f"COPY ingesta_staging (linea, {', '.join(target.columns)}) FROM STDIN"
+
+            buffer = io.StringIO()
+            pending = 0
+            for line, values in rows:
+                report.rows_read += 1
+                try:
+                    buffer.write(validator.copy_line(line, values))
+                    report.rows_valid += 1
+                    pending += 1
+                except ValueError as e:
+                    report.add_error(line, str(e))
+
+                if report.rows_read % self.chunk_size == 0:
+                    if pending:
+                        buffer.seek(0)
+                        cursor.copy_expert(copy_sql, buffer)
+                        buffer.seek(0)
+                        buffer.truncate()
+                        pending = 0
+                    yield {"etapa": "validacion", **report.progress()}
+
+            if pending:
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+            buffer.close()
+            yield {"etapa": "validacion", **report.progress()}
+
+            yield {"etapa": "fusion", "tabla": target.table}
+            inserted = updated = 0
+            for statement in self._merge_statements():
+                cursor.execute(statement)
+                if statement.startswith("UPDATE"):
+                    updated = cursor.rowcount
+                elif statement.startswith("INSERT"):
+                    inserted = cursor.rowcount
+            cursor.execute("SELECT COUNT(*) FROM ingesta_origen")
+            unique_rows = cursor.fetchone()[0]
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+        yield {
+            "etapa": "completado",
+            "tabla": target.table,
+            **report.progress(),
+            "insertadas": inserted,
+            "actualizadas": updated,
+            "sin_cambios": unique_rows - inserted - updated,
+            "errores": report.errors,
+            "segundos": round(time.perf_counter() - started, 3),
+        }
+
+
+# =============================== #
+#   Command line                  #
+# =============================== #
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point: `python -m utils.price_ingestion FILE`.
+
+    Prints one JSON progress event per line; returns a non-zero exit code if
+    the file could not be ingested.
+    """
+    parser = argparse.ArgumentParser(description="Carga masiva de precios desde CSV o XLSX")
+    parser.add_argument("archivo", help="Ruta del archivo .csv o .xlsx")
+    parser.add_argument("--tabla", choices=sorted(TARGETS), default="precios")
+    parser.add_argument("--chunk-size", type=int, default=INGESTION_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        header, rows = open_rows(args.archivo)
+        for event in PriceIngestion(args.tabla, chunk_size=args.chunk_size).run(header, rows):
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+    except IngestionError as e:
+        print(json.dumps({"etapa": "error", "mensaje": str(e)}, ensure_ascii=False))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
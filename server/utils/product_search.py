@@ -0,0 +1,277 @@
+"""
+Product name search utilities.
+
+This module keeps an in-memory trigram index over the `productos` catalogue
+to answer product suggestions without querying Postgres on every miss.
+Matching is case and accent insensitive ("platano" finds "Plátano") and
+results are ranked, similar to PostgreSQL's `pg_trgm` extension:
+
+    1. Names starting with the search term.
+    2. Names containing the search term.
+    3. Remaining names by trigram similarity (shared / total trigrams).
+
+The index is built when the application starts and rebuilt when it becomes
+stale or is explicitly invalidated after the catalogue changes. It also acts
+as the name -> producto_id resolver cache used by `/price-history/`.
+
+Environment Variables:
+    PRODUCT_SEARCH_MAX_AGE_SECONDS: Seconds before the index is rebuilt on
+        the next lookup (default: 600).
+
+Usage:
+    from utils.product_search import product_search_index
+
+    await product_search_index.ensure_fresh(db)  # db: AsyncSession
+    product_search_index.suggest("platano", limit=5)
+    ['Plátano']
+    await product_search_index.resolve(db, "papa-criolla")
+    (4,)
+"""
+
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+PRODUCT_SEARCH_MAX_AGE_SECONDS = float(os.getenv("PRODUCT_SEARCH_MAX_AGE_SECONDS", "600"))
+
+# Minimum trigram similarity for names that do not contain the search term
+# (same default as pg_trgm's similarity_threshold)
+SIMILARITY_THRESHOLD = 0.3
+
+CATALOGUE_QUERY = text("""
+    SELECT producto_id, nombre
+    FROM productos
+""")
+
+# Fallback for names missing from the index; sargable thanks to the
+# ix_productos_nombre_normalizado expression index (see schema.py)
+RESOLVE_QUERY = text("""
+    SELECT producto_id
+    FROM productos
+    WHERE LOWER(REPLACE(REPLACE(nombre, ' ', ''), '-', '')) = :key
+""")
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(value: str) -> str:
+    """
+    Normalize a product name for searching.
+
+    Removes accents, lowercases and collapses any non-alphanumeric run into
+    a single space.
+
+    Example:
+        >>> normalize_text("  Plátano-Hartón ")
+        'platano harton'
+    """
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", stripped.casefold()).strip()
+
+
+def history_key(name: str) -> str:
+    """
+    Return the exact-match key used to resolve product names in price history.
+
+    Spaces and hyphens are removed and the result is lowercased, the same
+    expression indexed by `ix_productos_nombre_normalizado`.
+
+    Example:
+        >>> history_key("Papa-Criolla ")
+        'papacriolla'
+    """
+    return name.replace(" ", "").replace("-", "").lower()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """
+    Return the set of trigrams of an already normalized string.
+
+    Each word is padded with two leading spaces and one trailing space,
+    following pg_trgm, so short words and word starts weigh more.
+
+    Example:
+        >>> sorted(trigrams("papa"))
+        ['  p', ' pa', 'apa', 'pa ', 'pap']
+    """
+    grams: Set[str] = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ProductSearchIndex:
+    """
+    In-memory trigram index over product names.
+
+    The index is immutable once built; a rebuild creates a new one and swaps
+    it in atomically, so concurrent lookups never see a partial index.
+
+    Attributes:
+        max_age (float): Seconds after which `ensure_fresh` rebuilds the index.
+        built_at (float | None): Monotonic timestamp of the last build.
+    """
+
+    def __init__(self, max_age: float = PRODUCT_SEARCH_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self.built_at: Optional[float] = None
+        self._build_lock: Optional[asyncio.Lock] = None
+        # Parallel lists indexed by position: (producto_id, nombre, normalized, trigram count)
+        self._products: List[Tuple[int, str, str, int]] = []
+        self._postings: Dict[str, List[int]] = {}
+        # history_key(nombre) -> producto_ids
+        self._by_key: Dict[str, Tuple[int, ...]] = {}
+
+    # ----------------------------- #
+    #   Building                    #
+    # ----------------------------- #
+    def is_stale(self) -> bool:
+        """
+        Return True if the index was never built or is older than `max_age`.
+        """
+        return self.built_at is None or time.monotonic() - self.built_at > self.max_age
+
+    def build(self, catalogue: List[Tuple[int, str]]) -> None:
+        """
+        Build the index from (producto_id, nombre) pairs and swap it in.
+        """
+        products: List[Tuple[int, str, str, int]] = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        by_key: Dict[str, Tuple[int, ...]] = {}
+        for position, (producto_id, nombre) in enumerate(sorted(catalogue, key=lambda p: p[1])):
+            normalized = normalize_text(nombre)
+            grams = trigrams(normalized)
+            products.append((producto_id, nombre, normalized, len(grams)))
+            for gram in grams:
+                postings[gram].append(position)
+            key = history_key(nombre)
+            by_key[key] = by_key.get(key, ()) + (producto_id,)
+
+        self._products, self._postings, self._by_key = products, dict(postings), by_key
+        self.built_at = time.monotonic()
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Reload the catalogue from the database and rebuild the index.
+
+        Returns:
+            int: Number of indexed products.
+        """
+        rows = db.execute(CATALOGUE_QUERY).fetchall()
+        self.build([(row.producto_id, row.nombre) for row in rows])
+        return len(rows)
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """
+        Rebuild the index only if it is stale; concurrent callers share a
+        single rebuild.
+
+        Args:
+            db (AsyncSession): Async session; the rebuild runs through `run_sync`.
+        """
+        if not self.is_stale():
+            return
+        if self._build_lock is None:
+            self._build_lock = asyncio.Lock()
+        async with self._build_lock:
+            if self.is_stale():
+                await db.run_sync(self.rebuild)
+
+    def invalidate(self) -> None:
+        """
+        Mark the index as stale, e.g. after products are created or renamed.
+        """
+        self.built_at = None
+
+    # ----------------------------- #
+    #   Resolving                   #
+    # ----------------------------- #
+    async def resolve(self, db: AsyncSession, name: str) -> Tuple[int, ...]:
+        """
+        Resolve a product name to its producto_id(s) by exact normalized match.
+
+        The in-memory map answers almost every call. Names missing from it
+        fall back to an indexed query; a hit there means the catalogue
+        changed, so the index is invalidated.
+
+        Args:
+            db (AsyncSession): Async session for rebuilds and fallbacks.
+            name (str): Product name as received by the endpoint.
+
+        Returns:
+            Tuple[int, ...]: Matching producto_ids (usually one), or an
+                empty tuple if the product does not exist.
+        """
+        key = history_key(name)
+        await self.ensure_fresh(db)
+        ids = self._by_key.get(key)
+        if ids:
+            return ids
+
+        rows = (await db.execute(RESOLVE_QUERY, {"key": key})).fetchall()
+        if rows:
+            self.invalidate()
+        return tuple(row.producto_id for row in rows)
+
+    # ----------------------------- #
+    #   Searching                   #
+    # ----------------------------- #
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, str, float]]:
+        """
+        Return the best matching products for a search term.
+
+        Args:
+            query (str): Search term, in any case and with or without accents.
+            limit (int, optional): Maximum number of results. Defaults to 5.
+
+        Returns:
+            List[Tuple[int, str, float]]: (producto_id, nombre, score) tuples
+                ordered from best to worst match. Scores are in [0, 3).
+        """
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+        products, postings = self._products, self._postings
+
+        query_grams = trigrams(normalized)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for position in postings.get(gram, ()):
+                shared[position] += 1
+
+        scored = []
+        for position, count in shared.items():
+            producto_id, nombre, name_normalized, gram_count = products[position]
+            similarity = count / (len(query_grams) + gram_count - count)
+            if name_normalized.startswith(normalized):
+                score = 2 + similarity
+            elif normalized in name_normalized:
+                score = 1 + similarity
+            elif similarity >= SIMILARITY_THRESHOLD:
+                score = similarity
+            else:
+                continue
+            scored.append((-score, position, producto_id, nombre))
+
+        scored.sort()
+        return [(producto_id, nombre, -neg_score) for neg_score, _, producto_id, nombre in scored[:limit]]
+
+    def suggest(self, query: str, limit: int = 5) -> List[str]:
+        """
+        Return only the names of the best matching products.
+        """
+        return [nombre for _, nombre, _ in self.search(query, limit)]
+
+
+# Shared index used by the price routes
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,440 @@
+"""
+Rate limiting utilities for the authentication endpoints.
+
+Login, password recovery and registration each cost an Argon2 hash, an
+email or Supabase calls, so a burst against them (credential stuffing,
+email bombing) can saturate the whole API. `RateLimitMiddleware` admits
+these requests only within per-client, per-account and per-route limits,
+before any route code runs:
+
+    - ip: requests from one client address.
+    - email: requests for one account (from the JSON body or the path).
+    - route: all requests to the route, as admission control.
+
+Limits are token buckets (burst = the limit, refilled evenly over the
+period) implemented with GCRA: a single timestamp per key. All the limits
+of a request are checked together and only consumed if every one allows
+it, so rejected requests do not use up the route budget.
+
+Backends:
+    - `MemoryRateLimitBackend`: in-process dict; limits are per worker.
+    - `RedisRateLimitBackend`: one Lua script call per request, so the
+      limits hold across every worker and every backend behind the load
+      balancer when `REDIS_URL` is configured (see `utils.redis_client`).
+
+With the shared backend, a rejected key is remembered locally until it
+may pass again, so a client that keeps retrying is rejected from memory
+without a Redis round trip. If Redis fails, requests are let through.
+
+Environment Variables:
+    RATE_LIMIT_ENABLED: Enable the middleware (default: true).
+    RATE_LIMIT_TRUST_FORWARDED: Take the client address from the last
+        X-Forwarded-For entry (behind `load_balancer.py` or another trusted
+        proxy) (default: false).
+    RATE_LIMIT_<ROUTE>_<SCOPE>: Limit as "count/period" (second, minute,
+        hour or day); "0" disables it. ROUTE is LOGIN, RECOVER or REGISTER
+        and SCOPE is IP, EMAIL or ROUTE. Defaults:
+            LOGIN:    ip 20/minute, email 10/minute, route 50/second
+            RECOVER:  ip 5/minute,  email 3/hour,    route 10/second
+            REGISTER: ip 10/hour,   email 5/hour,    route 10/second
+
+Usage:
+    from utils.rate_limiting import RateLimitMiddleware
+
+    app.add_middleware(RateLimitMiddleware)
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import unquote
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import env_bool
+from utils.redis_client import KEY_PREFIX, get_redis
+
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_TRUST_FORWARDED = env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+
+# Larger bodies are not parsed for the email (login and registration bodies are tiny)
+MAX_BODY_BYTES = 16 * 1024
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+REJECTED_BODY = json.dumps(
+    {"detail": "Demasiadas solicitudes, inténtalo nuevamente más tarde"}, ensure_ascii=False
+).encode("utf-8")
+
+
+class RateLimit(NamedTuple):
+    """
+    `count` requests per `period` seconds, with bursts of up to `count`.
+    """
+    count: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["RateLimit"]:
+        """
+        Parse "count/period", e.g. "20/minute". Returns None for "0" (disabled).
+        """
+        value = value.strip()
+        if value in ("", "0"):
+            return None
+        count, _, period = value.partition("/")
+        if period not in PERIODS or int(count) <= 0:
+            raise ValueError(f"Límite inválido: {value!r} (formato: cantidad/second|minute|hour|day)")
+        return cls(int(count), float(PERIODS[period]))
+
+    @property
+    def interval(self) -> float:
+        # Seconds between requests at the sustained rate
+        return self.period / self.count
+
+    @property
+    def tolerance(self) -> float:
+        # How far ahead of schedule a key may run (the burst)
+        return self.period - self.interval
+
+
+def _limit(route: str, scope: str, default: str) -> Optional[RateLimit]:
+    return RateLimit.parse(os.getenv(f"RATE_LIMIT_{route}_{scope}", default))
+
+
+class RouteRule(NamedTuple):
+    """
+    Limits of one endpoint.
+
+    Attributes:
+        name (str): Rule name, used in keys and stats.
+        method (str): HTTP method.
+        path (str): Exact path, or prefix when `email_in_path` is set.
+        email_in_path (bool): The email is the rest of the path after
+            `path`; otherwise it is the "email" field of the JSON body.
+        limits (dict): Scope ("ip", "email", "route") -> RateLimit.
+    """
+    name: str
+    method: str
+    path: str
+    email_in_path: bool
+    limits: Dict[str, RateLimit]
+
+
+def _rule(name: str, method: str, path: str, email_in_path: bool, defaults: Dict[str, str]) -> RouteRule:
+    limits = {scope: _limit(name.upper(), scope.upper(), default) for scope, default in defaults.items()}
+    return RouteRule(name, method, path, email_in_path, {s: limit for s, limit in limits.items() if limit})
+
+
+RULES: Tuple[RouteRule, ...] = (
+    _rule("login", "POST", "/auth/login", False, {"ip": "20/minute", "email": "10/minute", "route": "50/second"}),
+    _rule("recover", "POST", "/password/recover/", True, {"ip": "5/minute", "email": "3/hour", "route": "10/second"}),
+    _rule("register", "POST", "/registro/", False, {"ip": "10/hour", "email": "5/hour", "route": "10/second"}),
+)
+
+# One hit on a key: (key, emission interval, tolerance)
+Check = Tuple[str, float, float]
+
+
+# =============================== #
+#   Backends                      #
+# =============================== #
+class MemoryRateLimitBackend:
+    """
+    In-process GCRA backend.
+
+    Stores the "theoretical arrival time" of each key; keys whose time has
+    passed are equivalent to absent ones and are swept every
+    `sweep_every` calls.
+    """
+
+    # Operations never block, so they run directly on the event loop
+    blocking = False
+    shared = False
+
+    def __init__(self, sweep_every: int = 1000):
+        self.sweep_every = sweep_every
+        self._lock = threading.Lock()
+        self._tats: Dict[str, float] = {}
+        self._calls = 0
+
+    def hit(self, checks: Sequence[Check], now: float) -> Tuple[float, int]:
+        """
+        Consume one request on every key if all of them allow it.
+
+        Returns:
+            tuple: (seconds until the request would be allowed, or 0 if it
+                was allowed; index of the most limiting key).
+        """
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.sweep_every == 0:
+                self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+            wait, worst, tats = 0.0, -1, []
+            for i, (key, interval, tolerance) in enumerate(checks):
+                tat = max(self._tats.get(key, now), now)
+                if tat - now - tolerance > wait:
+                    wait, worst = tat - now - tolerance, i
+                tats.append(tat + interval)
+            if wait > 0:
+                return wait, worst
+            for (key, _, _), tat in zip(checks, tats):
+                self._tats[key] = tat
+            return 0.0, -1
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+# GCRA over several keys, all or nothing. Returns {wait, index of the most limiting key}.
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait, worst, tats = 0, -1, {}
+for i = 1, #KEYS do
+    local interval, tolerance = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or now), now)
+    if tat - now - tolerance > wait then
+        wait, worst = tat - now - tolerance, i - 1
+    end
+    tats[i] = tat + interval
+end
+if wait > 0 then
+    return {tostring(wait), worst}
+end
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+end
+return {'0', -1}
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    Redis GCRA backend shared across workers (one script call per request).
+    """
+
+    # Network calls run in the threadpool to keep the event loop free
+    blocking = True
+    shared = True
+
+    def __init__(self, client):
+        self.client = client
+        self._script = client.register_script(_GCRA_SCRIPT)
+
+    def hit(self, checks: Sequence[Check], now: float) -> Tuple[float, int]:
+        args: List[float] = [now]
+        for _, interval, tolerance in checks:
+            args += [interval, tolerance]
+        wait, worst = self._script(keys=[key for key, _, _ in checks], args=args)
+        return float(wait), int(worst)
+
+
+def make_backend():
+    """
+    Return a Redis backend if `REDIS_URL` is set, else an in-process one.
+    """
+    client = get_redis()
+    if client is not None:
+        return RedisRateLimitBackend(client)
+    return MemoryRateLimitBackend()
+
+
+# =============================== #
+#   Limiter                       #
+# =============================== #
+class RateLimiter:
+    """
+    Checks the limits of a rule for a request.
+
+    Attributes:
+        backend: `MemoryRateLimitBackend` or `RedisRateLimitBackend`.
+        allowed / rejected (dict): Requests per rule name.
+        local_rejections (int): Rejections answered from the local deny
+            cache, without asking a shared backend.
+        backend_errors (int): Failed backend calls (requests let through).
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else make_backend()
+        self.allowed: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.local_rejections = 0
+        self.backend_errors = 0
+        # key -> monotonic time until which it is known to be over its limit
+        self._denied: Dict[str, float] = {}
+
+    def _checks(self, rule: RouteRule, ip: Optional[str], email: Optional[str]) -> List[Check]:
+        identities = {"ip": ip, "email": email, "route": "*"}
+        return [
+            (f"{KEY_PREFIX}rl:{rule.name}:{scope}:{identities[scope]}", limit.interval, limit.tolerance)
+            for scope, limit in rule.limits.items()
+            if identities[scope]
+        ]
+
+    def _denied_for(self, checks: Sequence[Check]) -> float:
+        now = time.monotonic()
+        return max((self._denied.get(key, now) - now for key, _, _ in checks), default=0.0)
+
+    async def check(self, rule: RouteRule, ip: Optional[str], email: Optional[str]) -> float:
+        """
+        Consume one request for `rule`.
+
+        Returns:
+            float: 0 if the request is allowed, else the seconds to wait.
+        """
+        checks = self._checks(rule, ip, email)
+        if not checks:
+            return 0.0
+        if self.backend.shared:
+            wait = self._denied_for(checks)
+            if wait > 0:
+                self.local_rejections += 1
+                self.rejected[rule.name] = self.rejected.get(rule.name, 0) + 1
+                return wait
+            try:
+                wait, worst = await run_in_threadpool(self.backend.hit, checks, time.time())
+            except Exception as e:
+                # Fail open: an unavailable Redis must not take login down
+                self.backend_errors += 1
+                print(f"Error en el limitador de solicitudes: {e}")
+                wait, worst = 0.0, -1
+            if wait > 0:
+                if len(self._denied) > 10_000:
+                    now = time.monotonic()
+                    self._denied = {key: until for key, until in self._denied.items() if until > now}
+                self._denied[checks[worst][0]] = time.monotonic() + wait
+        else:
+            wait, _ = self.backend.hit(checks, time.time())
+
+        counter = self.rejected if wait > 0 else self.allowed
+        counter[rule.name] = counter.get(rule.name, 0) + 1
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "backend": type(self.backend).__name__,
+            "rules": {
+                rule.name: {
+                    "limits": {scope: f"{limit.count}/{limit.period:g}s" for scope, limit in rule.limits.items()},
+                    "allowed": self.allowed.get(rule.name, 0),
+                    "rejected": self.rejected.get(rule.name, 0),
+                }
+                for rule in RULES
+            },
+            "local_rejections": self.local_rejections,
+            "backend_errors": self.backend_errors,
+        }
+
+
+# =============================== #
+#   Middleware                    #
+# =============================== #
+class RateLimitMiddleware:
+    """
+    ASGI middleware answering 429 (with Retry-After) to requests over a limit.
+
+    Only requests matching a rule in `RULES` are inspected. For rules
+    with an email in the body, the (small) body is read, parsed and then
+    replayed to the route.
+    """
+
+    def __init__(self, app, limiter: "RateLimiter" = None, rules: Sequence[RouteRule] = RULES,
+                 trust_forwarded: bool = RATE_LIMIT_TRUST_FORWARDED):
+        self.app = app
+        self.limiter = limiter if limiter is not None else rate_limiter
+        self.rules = rules
+        self.trust_forwarded = trust_forwarded
+
+    def _match(self, scope) -> Optional[RouteRule]:
+        method, path = scope["method"], scope["path"]
+        for rule in self.rules:
+            if method == rule.method and (path.startswith(rule.path) if rule.email_in_path else path == rule.path):
+                return rule
+        return None
+
+    def _client_ip(self, scope) -> Optional[str]:
+        if self.trust_forwarded:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    # The last entry was added by the trusted proxy
+                    return value.decode("latin-1").rsplit(",", 1)[-1].strip()
+        client = scope.get("client")
+        return client[0] if client else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self._match(scope)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        email = None
+        if "email" in rule.limits:
+            if rule.email_in_path:
+                email = unquote(scope["path"][len(rule.path):])
+            else:
+                body, messages = await _read_body(receive)
+                receive = _replay(messages, receive)
+                email = _email_from_json(body)
+            email = email.strip().lower()[:254] if email else None
+
+        wait = await self.limiter.check(rule, self._client_ip(scope), email)
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(REJECTED_BODY)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": REJECTED_BODY})
+
+
+async def _read_body(receive) -> Tuple[bytes, list]:
+    """
+    Read the request body (up to `MAX_BODY_BYTES`), keeping the messages to replay.
+    """
+    messages, size, chunks = [], 0, []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunk = message.get("body", b"")
+        chunks.append(chunk)
+        size += len(chunk)
+        if not message.get("more_body") or size > MAX_BODY_BYTES:
+            break
+    return (b"".join(chunks) if size <= MAX_BODY_BYTES else b""), messages
+
+
+def _replay(messages: list, receive):
+    async def replayed():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+    return replayed
+
+
+def _email_from_json(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    email = data.get("email") if isinstance(data, dict) else None
+    return email if isinstance(email, str) else None
+
+
+# Shared limiter used by the middleware and GET /health/rate-limits
+rate_limiter = RateLimiter()
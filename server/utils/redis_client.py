@@ -0,0 +1,42 @@
+"""
+Shared Redis connection utilities.
+
+Subsystems that must share state across uvicorn workers (response cache,
+token revocation, rate limiting) use Redis when `REDIS_URL` is configured and
+fall back to in-process backends otherwise. The `redis` package is an
+optional dependency and is only imported when `REDIS_URL` is set.
+
+Environment Variables:
+    REDIS_URL: Redis connection URL, e.g. redis://localhost:6379/0 (optional).
+
+Usage:
+    from utils.redis_client import get_redis
+
+    client = get_redis()
+    if client is not None:
+        client.get("key")
+"""
+
+import os
+from functools import lru_cache
+
+# Prefix for every key written by this application
+KEY_PREFIX = "plaze:"
+
+
+@lru_cache(maxsize=1)
+def get_redis():
+    """
+    Return a shared Redis client, or None if `REDIS_URL` is not configured.
+
+    Raises:
+        RuntimeError: If `REDIS_URL` is set but the `redis` package is missing.
+    """
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("REDIS_URL está configurado pero el paquete 'redis' no está instalado") from e
+    return redis.Redis.from_url(url)
@@ -0,0 +1,265 @@
+"""
+Response cache utilities for read-mostly endpoints.
+
+This module caches serialized JSON responses of catalogue endpoints
+(products and market plazas), which change rarely but are requested on
+every page load. It provides:
+
+    - Per-route TTLs.
+    - ETag headers and `304 Not Modified` answers for `If-None-Match`.
+    - Explicit invalidation by tag when products or plazas are written.
+    - An in-process LRU backend, or a Redis backend shared across workers
+      when `REDIS_URL` is configured (see `utils.redis_client`).
+
+Environment Variables:
+    RESPONSE_CACHE_MAX_ENTRIES: Capacity of the in-process LRU (default: 256).
+
+Usage:
+    from utils.response_cache import response_cache, TAG_PRODUCTS
+
+    @router.get("/products/")
+    async def list_products(request: Request, db: AsyncSession = Depends(get_async_db)):
+        async def build():
+            ...  # query the database and return a JSON-serializable dict
+
+        return await response_cache.respond(
+            request, "prices:products", ttl=3600, tags=(TAG_PRODUCTS,), producer=build,
+        )
+
+    # After products are created, renamed or deleted:
+    response_cache.invalidate(TAG_PRODUCTS)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Set
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+
+from utils.redis_client import KEY_PREFIX, get_redis
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+# Invalidation tags for catalogue data
+TAG_PRODUCTS = "productos"
+TAG_MARKETS = "plazas"
+
+
+class CachedResponse(NamedTuple):
+    """
+    Serialized response body and its entity tag.
+    """
+    body: bytes
+    etag: str
+
+
+# =============================== #
+#   Backends                      #
+# =============================== #
+class MemoryLRUBackend:
+    """
+    In-process LRU backend with per-entry expiration.
+
+    Only shared by the threads of a single worker process.
+    """
+
+    # Operations never block, so they run directly on the event loop
+    blocking = False
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (expires_at, CachedResponse)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse, ttl: float, tags: Iterable[str]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tag: str) -> None:
+        with self._lock:
+            for key in self._tags.pop(tag, ()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class RedisBackend:
+    """
+    Redis backend, shared by every worker connected to the same server.
+
+    Each entry is stored as `<etag>\\n<body>` with a native TTL. Tags are
+    Redis sets holding the keys to delete on invalidation.
+    """
+
+    # Network calls run in the threadpool to keep the event loop free
+    blocking = True
+
+    def __init__(self, client, prefix: str = KEY_PREFIX + "cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return CachedResponse(body=body, etag=etag.decode())
+
+    def set(self, key: str, entry: CachedResponse, ttl: float, tags: Iterable[str]) -> None:
+        full_key = self.prefix + key
+        pipe = self.client.pipeline()
+        pipe.set(full_key, entry.etag.encode() + b"\n" + entry.body, ex=max(1, int(ttl)))
+        for tag in tags:
+            pipe.sadd(self.prefix + "tag:" + tag, full_key)
+        pipe.execute()
+
+    def invalidate(self, tag: str) -> None:
+        tag_key = self.prefix + "tag:" + tag
+        keys = self.client.smembers(tag_key)
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(tag_key)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+# =============================== #
+#   Cache facade                  #
+# =============================== #
+def make_etag(body: bytes) -> str:
+    """
+    Return a strong entity tag for a response body.
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an `If-None-Match` header value against an entity tag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag == etag or tag == "W/" + etag for tag in candidates)
+
+
+class ResponseCache:
+    """
+    Response cache facade used by the routers.
+
+    Attributes:
+        backend: Storage backend (`MemoryLRUBackend` or `RedisBackend`).
+        hits (int): Requests answered from the cache.
+        misses (int): Requests that had to run the producer.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else make_backend()
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_create(self, key: str, ttl: float, tags: Iterable[str],
+                            producer: Callable[[], Awaitable[dict]]) -> CachedResponse:
+        """
+        Return the cached response for `key`, awaiting `producer` on a miss.
+
+        Args:
+            key (str): Cache key, unique per route and parameters.
+            ttl (float): Seconds the entry stays valid.
+            tags (Iterable[str]): Invalidation tags for the entry.
+            producer (Callable[[], Awaitable[dict]]): Builds the JSON payload on a miss.
+
+        Returns:
+            CachedResponse: Serialized body and ETag.
+        """
+        entry = await self._call(self.backend.get, key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        body = JSONResponse(content=await producer()).body
+        entry = CachedResponse(body=body, etag=make_etag(body))
+        await self._call(self.backend.set, key, entry, ttl, tuple(tags))
+        return entry
+
+    async def respond(self, request: Request, key: str, ttl: float, tags: Iterable[str],
+                      producer: Callable[[], Awaitable[dict]]) -> Response:
+        """
+        Build the HTTP response for a cacheable GET request.
+
+        Returns `304 Not Modified` when the client's `If-None-Match` header
+        matches the current ETag, otherwise the cached JSON body.
+        """
+        entry = await self.get_or_create(key, ttl, tags, producer)
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    def invalidate(self, *tags: str) -> None:
+        """
+        Drop every entry carrying any of the given tags.
+
+        Synchronous on purpose: writers (ingestion jobs, admin scripts)
+        usually run outside the event loop.
+        """
+        for tag in tags:
+            self.backend.invalidate(tag)
+
+    def clear(self) -> None:
+        """
+        Drop every cached entry.
+        """
+        self.backend.clear()
+
+
+def make_backend():
+    """
+    Return a Redis backend if `REDIS_URL` is set, else an in-process LRU.
+    """
+    client = get_redis()
+    if client is not None:
+        return RedisBackend(client)
+    return MemoryLRUBackend()
+
+
+# Shared cache used by the routers
+response_cache = ResponseCache()
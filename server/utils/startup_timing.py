@@ -0,0 +1,105 @@
+"""
+Startup timing utilities.
+
+Records how long each module import and each initialization step of the
+API takes, so cold-start regressions (a module that connects to the
+network at import time, a slow startup task) are visible. The report is
+printed once startup completes and served at `GET /health/startup`.
+
+Import times are inclusive and attributed to the first module that pulls
+a dependency in (e.g. the first router importing SQLAlchemy pays for it).
+For a full per-package breakdown use `python -X importtime -c "import main"`.
+
+Usage:
+    from utils.startup_timing import startup_report
+
+    prices = startup_report.import_module("routers_.prices")
+
+    with startup_report.measure("init", "email outbox worker"):
+        email_outbox_worker.start()
+
+    print(startup_report.format())
+"""
+
+import importlib
+import time
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Iterator, List, NamedTuple, Optional
+
+
+class StartupStep(NamedTuple):
+    """
+    A timed import or initialization step.
+    """
+    kind: str
+    name: str
+    seconds: float
+    ok: bool
+
+
+class StartupReport:
+    """
+    Collects `StartupStep`s from process start until the app is ready.
+
+    Attributes:
+        created_at (float): `perf_counter` when the report was created
+            (first import of this module, at the top of `main.py`).
+        ready_after (float | None): Seconds from `created_at` to `finish()`.
+    """
+
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.ready_after: Optional[float] = None
+        self.steps: List[StartupStep] = []
+
+    @contextmanager
+    def measure(self, kind: str, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block; failures are recorded and re-raised.
+        """
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.steps.append(StartupStep(kind, name, time.perf_counter() - started, ok))
+
+    def import_module(self, name: str) -> ModuleType:
+        """
+        Import a module by name and record how long it took.
+        """
+        with self.measure("import", name):
+            return importlib.import_module(name)
+
+    def finish(self) -> None:
+        """
+        Mark the application as ready to serve requests.
+        """
+        self.ready_after = time.perf_counter() - self.created_at
+
+    def as_dict(self) -> dict:
+        return {
+            "ready_after_ms": round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+            "steps": [
+                {"kind": s.kind, "name": s.name, "ms": round(s.seconds * 1000, 1), "ok": s.ok}
+                for s in self.steps
+            ],
+        }
+
+    def format(self) -> str:
+        """
+        Return the report as a text table, slowest steps first.
+        """
+        lines = [f"{'kind':<7} {'step':<36} {'ms':>9}"]
+        for step in sorted(self.steps, key=lambda s: s.seconds, reverse=True):
+            flag = "" if step.ok else "  (error)"
+            lines.append(f"{step.kind:<7} {step.name:<36} {step.seconds * 1000:>9.1f}{flag}")
+        if self.ready_after is not None:
+            lines.append(f"{'ready':<7} {'total since main import':<36} {self.ready_after * 1000:>9.1f}")
+        return "\n".join(lines)
+
+
+# Report of this process, started when main.py imports this module
+startup_report = StartupReport()
@@ -0,0 +1,259 @@
+"""
+Token revocation utilities.
+
+This module replaces the old in-memory `TOKEN_BLACKLIST` set of raw tokens.
+Revocations are keyed by the token's `jti` claim and expire at the token's
+`exp`: once a token has expired it is rejected by signature verification
+anyway, so its revocation entry can be dropped.
+
+Backends:
+    - `MemoryRevocationBackend`: in-process dict plus an expiry heap; each
+      write sweeps a bounded number of expired entries. Only valid for a
+      single worker (and as the local stand-in in development).
+    - `RedisRevocationBackend`: a Redis sorted set (jti scored by exp),
+      shared by every worker and every backend behind the load balancer
+      when `REDIS_URL` is configured (see `utils.redis_client`).
+
+With a shared backend, lookups go through a local Bloom filter that holds
+every revoked jti: the common case (token not revoked) is answered without
+a network round trip. The filter is rebuilt from the backend every
+`TOKEN_REVOCATION_SYNC_SECONDS`; revocations made by this worker are added
+immediately, revocations made by other workers are seen after the next sync.
+Set the interval to 0 to always ask the backend.
+
+Environment Variables:
+    TOKEN_REVOCATION_SYNC_SECONDS: Bloom filter refresh interval (default: 5).
+    TOKEN_REVOCATION_SWEEP_LIMIT: Expired entries removed per write by the
+        in-process backend (default: 100).
+
+Usage:
+    from utils.token_revocation import token_revocation_store
+
+    token_revocation_store.revoke(payload["jti"], payload["exp"])
+    token_revocation_store.is_revoked(payload["jti"])
+    True
+"""
+
+import hashlib
+import heapq
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.redis_client import KEY_PREFIX, get_redis
+
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+TOKEN_REVOCATION_SWEEP_LIMIT = int(os.getenv("TOKEN_REVOCATION_SWEEP_LIMIT", "100"))
+
+
+# =============================== #
+#   Backends                      #
+# =============================== #
+class MemoryRevocationBackend:
+    """
+    In-process revocation backend with expiry.
+
+    Memory is bounded by the number of tokens revoked within one token
+    lifetime: expired entries are swept on every write.
+    """
+
+    # Operations never block, so they run directly on the event loop
+    blocking = False
+    shared = False
+
+    def __init__(self, sweep_limit: int = TOKEN_REVOCATION_SWEEP_LIMIT):
+        self.sweep_limit = sweep_limit
+        self._lock = threading.Lock()
+        # jti -> exp (epoch seconds)
+        self._entries: Dict[str, float] = {}
+        # (exp, jti) min-heap used to find expired entries
+        self._expiry: List[Tuple[float, str]] = []
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            current = self._entries.get(jti)
+            if current is not None and current > now:
+                return False
+            self._entries[jti] = exp
+            heapq.heappush(self._expiry, (exp, jti))
+            return True
+
+    def is_revoked(self, jti: str) -> bool:
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    def active(self) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [jti for jti, exp in self._entries.items() if exp > now]
+
+    def _sweep(self, now: float) -> None:
+        expiry, entries = self._expiry, self._entries
+        for _ in range(self.sweep_limit):
+            if not expiry or expiry[0][0] > now:
+                return
+            exp, jti = heapq.heappop(expiry)
+            # Skip heap items superseded by a later revocation of the same jti
+            if entries.get(jti) == exp:
+                del entries[jti]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisRevocationBackend:
+    """
+    Redis revocation backend shared across workers.
+
+    All revocations live in one sorted set scored by `exp`; expired members
+    are removed on every write.
+    """
+
+    # Network calls run in the threadpool to keep the event loop free
+    blocking = True
+    shared = True
+
+    def __init__(self, client, key: str = KEY_PREFIX + "revoked_tokens"):
+        self.client = client
+        self.key = key
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self.key, "-inf", time.time())
+        pipe.zadd(self.key, {jti: exp}, nx=True)
+        _, added = pipe.execute()
+        return bool(added)
+
+    def is_revoked(self, jti: str) -> bool:
+        exp = self.client.zscore(self.key, jti)
+        return exp is not None and exp > time.time()
+
+    def active(self) -> List[str]:
+        return [
+            member.decode() if isinstance(member, bytes) else member
+            for member in self.client.zrangebyscore(self.key, time.time(), "+inf")
+        ]
+
+
+# =============================== #
+#   Bloom filter                  #
+# =============================== #
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    `might_contain` never returns False for an added item; it returns True
+    for an item that was not added with probability ~`error_rate` while
+    holding at most `capacity` items.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+# =============================== #
+#   Store facade                  #
+# =============================== #
+class TokenRevocationStore:
+    """
+    Revocation store used by the auth routes.
+
+    Attributes:
+        backend: `MemoryRevocationBackend` or `RedisRevocationBackend`.
+        sync_interval (float): Seconds between Bloom filter rebuilds for
+            shared backends (0 disables the filter).
+        local_hits (int): Checks answered by the Bloom filter alone.
+        backend_checks (int): Checks that had to ask the backend.
+    """
+
+    def __init__(self, backend=None, sync_interval: float = TOKEN_REVOCATION_SYNC_SECONDS):
+        self.backend = backend if backend is not None else make_backend()
+        self.sync_interval = sync_interval
+        self.local_hits = 0
+        self.backend_checks = 0
+        self._bloom: Optional[BloomFilter] = None
+        self._synced_at: Optional[float] = None
+        self._sync_lock = threading.Lock()
+
+    @property
+    def uses_bloom_filter(self) -> bool:
+        return self.backend.shared and self.sync_interval > 0
+
+    def _sync(self) -> BloomFilter:
+        """
+        Rebuild the Bloom filter from the backend if it is older than
+        `sync_interval`. Blocking: call from a worker thread.
+        """
+        if self._synced_at is not None and time.monotonic() - self._synced_at <= self.sync_interval:
+            return self._bloom
+        with self._sync_lock:
+            if self._synced_at is None or time.monotonic() - self._synced_at > self.sync_interval:
+                active = self.backend.active()
+                bloom = BloomFilter(capacity=max(100_000, 2 * len(active)))
+                for jti in active:
+                    bloom.add(jti)
+                self._bloom, self._synced_at = bloom, time.monotonic()
+        return self._bloom
+
+    def is_revoked(self, jti: str) -> bool:
+        """
+        Return True if the token with this jti was revoked and has not expired.
+
+        Blocking with a shared backend (call from sync routes or the
+        threadpool); a Bloom filter miss answers without a network call.
+        """
+        if self.uses_bloom_filter and not self._sync().might_contain(jti):
+            self.local_hits += 1
+            return False
+        self.backend_checks += 1
+        return self.backend.is_revoked(jti)
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        """
+        Revoke a token until its expiration time.
+
+        Args:
+            jti (str): The token's unique identifier claim.
+            exp (float): The token's expiration (epoch seconds).
+
+        Returns:
+            bool: False if the token was already revoked.
+        """
+        added = self.backend.revoke(jti, float(exp))
+        if self.uses_bloom_filter:
+            self._sync().add(jti)
+        return added
+
+
+def make_backend():
+    """
+    Return a Redis backend if `REDIS_URL` is set, else an in-process one.
+    """
+    client = get_redis()
+    if client is not None:
+        return RedisRevocationBackend(client)
+    return MemoryRevocationBackend()
+
+
+# Shared store used by the auth routes
+token_revocation_store = TokenRevocationStore()